@@ -27,8 +27,9 @@ def login_view(request):
     Handle user login.
     Always start with a clean session when accessing /login/.
     """
-    # 🔹 Always clear old session each time login page is accessed
-    request.session.flush()
+    # 🔹 Clear the old session each time login page is accessed (nothing to clear, nothing to write)
+    if request.method == "POST" or not request.session.is_empty():
+        request.session.flush()
 
     form = LoginForm(request.POST or None)  # ✅ Always define form
 
@@ -3,3 +3,12 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "core"
+
+    def ready(self):
+        from django.core.signals import request_started
+        from core import data_version, db_pool, metrics
+
+        # Polled data versions (no LISTEN thread) are re-read once per request
+        request_started.connect(data_version.reset_request_versions, dispatch_uid="data_version_reset")
+        # Pool counters are sampled into /metrics gauges on each metrics flush
+        metrics.add_collector(db_pool.record_pool_metrics)
@@ -1,9 +1,11 @@
 # core/checkup_uploader.py
+import os
 import pandas as pd
-import uuid
 from utils.validators import normalize_string, safe_float, safe_date
-from core.queries import get_employee_by_uid, insert_medical_checkup
-from core.core_models import Karyawan
+from django.conf import settings
+from core.instrumentation import timed
+from core.ingest import CheckupWriter, chunk_rows, iter_chunks, map_sheets, map_text_chunks, read_text_chunks, text_format, text_row_offset
+from core import metrics
 
 # -----------------------------
 # Columns mapping (all V2 checkup_data fields)
@@ -28,6 +30,22 @@ CHECKUP_COLUMNS = {
 
 MANDATORY_CHECKUP_FIELDS = ["uid", "tanggal_checkup"]
 
+# "upsert": a row whose (uid, tanggal_checkup) already exists updates that checkup; "insert": always add
+UPLOAD_MODES = ("upsert", "insert")
+
+
+def upload_mode(mode=None):
+    mode = str(mode or getattr(settings, "CHECKUP_UPLOAD_MODE", "insert")).lower()
+    if mode not in UPLOAD_MODES:
+        raise ValueError(f"Unknown checkup upload mode: {mode}")
+    return mode
+
+# Checkup fields a monthly checkup upload writes (standard metrics; no anthropometrics)
+CHECKUP_UPLOAD_FIELDS = [
+    'uid', 'tanggal_checkup', 'gula_darah_puasa', 'gula_darah_sewaktu', 'tekanan_darah',
+    'cholesterol', 'asam_urat', 'lingkar_perut', 'derajat_kesehatan', 'lokasi',
+]
+
 # -----------------------------
 # Helpers
 # -----------------------------
@@ -43,93 +61,148 @@ def map_checkup_columns(df: pd.DataFrame):
             mapped[db_col] = None
     return mapped
 
+def prepare_checkup_frame(df: pd.DataFrame, sheet_name):
+    """Canonical, typed checkup columns for rows of one sheet (vectorized; works on any chunk)."""
+    # Map columns using the defined mappings
+    column_mapping = map_checkup_columns(df)
+    df = df.rename(columns={v: k for k, v in column_mapping.items() if v is not None})
+
+    # Fill missing 'lokasi' with sheet name
+    if 'lokasi' not in df.columns or df['lokasi'].isnull().all():
+        df['lokasi'] = sheet_name
+
+    # Fill missing 'tanggal_checkup' with today
+    if 'tanggal_checkup' not in df.columns:
+        df['tanggal_checkup'] = pd.Timestamp.today().date()
+
+    # Clean UID; rows without one are reported by the writer as "UID missing"
+    df = df.copy()
+    df['uid'] = df['uid'].astype(str).str.strip()
+
+    # Convert text columns
+    for col in ['nama', 'jabatan', 'lokasi']:
+        if col in df.columns:
+            df[col] = df[col].apply(normalize_string)
+    df['lokasi'] = df['lokasi'].where(df['lokasi'] != '', sheet_name)
+
+    # Normalize derajat_kesehatan to uppercase P1..P7 without extra spaces
+    if 'derajat_kesehatan' in df.columns:
+        df['derajat_kesehatan'] = df['derajat_kesehatan'].astype(str).str.strip().str.upper()
+
+    # Convert numeric fields (monthly metrics only; anthropometrics excluded)
+    numeric_cols = ['gula_darah_puasa','gula_darah_sewaktu','cholesterol','asam_urat','lingkar_perut']
+    for col in numeric_cols:
+        if col in df.columns:
+            df[col] = df[col].astype(str).str.replace(',', '.').apply(safe_float)
+
+    # Convert dates
+    for col in ['tanggal_lahir', 'tanggal_checkup']:
+        if col in df.columns:
+            df[col] = df[col].apply(lambda x: safe_date(pd.to_datetime(x, dayfirst=True, errors='coerce')))
+
+    # Anthropometrics excluded from checkup ingestion (handled in master upload)
+    return df[[c for c in CHECKUP_UPLOAD_FIELDS if c in df.columns]]
+
+def prepare_checkup_sheet(df: pd.DataFrame, sheet_name):
+    """(frame, None) for one sheet, or (None, reason) when it cannot be ingested; runs in parse workers."""
+    # Check for required columns
+    if map_checkup_columns(df)['uid'] is None:
+        return None, 'Required column "uid" not found in sheet'
+    return prepare_checkup_frame(df, sheet_name), None
+
 # -----------------------------
 # Main parser
 # -----------------------------
-def parse_checkup_xls(file_path):
-    all_sheets = pd.read_excel(file_path, sheet_name=None, dtype=str)  # read all as str
-    inserted = 0
-    inserted_ids = []
-    skipped = []
-
-    for sheet_name, df in all_sheets.items():
-        # Map columns using the defined mappings
-        column_mapping = map_checkup_columns(df)
-        
-        # Rename columns based on mapping
-        rename_dict = {v: k for k, v in column_mapping.items() if v is not None}
-        df = df.rename(columns=rename_dict)
-        
-        # Check for required columns
-        if 'uid' not in df.columns:
-            skipped.append({'row': 'all', 'reason': 'Required column "uid" not found in sheet'})
+@timed()
+def parse_checkup_xls(file_path, mode=None, chunk_size=None, workers=None):
+    """
+    Ingest a checkup workbook. Sheets are normalized one at a time, or in parallel with
+    UPLOAD_PARSE_WORKERS > 1, and written in sheet order in chunks of CHECKUP_UPLOAD_CHUNK_ROWS rows,
+    each validated and stored in one transaction (core.ingest).
+    Returns inserted/updated counts and ids, skipped rows, per-chunk reports and rows_per_second.
+    """
+    writer = CheckupWriter("checkup", upload_mode(mode))
+    size = chunk_rows(chunk_size)
+    # read all as str
+    for sheet_name, (frame, reason) in map_sheets(file_path, prepare_checkup_sheet, workers=workers, dtype=str):
+        if frame is None:
+            writer.skip(sheet_name, 'all', reason)
             continue
+        for chunk in iter_chunks(frame, size):
+            writer.write(sheet_name, chunk)
+
+    result = writer.result()
+    metrics.record_upload("checkup", result['inserted'], len(result['skipped']))
+    return result
+
+# -----------------------------
+# CSV / TSV / NDJSON
+# -----------------------------
+# Header fragments that route an upload to the anthropometric parser (core.excel_parser)
+ANTHROPOMETRIC_KEYS = ['tinggi', 'berat', 'bmi', 'height', 'weight', 'imt']
 
-        # Fill missing 'lokasi' with sheet name
-        if 'lokasi' not in df.columns or df['lokasi'].isnull().all():
-            df['lokasi'] = sheet_name
-
-        # Fill missing 'tanggal_checkup' with today
-        if 'tanggal_checkup' not in df.columns:
-            df['tanggal_checkup'] = pd.Timestamp.today().date()
-
-        # Clean UID
-        df['uid'] = df['uid'].astype(str).str.strip()
-        df = df[df['uid'].notna() & (df['uid'] != 'nan')]
-
-        # Convert text columns
-        for col in ['nama', 'jabatan', 'lokasi']:
-            if col in df.columns:
-                df[col] = df[col].apply(normalize_string)
-
-        # Normalize derajat_kesehatan to uppercase P1..P7 without extra spaces
-        if 'derajat_kesehatan' in df.columns:
-            df['derajat_kesehatan'] = df['derajat_kesehatan'].astype(str).str.strip().str.upper()
-
-        # Convert numeric fields (monthly metrics only; anthropometrics excluded)
-        numeric_cols = ['gula_darah_puasa','gula_darah_sewaktu','cholesterol','asam_urat','lingkar_perut']
-        for col in numeric_cols:
-            if col in df.columns:
-                df[col] = df[col].astype(str).str.replace(',', '.').apply(safe_float)
-
-        # Convert dates
-        for col in ['tanggal_lahir', 'tanggal_checkup']:
-            if col in df.columns:
-                df[col] = df[col].apply(lambda x: safe_date(pd.to_datetime(x, dayfirst=True, errors='coerce')))
-
-        # Iterate rows
-        for idx, row in df.iterrows():
-            row_dict = row.to_dict()
-            uid = row_dict.get('uid')
-            
-            # Get Karyawan instance
-            karyawan = Karyawan.objects.filter(uid=uid).first()
-            if not karyawan:
-                skipped.append({'row': idx+2, 'reason': 'UID not found in database'})
+def has_anthropometrics(columns) -> bool:
+    normalized = {str(c).strip().lower().replace(' ', '_') for c in columns}
+    return any(any(k in col for k in ANTHROPOMETRIC_KEYS) for col in normalized)
+
+def upload_columns(file_path):
+    """Header names of an upload (every sheet of a workbook) without reading its rows."""
+    fmt = text_format(file_path)
+    if fmt:
+        first = next(read_text_chunks(file_path, fmt, 1), None)
+        return list(first.columns) if first is not None else []
+    columns = []
+    for df in pd.read_excel(file_path, sheet_name=None, nrows=0).values():
+        columns += list(df.columns)
+    return columns
+
+@timed()
+def parse_checkup_text(file_path, fmt=None, mode=None, chunk_size=None, label=None, anthropometric=False):
+    """
+    Ingest a CSV, TSV or NDJSON checkup file with the workbook column aliases, coercion and chunked
+    writes. The file is read CHECKUP_UPLOAD_CHUNK_ROWS records at a time, never as a whole; its rows
+    count as one sheet named `label` (default: the file name), which also fills a missing lokasi.
+    """
+    from core import excel_parser, upload_store
+
+    fmt = fmt or text_format(file_path)
+    label = label or os.path.splitext(upload_store.original_filename(getattr(file_path, 'name', file_path)))[0]
+    kind = "checkup_anthropometric" if anthropometric else "checkup"
+    prepare = excel_parser.prepare_anthropometric_sheet if anthropometric else prepare_checkup_sheet
+    row_offset = text_row_offset(fmt)
+    writer = CheckupWriter(kind, upload_mode(mode))
+    try:
+        for n, (index, (frame, reason)) in enumerate(map_text_chunks(file_path, prepare, label, fmt, chunk_size)):
+            if frame is None and n == 0:
+                # Header problem: the other chunks have the same columns
+                writer.skip(label, 'all', reason)
+                break
+            if frame is None:
+                for idx in index:
+                    writer.skip(label, int(idx) + row_offset, reason)
                 continue
+            writer.write(label, frame, row_offset=row_offset)
+    except Exception as e:
+        # Chunks before the unreadable record stay saved (and in the upload's ledger batch)
+        writer.skip(label, 'rest', f'File unreadable after row {writer.rows + row_offset - 1}: {e}')
+
+    result = writer.result()
+    metrics.record_upload(kind, result['inserted'], len(result['skipped']))
+    return result
+
+def parse_checkup_file(file_path, mode=None, anthropometric=False, chunk_size=None):
+    """
+    Checkup ingestion entry point for stored uploads and file drops: CSV/TSV/NDJSON by extension,
+    anything else as a workbook. anthropometric=None picks the anthropometric parser when the headers
+    have tinggi/berat/bmi columns.
+    """
+    from core import excel_parser
 
-            try:
-                checkup_data = {
-                    'uid': karyawan,  # Pass Karyawan instance instead of UID string
-                    'tanggal_checkup': row_dict.get('tanggal_checkup') or pd.Timestamp.today().date(),
-                    # Anthropometrics excluded from checkup ingestion
-                    # 'tinggi': row_dict.get('tinggi'),
-                    # 'berat': row_dict.get('berat'),
-                    # 'bmi': row_dict.get('bmi'),
-                    # Standard metrics
-                    'gula_darah_puasa': row_dict.get('gula_darah_puasa'),
-                    'gula_darah_sewaktu': row_dict.get('gula_darah_sewaktu'),
-                    'tekanan_darah': row_dict.get('tekanan_darah'),
-                    'cholesterol': row_dict.get('cholesterol'),
-                    'asam_urat': row_dict.get('asam_urat'),
-                    'lingkar_perut': row_dict.get('lingkar_perut'),
-                    'derajat_kesehatan': row_dict.get('derajat_kesehatan'),
-                    'lokasi': row_dict.get('lokasi') or sheet_name,
-                }
-                obj = insert_medical_checkup(**checkup_data)
-                inserted_ids.append(obj.checkup_id)
-                inserted += 1
-            except Exception as e:
-                skipped.append({'row': idx+2, 'reason': str(e)})
-
-    return {'inserted': inserted, 'skipped': skipped, 'inserted_ids': inserted_ids}
+    if anthropometric is None:
+        anthropometric = has_anthropometrics(upload_columns(file_path))
+    fmt = text_format(file_path)
+    if fmt:
+        return parse_checkup_text(file_path, fmt=fmt, mode=mode, chunk_size=chunk_size, anthropometric=anthropometric)
+    if anthropometric:
+        return excel_parser.parse_checkup_anthropometric(file_path, mode=mode, chunk_size=chunk_size)
+    return parse_checkup_xls(file_path, mode=mode, chunk_size=chunk_size)
@@ -0,0 +1,420 @@
+# core/data_version.py
+"""
+Cross-worker data versions for cache invalidation.
+
+Writers call `bump(KARYAWAN)` / `bump(CHECKUPS)` in the transaction that changes the data; readers fold
+`current(...)` into their cache keys/versions. Versions live in the `data_versions` table, one BIGINT
+per name incremented by every bump, so they commit or roll back together with the write and are shared
+by every worker on every host:
+
+- PostgreSQL: bump() also sends NOTIFY data_versions. Each worker runs one LISTEN thread that keeps
+  its local copy current, so reading a version costs no query.
+- Other databases (SQLite locally), or while the listener is down: the versions are read with one
+  query the first time a request asks for them and reused until the request ends
+  (at most DATA_VERSION_POLL_SECONDS outside requests).
+
+A bump can also carry row-level changes, e.g. ("U", checkup_id) for an edit or ("D", checkup_id) for a
+delete. They are stored in `data_version_changes` under the version they produced, so a reader that
+sees a new version can replay just those rows (core.snapshot incremental refresh) instead of reloading
+the table. Positions for read_changes() come from journal_position().
+
+Both tables are created on first use (or with `manage.py add_data_versions_table`).
+DATA_VERSION_BACKEND=file keeps the older per-host backend, where a version is the mtime of
+DATA_VERSION_DIR/<name>.version with a <name>.changes journal next to it. That backend is also the
+fallback when the tables cannot be created.
+"""
+import os
+import select
+import tempfile
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+
+from core import db_router
+from core.instrumentation import logger
+
+KARYAWAN = "karyawan"
+CHECKUPS = "checkups"
+
+# Versions whose row changes are kept in data_version_changes; older positions reload in full
+JOURNAL_KEEP_VERSIONS = 1000
+# The file journal is rotated past this size; readers holding an older position then reload in full
+JOURNAL_MAX_BYTES = 1024 * 1024
+
+CHANNEL = "data_versions"
+
+TABLES_SQL = [
+    "CREATE TABLE IF NOT EXISTS data_versions (name VARCHAR(64) PRIMARY KEY, version BIGINT NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS data_version_changes ("
+    "name VARCHAR(64) NOT NULL, version BIGINT NOT NULL, op VARCHAR(8) NOT NULL, row_key VARCHAR(64) NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS idx_data_version_changes ON data_version_changes (name, version)",
+]
+
+# Per-process state; reset in a forked gunicorn worker
+_state = {"pid": None, "backend": None, "versions": None, "read_at": 0.0, "listener": None}
+_lock = threading.Lock()
+# Bumps collected by an active batch() in this thread
+_batch = threading.local()
+
+
+# -------------------------
+# Backend selection
+# -------------------------
+def ensure_tables():
+    """Create data_versions / data_version_changes if missing (idempotent)."""
+    existing = set(connection.introspection.table_names())
+    if {"data_versions", "data_version_changes"} <= existing:
+        return False
+    # Savepoint: a failed CREATE must not poison a caller's transaction on PostgreSQL
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            for sql in TABLES_SQL:
+                cursor.execute(sql)
+    return True
+
+
+def _backend():
+    pid = os.getpid()
+    if _state["pid"] != pid:
+        # Never reuse the parent's versions or listener thread after a fork
+        _state.update(pid=pid, backend=None, versions=None, read_at=0.0, listener=None)
+    if _state["backend"] is None:
+        backend = "file"
+        if getattr(settings, "DATA_VERSION_BACKEND", "db") != "file":
+            try:
+                ensure_tables()
+                backend = "db"
+            except Exception as e:
+                logger.warning("data_versions table unavailable, using file versions: %s", e)
+        _state["backend"] = backend
+    return _state["backend"]
+
+
+def _store(updates):
+    with _lock:
+        versions = dict(_state["versions"] or {})
+        for name, version in updates.items():
+            versions[name] = max(versions.get(name, 0), int(version))
+        _state["versions"] = versions
+
+
+def reset_request_versions(**kwargs):
+    """request_started hook: re-read polled versions once per request (the listener keeps its own)."""
+    if not _listening():
+        _state["versions"] = None
+
+
+def _poll_seconds():
+    return float(getattr(settings, "DATA_VERSION_POLL_SECONDS", 1.0))
+
+
+def _versions():
+    versions = _state["versions"]
+    if versions is not None and (_listening() or time.monotonic() - _state["read_at"] < _poll_seconds()):
+        return versions
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name, version FROM data_versions")
+        rows = cursor.fetchall()
+    with _lock:
+        _state["versions"] = {name: int(version) for name, version in rows}
+        _state["read_at"] = time.monotonic()
+    return _state["versions"]
+
+
+# -------------------------
+# PostgreSQL LISTEN thread
+# -------------------------
+class _Listener(threading.Thread):
+    def __init__(self):
+        super().__init__(name="data-version-listener", daemon=True)
+        self.ready = False
+        self.retry_at = time.monotonic() + 5
+
+    def run(self):
+        raw = None
+        try:
+            # A dedicated connection outside Django's pool: LISTEN holds it for the worker's lifetime
+            params = connection.get_connection_params()
+            params.pop("cursor_factory", None)
+            raw = connection.Database.connect(**params)
+            raw.autocommit = True
+            with raw.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANNEL}")
+                # Read after LISTEN so nothing committed in between is missed
+                cursor.execute("SELECT name, version FROM data_versions")
+                _store(dict(cursor.fetchall()))
+            self.ready = True
+            if hasattr(raw, "poll"):
+                self._psycopg2_loop(raw)
+            else:
+                self._psycopg_loop(raw)
+        except Exception as e:
+            logger.warning("data_versions listener stopped: %s", e)
+        finally:
+            self.ready = False
+            self.retry_at = max(self.retry_at, time.monotonic() + 5)
+            try:
+                raw.close()
+            except Exception:
+                pass
+
+    def _psycopg2_loop(self, raw):
+        while True:
+            if select.select([raw], [], [], 60) == ([], [], []):
+                with raw.cursor() as cursor:
+                    cursor.execute("SELECT 1")  # surfaces a dropped connection
+                continue
+            raw.poll()
+            while raw.notifies:
+                _on_notify(raw.notifies.pop(0).payload)
+
+    def _psycopg_loop(self, raw):
+        while True:
+            # psycopg >= 3.2: the generator ends after `timeout` seconds without notifications
+            for notify in raw.notifies(timeout=60):
+                _on_notify(notify.payload)
+            raw.execute("SELECT 1")
+
+
+def _on_notify(payload):
+    name, _, version = payload.rpartition(":")
+    _store({name: version})
+
+
+def _listening():
+    if _state["backend"] != "db" or connection.vendor != "postgresql":
+        return False
+    if not getattr(settings, "DATA_VERSION_LISTEN", True):
+        return False
+    listener = _state["listener"]
+    if listener is None or (not listener.is_alive() and time.monotonic() >= listener.retry_at):
+        with _lock:
+            if _state["listener"] is listener:
+                _state["listener"] = _Listener()
+                _state["listener"].start()
+    return _state["listener"].ready
+
+
+# -------------------------
+# Public API
+# -------------------------
+def current(name):
+    """Current version of `name` (0 if it was never bumped)."""
+    if _backend() == "file":
+        return _file_current(name)
+    try:
+        return _versions().get(name, 0)
+    except Exception as e:
+        logger.warning("data_versions read failed: %s", e)
+        return 0
+
+
+def _increment(cursor, name):
+    """New version of `name` after +1, or None when its row does not exist yet (one statement)."""
+    if connection.vendor == "postgresql":
+        # NOTIFY is delivered to listeners only when the surrounding transaction commits
+        cursor.execute(
+            "WITH u AS (UPDATE data_versions SET version = version + 1 WHERE name = %s RETURNING version) "
+            "SELECT version, pg_notify(%s, %s || ':' || version) FROM u",
+            [name, CHANNEL, name],
+        )
+    elif connection.features.can_return_columns_from_insert:
+        cursor.execute("UPDATE data_versions SET version = version + 1 WHERE name = %s RETURNING version", [name])
+    else:
+        cursor.execute("UPDATE data_versions SET version = version + 1 WHERE name = %s", [name])
+        cursor.execute("SELECT version FROM data_versions WHERE name = %s", [name])
+    row = cursor.fetchone()
+    return int(row[0]) if row else None
+
+
+def _db_bump(name, changes):
+    # savepoint=False: a failed bump fails the caller's write instead of being swallowed
+    with transaction.atomic(savepoint=False):
+        with connection.cursor() as cursor:
+            version = _increment(cursor, name)
+            if version is None:
+                try:
+                    with transaction.atomic():
+                        # Start from the clock so a recreated table never reuses old versions
+                        cursor.execute(
+                            "INSERT INTO data_versions (name, version) VALUES (%s, %s)",
+                            [name, time.time_ns() // 1000],
+                        )
+                except IntegrityError:
+                    pass  # created by a concurrent first bump
+                version = _increment(cursor, name)
+            if changes:
+                cursor.executemany(
+                    "INSERT INTO data_version_changes (name, version, op, row_key) VALUES (%s, %s, %s, %s)",
+                    [(name, version, op, str(key)) for op, key in changes],
+                )
+            if version % 100 == 0:
+                cursor.execute(
+                    "DELETE FROM data_version_changes WHERE name = %s AND version <= %s",
+                    [name, version - JOURNAL_KEEP_VERSIONS],
+                )
+    return version
+
+
+def writing():
+    """
+    Transaction for a write plus its bump: a new one in autocommit mode, otherwise the caller's
+    (no extra savepoint per row when an uploader already holds a transaction).
+    """
+    return nullcontext() if connection.in_atomic_block else transaction.atomic()
+
+
+@contextmanager
+def batch():
+    """Collapse the bumps made inside the block (e.g. one per uploaded row) into one per name at exit."""
+    if getattr(_batch, "pending", None) is not None:
+        yield
+        return
+    _batch.pending = {}
+    try:
+        yield
+    finally:
+        pending, _batch.pending = _batch.pending, None
+        for name, changes in pending.items():
+            try:
+                bump(name, changes)
+            except Exception as e:
+                logger.warning("data_versions bump failed for %s: %s", name, e)
+
+
+def bump(name, changes=None):
+    """
+    Mark `name` as changed, recording optional (op, key) row changes. Call it in the writer's
+    transaction: the new version becomes visible to other workers exactly when the data does.
+    """
+    db_router.mark_write()
+    changes = list(changes or ())
+    pending = getattr(_batch, "pending", None)
+    if pending is not None:
+        pending.setdefault(name, []).extend(changes)
+        return
+    if _backend() == "file":
+        transaction.on_commit(lambda: _file_apply(name, changes))
+        return
+    version = _db_bump(name, changes)
+    # This worker sees its own write straight away, without waiting for NOTIFY or the next poll
+    transaction.on_commit(lambda: _store({name: version}))
+
+
+def journal_position(name):
+    """Position to read `name`'s changes from later: its version (file backend: [file id, offset])."""
+    if _backend() == "file":
+        return _file_journal_position(name)
+    return current(name)
+
+
+def read_changes(name, start, end):
+    """
+    (op, key) pairs recorded between two journal positions, or None when they cannot be replayed
+    (pruned, rotated, or positions from another backend).
+    """
+    if start == end:
+        return []
+    if _backend() == "file":
+        return _file_read_changes(name, start, end)
+    if not isinstance(start, int) or not isinstance(end, int) or start > end:
+        return None
+    if end - start > JOURNAL_KEEP_VERSIONS:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT op, row_key FROM data_version_changes "
+            "WHERE name = %s AND version > %s AND version <= %s ORDER BY version",
+            [name, start, end],
+        )
+        return [(op, key) for op, key in cursor.fetchall()]
+
+
+# -------------------------
+# File backend (DATA_VERSION_BACKEND=file)
+# -------------------------
+def version_dir():
+    path = getattr(settings, "DATA_VERSION_DIR", None) or os.path.join(tempfile.gettempdir(), "mini_mcu_versions")
+    os.makedirs(path, exist_ok=True)
+    return str(path)
+
+
+def _path(name):
+    return os.path.join(version_dir(), f"{name}.version")
+
+
+def _journal_path(name):
+    return os.path.join(version_dir(), f"{name}.changes")
+
+
+def _file_current(name):
+    try:
+        return os.stat(_path(name)).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def _touch(name):
+    path = _path(name)
+    try:
+        now = time.time_ns()
+        # Strictly increase even when two bumps land within the filesystem's mtime resolution
+        now = max(now, _file_current(name) + 1)
+        with open(path, "a"):
+            pass
+        os.utime(path, ns=(now, now))
+    except Exception:
+        pass
+
+
+def _append_changes(name, changes):
+    path = _journal_path(name)
+    try:
+        if os.path.getsize(path) > JOURNAL_MAX_BYTES:
+            os.replace(path, path + ".old")
+    except OSError:
+        pass
+    try:
+        # One write() in append mode, so lines from concurrent workers do not interleave
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("".join(f"{op} {key}\n" for op, key in changes))
+    except Exception:
+        pass
+
+
+def _file_apply(name, changes):
+    # Journal first: whoever sees the new version must also find its changes
+    if changes:
+        _append_changes(name, changes)
+    _touch(name)
+
+
+def _file_journal_position(name):
+    try:
+        st = os.stat(_journal_path(name))
+        return [st.st_ino, st.st_size]
+    except OSError:
+        return [0, 0]
+
+
+def _file_read_changes(name, start, end):
+    if start == [0, 0] and end:
+        # No journal existed yet at `start`: everything in it now came later
+        start = [end[0], 0]
+    if not isinstance(start, list) or not isinstance(end, list) or start[0] != end[0] or start[1] > end[1]:
+        return None
+    try:
+        with open(_journal_path(name), "rb") as f:
+            f.seek(start[1])
+            data = f.read(end[1] - start[1]).decode("utf-8")
+    except (OSError, UnicodeDecodeError):
+        return None
+    changes = []
+    for line in data.splitlines():
+        op, _, key = line.partition(" ")
+        if op:
+            changes.append((op, key))
+    return changes
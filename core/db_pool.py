@@ -0,0 +1,54 @@
+# core/db_pool.py
+"""
+Connection pool reporting for the PostgreSQL backend.
+
+settings.py turns on Django's psycopg 3 pool (DB_POOL=True, one pool per worker process, sized by
+DB_POOL_MIN_SIZE / DB_POOL_MAX_SIZE), or keeps CONN_MAX_AGE persistent connections. Both paths use
+CONN_HEALTH_CHECKS, so a connection dropped while idle is replaced instead of failing the request.
+This module exposes the pool's own counters: `pool_stats()` for diagnostics
+(`manage.py db_pool_check`), and `record_pool_metrics()` as a core.metrics collector, which publishes
+them on /metrics as mini_mcu_db_pool_* gauges per worker.
+"""
+from django.db import connections
+
+from core import metrics
+
+# psycopg_pool get_stats() key -> metric name
+POOL_METRICS = {
+    "pool_size": "mini_mcu_db_pool_size",
+    "pool_available": "mini_mcu_db_pool_available",
+    "pool_max": "mini_mcu_db_pool_max",
+    "requests_waiting": "mini_mcu_db_pool_requests_waiting",
+    "requests_num": "mini_mcu_db_pool_requests",
+    "requests_wait_ms": "mini_mcu_db_pool_requests_wait_ms",
+    "connections_num": "mini_mcu_db_pool_connections",
+    "connections_errors": "mini_mcu_db_pool_connection_errors",
+    "connections_lost": "mini_mcu_db_pool_connections_lost",
+}
+
+
+def get_pool(alias="default"):
+    """The psycopg_pool.ConnectionPool behind `alias`, or None when it is not pooled."""
+    conn = connections[alias]
+    if conn.vendor != "postgresql":
+        return None
+    try:
+        return conn.pool
+    except Exception:
+        return None
+
+
+def pool_stats():
+    """{alias: stats dict} for every pooled database alias in this worker."""
+    stats = {}
+    for alias in connections:
+        pool = get_pool(alias)
+        if pool is not None:
+            stats[alias] = dict(pool.get_stats())
+    return stats
+
+
+def record_pool_metrics():
+    for alias, stats in pool_stats().items():
+        for key, name in POOL_METRICS.items():
+            metrics.set_gauge(name, stats.get(key, 0), {"alias": alias})
@@ -0,0 +1,172 @@
+# core/db_router.py
+"""
+Optional read replica for the read-heavy paths: grafik JSON endpoints, exports, QR bulk download.
+
+DATABASES["replica"] exists only when DATABASE_REPLICA_URL (or DJANGO_SQLITE_REPLICA with
+DJANGO_USE_SQLITE) is set. Reads go there only inside `replica_reads` (a decorator / context manager
+on the designated views and core.queries readers), and only while:
+
+- no `primary()` block is active: snapshot builds and data versions must see the primary,
+  otherwise a lagging replica would be published under the primary's version;
+- the session has not written within REPLICA_STICKY_SECONDS, nor in the current request
+  (read-your-writes, see ReadYourWritesMiddleware);
+- the replica answered its last connection attempt. After a failure, reads use default for
+  REPLICA_RETRY_SECONDS.
+
+Writes always go to default. ReplicaRouter routes ORM reads; the raw readers in core.db_utils run on
+read_connection().
+"""
+import functools
+import inspect
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core.instrumentation import logger
+
+REPLICA = "replica"
+# Session key: epoch seconds until which this session reads from default only
+SESSION_KEY = "_db_primary_until"
+
+_mode = ContextVar("db_read_mode", default=None)        # None | "replica" | "primary"
+_request = ContextVar("db_request_state", default=None)  # {"pinned": bool, "wrote": bool} per request
+_down_until = {"at": 0.0}
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+def _replica_available():
+    if time.monotonic() < _down_until["at"]:
+        return False
+    try:
+        connections[REPLICA].ensure_connection()
+        return True
+    except Exception as e:
+        mark_replica_down(e)
+        return False
+
+
+def mark_replica_down(error=None):
+    """Send reads to default for REPLICA_RETRY_SECONDS (connection or query failure on the replica)."""
+    _down_until["at"] = time.monotonic() + float(getattr(settings, "REPLICA_RETRY_SECONDS", 30))
+    logger.warning("read replica unavailable, reading from default: %s", error)
+
+
+def mark_write():
+    """Record that the current request wrote, so its later reads (and the session's) stay on default."""
+    state = _request.get()
+    if state is not None:
+        state["wrote"] = True
+
+
+def read_alias():
+    """Alias the current read should use."""
+    if _mode.get() != "replica" or not replica_configured():
+        return DEFAULT_DB_ALIAS
+    state = _request.get()
+    if state is not None and (state["pinned"] or state["wrote"]):
+        return DEFAULT_DB_ALIAS
+    return REPLICA if _replica_available() else DEFAULT_DB_ALIAS
+
+
+def read_connection():
+    return connections[read_alias()]
+
+
+@contextmanager
+def _reading(mode):
+    token = _mode.set(mode)
+    try:
+        yield
+    finally:
+        _mode.reset(token)
+
+
+def primary():
+    """Block whose reads must see the primary, even inside replica_reads."""
+    return _reading("primary")
+
+
+@contextmanager
+def _replica_block():
+    # A primary() block further out wins
+    with _reading("primary" if _mode.get() == "primary" else "replica"):
+        yield
+
+
+def replica_reads(func=None):
+    """
+    Send the reads of `func` (a view, function or generator function) to the replica when that is
+    safe; without `func`, a context manager doing the same for a block.
+    """
+    if func is None:
+        return _replica_block()
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def generator(*args, **kwargs):
+            # Only each step runs in the block: the consumer's code between items keeps its own routing
+            inner = func(*args, **kwargs)
+            try:
+                while True:
+                    with _replica_block():
+                        try:
+                            item = next(inner)
+                        except StopIteration:
+                            return
+                    yield item
+            finally:
+                inner.close()
+        return generator
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with _replica_block():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    """ORM routing: reads per read_alias(), writes (and migrations) on default."""
+
+    def db_for_read(self, model, **hints):
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        mark_write()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReadYourWritesMiddleware:
+    """
+    Keeps a session on default for REPLICA_STICKY_SECONDS after a request that wrote, so a redirect
+    after a save never reads a replica that has not caught up. A no-op without a replica.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not replica_configured():
+            return self.get_response(request)
+        session = getattr(request, "session", None)
+        pinned = bool(session is not None and session.get(SESSION_KEY, 0) > time.time())
+        state = {"pinned": pinned, "wrote": False}
+        token = _request.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request.reset(token)
+        if state["wrote"] and session is not None:
+            session[SESSION_KEY] = time.time() + float(getattr(settings, "REPLICA_STICKY_SECONDS", 15))
+        return response
@@ -1,6 +1,9 @@
 # core/db_utils.py
-from django.db import connection, transaction
-from core import core_models
+import datetime
+import decimal
+
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connection, connections, models, transaction
+from core import core_models, db_router
 
 
 # -----------------------------
@@ -12,23 +15,41 @@ def execute_raw(sql, params=None):
     Example:
         execute_raw("UPDATE users SET role=%s WHERE id=%s", ["Manager", 1])
     """
+    db_router.mark_write()
     with connection.cursor() as cursor:
         cursor.execute(sql, params or [])
     # Auto-commit is handled by Django unless inside @transaction.atomic
 
 
+def _read(run):
+    """
+    run(connection) on the routed read connection (core.db_router); when that is the replica and it
+    fails, mark it down and run again on default.
+    """
+    alias = db_router.read_alias()
+    try:
+        return run(connections[alias])
+    except OperationalError as e:
+        if alias == DEFAULT_DB_ALIAS:
+            raise
+        db_router.mark_replica_down(e)
+        return run(connections[DEFAULT_DB_ALIAS])
+
+
 def fetch_one(sql, params=None):
     """
     Fetch a single row from raw SQL.
     Returns dict or None.
     """
-    with connection.cursor() as cursor:
-        cursor.execute(sql, params or [])
-        row = cursor.fetchone()
-        if row is None:
-            return None
-        col_names = [col[0] for col in cursor.description]
-        return dict(zip(col_names, row))
+    def run(conn):
+        with conn.cursor() as cursor:
+            cursor.execute(sql, params or [])
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            col_names = [col[0] for col in cursor.description]
+            return dict(zip(col_names, row))
+    return _read(run)
 
 
 def fetch_all(sql, params=None):
@@ -36,11 +57,148 @@ def fetch_all(sql, params=None):
     Fetch multiple rows from raw SQL.
     Returns list of dicts.
     """
-    with connection.cursor() as cursor:
+    def run(conn):
+        with conn.cursor() as cursor:
+            cursor.execute(sql, params or [])
+            rows = cursor.fetchall()
+            col_names = [col[0] for col in cursor.description]
+            return [dict(zip(col_names, row)) for row in rows]
+    return _read(run)
+
+
+# -----------------------------
+# Columnar fetch (raw cursor -> typed NumPy columns)
+# -----------------------------
+def column_types(*model_classes):
+    """
+    Map db column name -> fetch kind ("float", "int", "date", "str") from model fields, so
+    fetch_frame can type columns even where the driver returns strings (SQLite dates/decimals).
+    """
+    kinds = {}
+    for model in model_classes:
+        for field in model._meta.concrete_fields:
+            if isinstance(field, (models.DecimalField, models.FloatField)):
+                kind = "float"
+            elif isinstance(field, (models.IntegerField, models.AutoField)) and not field.is_relation:
+                kind = "int"
+            elif isinstance(field, (models.DateField, models.DateTimeField)):
+                kind = "date"
+            else:
+                kind = "str"
+            kinds.setdefault(field.column, kind)
+    return kinds
+
+
+def _infer_kind(values):
+    for v in values:
+        if v is None:
+            continue
+        if isinstance(v, bool):
+            return "str"
+        if isinstance(v, (decimal.Decimal, float)):
+            return "float"
+        if isinstance(v, int):
+            return "int"
+        if isinstance(v, (datetime.date, datetime.datetime)):
+            return "date"
+        return "str"
+    return "str"
+
+
+def _to_column(values, kind):
+    import numpy as np
+    import pandas as pd
+
+    n = len(values)
+    if kind is None:
+        kind = _infer_kind(values)
+    if kind == "int" and any(v is None for v in values):
+        kind = "float"  # same upcast pandas applies to integer columns with NULLs
+    if kind == "float":
+        return np.fromiter((np.nan if v is None else float(v) for v in values), dtype=np.float64, count=n)
+    if kind == "int":
+        return np.fromiter(values, dtype=np.int64, count=n)
+    if kind == "date":
+        try:
+            return np.array(values, dtype="datetime64[ns]")
+        except (TypeError, ValueError):
+            # tz-aware datetimes or unparsable strings
+            return pd.to_datetime(pd.Series(values, dtype=object), errors="coerce").dt.tz_localize(None).to_numpy()
+    if kind == "category":
+        return pd.Categorical(values)
+    column = np.empty(n, dtype=object)
+    column[:] = values
+    return column
+
+
+def fetch_columns(sql, params=None, types=None):
+    """
+    Run raw SQL and return {column: typed array} built straight from cursor.fetchall().
+    `types` maps column -> "float" | "int" | "date" | "category" | "str"; other columns are inferred
+    from their first non-NULL value (Decimal -> float64, date -> datetime64[ns], ...).
+    """
+    def run(conn):
+        with conn.cursor() as cursor:
+            cursor.execute(sql, params or [])
+            return [col[0] for col in cursor.description], cursor.fetchall()
+
+    names, rows = _read(run)
+    types = types or {}
+    by_column = list(zip(*rows)) if rows else [()] * len(names)
+    return {name: _to_column(values, types.get(name)) for name, values in zip(names, by_column)}
+
+
+def fetch_frame(sql, params=None, types=None, categorical=None, category_max_ratio=0.5):
+    """
+    fetch_columns() as a DataFrame. `categorical` lists text columns to store as pandas categoricals,
+    or True to convert every text column whose distinct values are at most `category_max_ratio` of the rows.
+    """
+    import pandas as pd
+
+    columns = fetch_columns(sql, params, types)
+    if categorical:
+        for name, column in columns.items():
+            if getattr(column, "dtype", None) != object:
+                continue
+            if categorical is True:
+                n = len(column)
+                if not n or len(set(column)) > category_max_ratio * n:
+                    continue
+            elif name not in categorical:
+                continue
+            columns[name] = pd.Categorical(column)
+    return pd.DataFrame(columns, copy=False)
+
+
+def export_chunk_size():
+    from django.conf import settings
+    return int(getattr(settings, "EXPORT_CHUNK_SIZE", 2000))
+
+
+def iter_frames(sql, params=None, types=None, chunk_size=None):
+    """
+    Stream a query as DataFrames of at most `chunk_size` rows (EXPORT_CHUNK_SIZE by default).
+    Uses connection.chunked_cursor(): a named server-side cursor on PostgreSQL (the same one
+    QuerySet.iterator() uses, honouring DISABLE_SERVER_SIDE_CURSORS), a plain cursor elsewhere, so only
+    one chunk of rows is held in Python at a time. Consume the generator fully or close() it.
+    Runs on the routed read connection (core.db_router) chosen when the query starts.
+    """
+    import pandas as pd
+
+    chunk_size = chunk_size or export_chunk_size()
+    types = types or {}
+    with db_router.read_connection().chunked_cursor() as cursor:
         cursor.execute(sql, params or [])
-        rows = cursor.fetchall()
-        col_names = [col[0] for col in cursor.description]
-        return [dict(zip(col_names, row)) for row in rows]
+        names = [col[0] for col in cursor.description]
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            by_column = list(zip(*rows))
+            yield pd.DataFrame(
+                {name: _to_column(values, types.get(name)) for name, values in zip(names, by_column)},
+                copy=False,
+            )
 
 
 # -----------------------------
@@ -0,0 +1,176 @@
+# core/employee_search.py
+"""
+Typeahead search over the employee master (nama, jabatan, uid).
+
+One EmployeeIndex per worker, built from get_employees() and rebuilt when core.data_version's
+KARYAWAN version changes (master writes) or after DATA_SNAPSHOT_MAX_AGE. Text is normalized
+(lower case, accents and repeated spaces removed) and indexed twice:
+
+- a sorted token list, so every word of the query can be matched as a word prefix with bisect;
+- trigram postings, so substrings of 3+ characters are found without scanning every row.
+
+search() ranks exact uid, nama prefix, uid prefix, word prefix, then substring matches (nama first),
+ties by nama, and returns the top `limit`. It backs the picker endpoint (karyawan_search_json)
+and the dashboards' nama filter (filter_by_nama).
+"""
+import bisect
+import heapq
+import unicodedata
+
+from django.conf import settings
+
+from core import data_version
+from utils.cache_utils import get_cache, set_cache
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+_CACHE_KEY = "employee_search"
+
+
+def normalize(text) -> str:
+    text = unicodedata.normalize("NFKD", str(text or ""))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.lower().split())
+
+
+def _trigrams(text: str):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _text(value) -> str:
+    if value is None:
+        return ""
+    text = str(value)
+    return "" if text in ("nan", "NaT", "None") else text
+
+
+class EmployeeIndex:
+    def __init__(self, df):
+        cols = {c: (df[c].tolist() if df is not None and c in df.columns else []) for c in ("uid", "nama", "jabatan", "lokasi")}
+        n = len(cols["uid"])
+        self.rows = [
+            {key: _text(cols[key][i]) if cols[key] else "" for key in ("uid", "nama", "jabatan", "lokasi")}
+            for i in range(n)
+        ]
+        self._nama = [normalize(r["nama"]) for r in self.rows]
+        self._jabatan = [normalize(r["jabatan"]) for r in self.rows]
+        self._uid = [normalize(r["uid"]) for r in self.rows]
+        self._lokasi = [normalize(r["lokasi"]) for r in self.rows]
+        self._by_uid = {r["uid"]: i for i, r in enumerate(self.rows)}
+
+        # Rows in nama order; rank[i] breaks ties and orders the empty query
+        self._order = sorted(range(n), key=lambda i: (self._nama[i], self._uid[i]))
+        self._rank = [0] * n
+        for pos, i in enumerate(self._order):
+            self._rank[i] = pos
+
+        tokens = sorted(
+            {(tok, i) for i in range(n) for field in (self._nama[i], self._jabatan[i], self._uid[i]) for tok in field.split()}
+        )
+        self._tokens = [t for t, _ in tokens]
+        self._token_rows = [i for _, i in tokens]
+
+        # Fields joined with a separator no query contains, so trigrams never span two fields
+        self._trigram_rows = {}
+        for i in range(n):
+            for tri in _trigrams("\x00".join((self._nama[i], self._jabatan[i], self._uid[i]))):
+                self._trigram_rows.setdefault(tri, []).append(i)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _prefix_rows(self, word):
+        lo = bisect.bisect_left(self._tokens, word)
+        hi = bisect.bisect_left(self._tokens, word + "\uffff")
+        return set(self._token_rows[lo:hi])
+
+    def _substring_rows(self, q):
+        """Rows where `q` occurs in nama, jabatan or uid."""
+        if len(q) < 3:
+            candidates = range(len(self.rows))
+        else:
+            postings = sorted((self._trigram_rows.get(t, ()) for t in _trigrams(q)), key=len)
+            if not postings or not postings[0]:
+                return set()
+            candidates = set(postings[0]).intersection(*postings[1:])
+        return {i for i in candidates if q in self._nama[i] or q in self._jabatan[i] or q in self._uid[i]}
+
+    def _tier(self, i, q):
+        if self._uid[i] == q:
+            return 0
+        if self._nama[i].startswith(q):
+            return 1
+        if self._uid[i].startswith(q):
+            return 2
+        if self._word_match(i, q):
+            return 3
+        return 4 if q in self._nama[i] else 5
+
+    def _word_match(self, i, q):
+        tokens = (self._nama[i] + " " + self._jabatan[i] + " " + self._uid[i]).split()
+        return all(any(t.startswith(w) for t in tokens) for w in q.split())
+
+    def search(self, query, lokasi=None, limit=DEFAULT_LIMIT):
+        q = normalize(query)
+        lok = normalize(lokasi) if lokasi else ""
+        limit = max(1, min(int(limit or DEFAULT_LIMIT), MAX_LIMIT))
+        if not q:
+            matches = (i for i in self._order if not lok or self._lokasi[i] == lok)
+            return [dict(self.rows[i]) for _, i in zip(range(limit), matches)]
+
+        words = q.split()
+        candidates = self._prefix_rows(words[0])
+        for w in words[1:]:
+            candidates &= self._prefix_rows(w)
+        candidates |= self._substring_rows(q)
+        if lok:
+            candidates = {i for i in candidates if self._lokasi[i] == lok}
+        best = heapq.nsmallest(limit, candidates, key=lambda i: (self._tier(i, q), self._rank[i]))
+        return [dict(self.rows[i]) for i in best]
+
+    def matching_uids(self, text):
+        """uids whose nama contains `text` (normalized)."""
+        q = normalize(text)
+        rows = self._substring_rows(q) if q else range(len(self.rows))
+        return {self.rows[i]["uid"] for i in rows if q in self._nama[i]}
+
+    def get(self, uid):
+        i = self._by_uid.get(str(uid))
+        return dict(self.rows[i]) if i is not None else None
+
+
+def get_index() -> EmployeeIndex:
+    """This worker's index for the current employee master."""
+    version = data_version.current(data_version.KARYAWAN)
+    cached = get_cache(_CACHE_KEY)
+    if cached and cached["version"] == version:
+        return cached["value"]
+    from core.queries import get_employees
+
+    index = EmployeeIndex(get_employees())
+    set_cache(_CACHE_KEY, {"version": version, "value": index}, ttl=int(getattr(settings, "DATA_SNAPSHOT_MAX_AGE", 600)))
+    return index
+
+
+def search(query, lokasi=None, limit=DEFAULT_LIMIT):
+    return get_index().search(query, lokasi=lokasi, limit=limit)
+
+
+def get_employee(uid):
+    """{uid, nama, jabatan, lokasi} for `uid`, or None."""
+    return get_index().get(uid) if uid else None
+
+
+def picker_options(uid):
+    """Options a server-rendered employee <select> needs: only the selected employee ({uid, nama})."""
+    emp = get_employee(uid) if uid and uid != "all" else None
+    return [{"uid": emp["uid"], "nama": emp["nama"]}] if emp else []
+
+
+def filter_by_nama(df, nama):
+    """Rows of `df` whose employee nama contains `nama` (case and accents ignored), matched by uid."""
+    if not nama or df is None or getattr(df, "empty", True):
+        return df
+    if "uid" not in df.columns:
+        return df[df["nama"].astype(str).str.contains(str(nama), case=False, na=False, regex=False)]
+    return df[df["uid"].astype(str).isin(get_index().matching_uids(nama))]
@@ -1,12 +1,19 @@
 # core/excel_parser.py (V2)
+import os
 import pandas as pd
 import uuid
 import re
 import logging
 from core.core_models import Karyawan  # adjust import to your actual model
 from utils.validators import normalize_string, validate_lokasi, safe_date, safe_float
-from core.queries import get_karyawan_uid_bulk, insert_medical_checkup
-from django.db import connection
+from core.queries import get_karyawan_uid_bulk, karyawan_uid_candidates, match_karyawan_uids
+from django.db import connection, transaction
+from core.instrumentation import timed
+from core.ingest import (
+    CheckupWriter, bulk_statements, chunk_rows, iter_chunks, map_sheets, map_text_chunks, parse_workers, text_format,
+)
+from core.query_budget import QueryBudgetExceeded, query_budget
+from core import data_version, metrics
 
 logger = logging.getLogger(__name__)
 
@@ -77,20 +84,21 @@ def map_columns(df: pd.DataFrame):
     return mapped
 
 
-# Helper: discover actual DB columns for unmanaged table
+# Helper: discover actual DB columns for unmanaged table (once per process)
 _def_db_cols_cache = {}
 
 def _get_db_columns(table_name: str):
     if table_name in _def_db_cols_cache:
         return _def_db_cols_cache[table_name]
     try:
+        # One empty SELECT; introspection's get_table_description costs a query per column on SQLite
         with connection.cursor() as cursor:
-            desc = connection.introspection.get_table_description(cursor, table_name)
-            cols = {col.name for col in desc}
-            _def_db_cols_cache[table_name] = cols
-            return cols
+            cursor.execute(f"SELECT * FROM {connection.ops.quote_name(table_name)} WHERE 1 = 0")
+            cols = {col[0] for col in cursor.description}
     except Exception:
         return set()
+    _def_db_cols_cache[table_name] = cols
+    return cols
 
 # Helper: parse age robustly from numeric or mixed strings (e.g., '33 tahun')
 def _parse_age(val):
@@ -114,111 +122,171 @@ def _parse_age(val):
     return None
 
 
-def parse_master_karyawan(file_path):
+def _prepare_master_sheet(sheet_df: pd.DataFrame, sheet_name):
+    """(([(row, uid, values), ...], skipped_rows), None) for one master sheet; runs in parse workers."""
+    # ✅ normalize column names to handle variants robustly
+    sheet_df.columns = sheet_df.columns.str.strip()
+    # Default lokasi from sheet name (used as fallback only)
+    sheet_lokasi = normalize_string(sheet_name)
+
+    col_map = map_columns(sheet_df)
+    logger.debug(f"Master upload: sheet='{sheet_name}' mapped columns: {col_map}")
+    rename_dict = {v: k for k, v in col_map.items() if v}
+    sheet_df = sheet_df.rename(columns=rename_dict)
+
+    # Keep only relevant columns
+    cols_to_keep = [c for c in DB_COLUMNS.keys() if c in sheet_df.columns]
+    sheet_df = sheet_df[cols_to_keep]
+    logger.debug(f"Master upload: sheet='{sheet_name}' columns after keep-filter: {list(sheet_df.columns)}")
+
+    records, skipped_rows = [], []
+    # Iterate rows and apply schema-adhering conversions
+    for idx, row in sheet_df.iterrows():
+        # Prefer UID from file if present
+        uid_value = normalize_string(row.get("uid")) if "uid" in sheet_df.columns else ""
+        nama = normalize_string(row.get("nama"))
+        jabatan = normalize_string(row.get("jabatan"))
+        tanggal_lahir = safe_date(row.get("tanggal_lahir"))
+        tanggal_mcu = safe_date(row.get("tanggal_MCU"))
+        expired_mcu = safe_date(row.get("expired_MCU"))
+        # Normalize derajat_kesehatan to uppercase P1..P7 without extra spaces
+        derajat_kesehatan = row.get("derajat_kesehatan")
+        if derajat_kesehatan is not None:
+            try:
+                derajat_kesehatan = str(derajat_kesehatan).strip().upper()
+            except Exception:
+                derajat_kesehatan = None
+        # Anthropometrics
+        tinggi = safe_float(row.get("tinggi")) if "tinggi" in sheet_df.columns else None
+        berat = safe_float(row.get("berat")) if "berat" in sheet_df.columns else None
+        bmi = safe_float(row.get("bmi")) if "bmi" in sheet_df.columns else None
+        bmi_category = normalize_string(row.get("bmi_category")) if "bmi_category" in sheet_df.columns else None
+        # Age from XLS (no auto-calculation)
+        umur = _parse_age(row.get("umur")) if "umur" in sheet_df.columns else None
+
+        # Determine lokasi: prefer column value; fallback to sheet name
+        lokasi_cell = normalize_string(row.get("lokasi")) if "lokasi" in sheet_df.columns else ""
+        lokasi = lokasi_cell if validate_lokasi(lokasi_cell) else sheet_lokasi
+
+        # Minimal requirement: have UID or Name to create a record
+        if not uid_value and not nama:
+            skipped_rows.append((sheet_name, idx, "Missing uid and nama"))
+            continue
+
+        # If neither column nor sheet provided a valid lokasi, fallback to sheet name anyway (do not skip)
+        if not validate_lokasi(lokasi):
+            lokasi = sheet_lokasi
+
+        # Determine UID
+        uid = uid_value if uid_value else str(uuid.uuid5(uuid.NAMESPACE_DNS, f"{nama}-{jabatan}"))
+
+        records.append((idx, uid, {
+            "nama": nama or None,
+            "jabatan": jabatan or None,
+            "lokasi": lokasi,
+            "tanggal_lahir": tanggal_lahir,
+            "umur": umur,
+            "tanggal_MCU": tanggal_mcu,
+            "expired_MCU": expired_mcu,
+            "derajat_kesehatan": derajat_kesehatan,
+            "tinggi": tinggi,
+            "berat": berat,
+            "bmi": bmi,
+            "bmi_category": bmi_category,
+        }))
+    if skipped_rows:
+        logger.debug(f"Master upload: sheet='{sheet_name}' skipped_rows example: {skipped_rows[:3]}")
+    return (records, skipped_rows), None
+
+
+def _master_write_budget(rows, db_cols):
+    """Statements _write_master_rows(rows) may take: savepoint pair, one SELECT per 500 uids, then
+    the INSERT and UPDATE batches."""
+    fields = {k for values in rows.values() for k in values} & set(db_cols)
+    return 2 + -(-len(rows) // 500) + 2 * bulk_statements(len(rows), fields, batch_size=500)
+
+
+def _write_master_rows(rows, db_cols):
+    """
+    Save {uid: values} in one transaction: one SELECT of the existing uids per 500, then one bulk INSERT
+    and one bulk UPDATE. Only columns that exist in the DB (`db_cols`) are written.
+    """
+    uids = list(rows)
+    with transaction.atomic():
+        existing = set()
+        for i in range(0, len(uids), 500):
+            existing.update(Karyawan.objects.filter(uid__in=uids[i:i + 500]).values_list("uid", flat=True))
+        new = [Karyawan(uid=uid, **rows[uid]) for uid in uids if uid not in existing]
+        changed = [Karyawan(uid=uid, **rows[uid]) for uid in uids if uid in existing]
+        fields = sorted({k for values in rows.values() for k in values} & set(db_cols))
+        if new:
+            Karyawan.objects.bulk_create(new, batch_size=500)
+        if changed and fields:
+            Karyawan.objects.bulk_update(changed, fields, batch_size=500)
+
+
+@timed()
+def parse_master_karyawan(file_path, workers=None):
     """
     Upload master karyawan data (V2):
     - Prefer a 'lokasi' column per row; fallback to sheet name
     - Columns: uid (optional), nama, jabatan, tanggal_lahir, tanggal_MCU, expired_MCU, derajat_kesehatan
     - Insert/update into Karyawan DB, adhering to schema (most fields nullable)
+    - Sheets are normalized one at a time, or in parallel with UPLOAD_PARSE_WORKERS > 1 (core.ingest),
+      then written in file order with one bulk write
+    - CSV, TSV and NDJSON files (by extension) are read in chunks instead; lokasi falls back to the file name
     """
-    all_sheets = pd.read_excel(file_path, sheet_name=None)
-    total_inserted, total_skipped = 0, 0
     batch_id = str(uuid.uuid4())
     skipped_rows = []
+    records = []  # (sheet_name, row, uid, values) in file order
     db_cols = _get_db_columns('karyawan')  # only write columns that actually exist
 
-    for sheet_name, sheet_df in all_sheets.items():
-        # ✅ normalize column names to handle variants robustly
-        sheet_df.columns = sheet_df.columns.str.strip()
-        # Default lokasi from sheet name (used as fallback only)
-        sheet_lokasi = normalize_string(sheet_name)
-
-        col_map = map_columns(sheet_df)
-        print(f"Master upload: sheet='{sheet_name}' mapped columns: {col_map}")
-        rename_dict = {v: k for k, v in col_map.items() if v}
-        sheet_df = sheet_df.rename(columns=rename_dict)
-
-        # Keep only relevant columns
-        cols_to_keep = [c for c in DB_COLUMNS.keys() if c in sheet_df.columns]
-        sheet_df = sheet_df[cols_to_keep]
-        print(f"Master upload: sheet='{sheet_name}' columns after keep-filter: {list(sheet_df.columns)}")
-
-        # Iterate rows and apply schema-adhering conversions
-        for idx, row in sheet_df.iterrows():
-            # Prefer UID from file if present
-            uid_value = normalize_string(row.get("uid")) if "uid" in sheet_df.columns else ""
-            nama = normalize_string(row.get("nama"))
-            jabatan = normalize_string(row.get("jabatan"))
-            tanggal_lahir = safe_date(row.get("tanggal_lahir"))
-            tanggal_mcu = safe_date(row.get("tanggal_MCU"))
-            expired_mcu = safe_date(row.get("expired_MCU"))
-            # Normalize derajat_kesehatan to uppercase P1..P7 without extra spaces
-            derajat_kesehatan = row.get("derajat_kesehatan")
-            if derajat_kesehatan is not None:
-                try:
-                    derajat_kesehatan = str(derajat_kesehatan).strip().upper()
-                except Exception:
-                    derajat_kesehatan = None
-            # Anthropometrics
-            tinggi = safe_float(row.get("tinggi")) if "tinggi" in sheet_df.columns else None
-            berat = safe_float(row.get("berat")) if "berat" in sheet_df.columns else None
-            bmi = safe_float(row.get("bmi")) if "bmi" in sheet_df.columns else None
-            bmi_category = normalize_string(row.get("bmi_category")) if "bmi_category" in sheet_df.columns else None
-            # Age from XLS (no auto-calculation)
-            umur = _parse_age(row.get("umur")) if "umur" in sheet_df.columns else None
-
-            # Determine lokasi: prefer column value; fallback to sheet name
-            lokasi_cell = normalize_string(row.get("lokasi")) if "lokasi" in sheet_df.columns else ""
-            lokasi = lokasi_cell if validate_lokasi(lokasi_cell) else sheet_lokasi
-
-            # Minimal requirement: have UID or Name to create a record
-            if not uid_value and not nama:
-                total_skipped += 1
-                skipped_rows.append((sheet_name, idx, "Missing uid and nama"))
-                continue
-
-            # If neither column nor sheet provided a valid lokasi, fallback to sheet name anyway (do not skip)
-            if not validate_lokasi(lokasi):
-                lokasi = sheet_lokasi
-
-            # Determine UID
-            uid = uid_value if uid_value else str(uuid.uuid5(uuid.NAMESPACE_DNS, f"{nama}-{jabatan}"))
-
-            # Build all possible updates then filter by actual DB columns
-            defaults = {
-                "nama": nama or None,
-                "jabatan": jabatan or None,
-                "lokasi": lokasi,
-                "tanggal_lahir": tanggal_lahir,
-                "umur": umur,
-                "tanggal_MCU": tanggal_mcu,
-                "expired_MCU": expired_mcu,
-                "derajat_kesehatan": derajat_kesehatan,
-                "tinggi": tinggi,
-                "berat": berat,
-                "bmi": bmi,
-                "bmi_category": bmi_category,
-                # don't include upload_batch_id if DB doesn't have it
-                "upload_batch_id": batch_id,
-            }
-            safe_updates = {k: v for k, v in defaults.items() if k in db_cols}
+    fmt = text_format(file_path)
+    if fmt:
+        # CSV/TSV/NDJSON (HRIS exports): read in chunks, each prepared like a sheet named after the file
+        label = os.path.splitext(os.path.basename(str(getattr(file_path, "name", file_path))))[0]
+        sheets = ((label, prepared) for _, prepared in map_text_chunks(file_path, _prepare_master_sheet, label, fmt))
+    else:
+        sheets = map_sheets(file_path, _prepare_master_sheet, workers=workers)
+    for sheet_name, (prepared, reason) in sheets:
+        if prepared is None:
+            skipped_rows.append((sheet_name, "all", reason))
+            continue
+        sheet_records, sheet_skipped = prepared
+        records += [(sheet_name, idx, uid, values) for idx, uid, values in sheet_records]
+        skipped_rows += sheet_skipped
+
+    # A uid seen twice keeps the values of its last row, as with row-by-row saves
+    rows = {}
+    for _, _, uid, values in records:
+        values = dict(values, upload_batch_id=batch_id)  # dropped below if the DB has no such column
+        rows[uid] = {k: v for k, v in values.items() if k in db_cols}
 
+    total_inserted = 0
+    try:
+        if rows:
+            # Budget the bulk write only: the row-by-row fallback below is the slow path by design
+            with query_budget(_master_write_budget(rows, db_cols), name="parse_master_karyawan bulk write"):
+                _write_master_rows(rows, db_cols)
+        total_inserted = len(records)
+    except QueryBudgetExceeded:
+        # Raised after the write committed: a regression to report, not rows to retry
+        raise
+    except Exception as e:
+        # Row by row, so the rows the DB rejects are reported individually
+        logger.warning(f"Master upload: bulk write failed ({e}); saving row by row")
+        for sheet_name, idx, uid, values in records:
             try:
-                # Avoid update_or_create to prevent ORM selecting non-existent columns on unmanaged tables
-                if Karyawan.objects.filter(uid=uid).exists():
-                    Karyawan.objects.filter(uid=uid).update(**safe_updates)
-                else:
-                    create_data = {"uid": uid}
-                    create_data.update(safe_updates)
-                    Karyawan.objects.create(**create_data)
+                _write_master_rows({uid: rows[uid]}, db_cols)
                 total_inserted += 1
-            except Exception as e:
-                total_skipped += 1
-                skipped_rows.append((sheet_name, idx, str(e)))
-        if skipped_rows:
-            print(f"Master upload: sheet='{sheet_name}' skipped_rows example: {skipped_rows[:3]}")
-
-    print(f"Master upload: total_inserted={total_inserted}, total_skipped={total_skipped}")
+            except Exception as row_error:
+                skipped_rows.append((sheet_name, idx, str(row_error)))
+    total_skipped = len(skipped_rows)
+
+    logger.debug(f"Master upload: total_inserted={total_inserted}, total_skipped={total_skipped}")
+    metrics.record_upload("master_karyawan", total_inserted, total_skipped)
+    if total_inserted:
+        data_version.bump(data_version.KARYAWAN)
     return {
         "inserted": total_inserted,
         "skipped": total_skipped,
@@ -286,6 +354,7 @@ def _map_extended_columns(df: pd.DataFrame):
     return mapped
 
 
+@timed()
 def parse_master_preview(file_obj):
     """
     Read the uploaded Excel and return a DataFrame containing extended columns for display.
@@ -336,120 +405,112 @@ def parse_master_preview(file_obj):
     return preview_df
 
 
-def parse_checkup_anthropometric(file_obj):
+def _anthropometric_headers(df: pd.DataFrame) -> pd.DataFrame:
+    """Rename a sheet's headers to canonical anthropometric columns."""
+    # Normalize original headers for mapping
+    df.columns = df.columns.str.strip().str.lower()
+    mapping = _map_extended_columns(df)
+    rename_dict = {v: k for k, v in mapping.items() if v}
+    # Fallback substring-based renaming to catch unit-suffixed headers
+    auto_map = {}
+    for col in df.columns:
+        if col in rename_dict.values():
+            continue
+        c = str(col).strip().lower().replace(' ', '_')
+        if ('tinggi' in c) or ('height' in c) or c.startswith('tb'):
+            auto_map[col] = 'tinggi'
+        elif ('berat' in c) or ('weight' in c) or c.startswith('bb'):
+            auto_map[col] = 'berat'
+        elif ('bmi' in c) or ('imt' in c) or ('body_mass_index' in c):
+            auto_map[col] = 'bmi'
+    if auto_map:
+        df = df.rename(columns=auto_map)
+    # Apply explicit mapping after fallback to ensure canonical keys
+    return df.rename(columns=rename_dict)
+
+
+def prepare_anthropometric_sheet(df: pd.DataFrame, sheet_name, employees=None):
+    """
+    (frame, None) with typed anthropometric checkup columns for one sheet, or (None, reason).
+    Without a uid column, uids are resolved from nama/jabatan/lokasi/tanggal_lahir against `employees`
+    (karyawan_uid_candidates(); parse workers get them from the parent) or with one query when None.
+    """
+    df = _anthropometric_headers(df)
+    if "uid" not in df.columns and not {"nama", "jabatan"}.issubset(df.columns):
+        # Require at least nama and jabatan for mapping
+        return None, "Missing nama/jabatan for UID mapping"
+
+    # Ensure lokasi filled
+    sheet_lokasi = normalize_string(sheet_name)
+    if "lokasi" not in df.columns or df["lokasi"].isnull().all():
+        df["lokasi"] = sheet_lokasi
+
+    # Ensure tanggal_checkup; fall back to 'tanggal_MCU' if present
+    if "tanggal_checkup" not in df.columns:
+        if "tanggal_MCU" in df.columns:
+            df["tanggal_checkup"] = df["tanggal_MCU"]
+        else:
+            df["tanggal_checkup"] = pd.Timestamp.today().date()
+
+    # Type safety for dates (day-first) and normalize via safe_date
+    for col in ["tanggal_lahir", "tanggal_checkup"]:
+        if col in df.columns:
+            df[col] = df[col].apply(lambda x: safe_date(pd.to_datetime(x, dayfirst=True, errors="coerce")))
+
+    # Clean anthropometric numerics (no BMI auto-calculation; use XLS-provided value as-is)
+    for col in ["tinggi", "berat", "bmi", "umur"]:
+        if col in df.columns:
+            df[col] = df[col].apply(safe_float)
+
+    # Determine UID mapping if not provided
+    if "uid" not in df.columns:
+        try:
+            # Normalize text keys to match master DB values
+            for col in ["nama", "jabatan", "lokasi"]:
+                if col in df.columns:
+                    df[col] = df[col].apply(normalize_string)
+            if "tanggal_lahir" not in df.columns:
+                df["tanggal_lahir"] = None
+            uid_map = match_karyawan_uids(df, employees) if employees is not None else get_karyawan_uid_bulk(df)
+            keys = zip(df["nama"], df["jabatan"], df["lokasi"], df["tanggal_lahir"])
+            df["uid"] = [uid_map.get(key) for key in keys]
+        except Exception as e:
+            return None, f"UID mapping failed: {e}"
+
+    df["lokasi"] = df["lokasi"].where(df["lokasi"].notna() & (df["lokasi"] != ""), sheet_lokasi)
+    fields = ["uid", "tanggal_checkup", "tanggal_lahir", "umur", "lokasi", "tinggi", "berat", "bmi", "derajat_kesehatan"]
+    return df[[c for c in fields if c in df.columns]], None
+
+
+@timed()
+def parse_checkup_anthropometric(file_obj, mode=None, chunk_size=None, workers=None):
     """
     Parse and save anthropometric checkup data (tinggi, berat, bmi) via Excel parser.
     - Maps extended columns and normalizes headers
     - Fills missing 'lokasi' with sheet name
     - Does not compute BMI; uses XLS-provided value as-is
-    - Saves rows using insert_medical_checkup
-    Returns dict with inserted count, skipped details, and inserted IDs.
+    - Sheets are normalized one at a time, or in parallel with UPLOAD_PARSE_WORKERS > 1, and written in
+      sheet order in chunks of CHECKUP_UPLOAD_CHUNK_ROWS rows through core.ingest (one transaction each);
+      in upsert mode (CHECKUP_UPLOAD_MODE) rows merge into the checkup already stored for the same
+      uid and tanggal_checkup
+    Returns dict with inserted/updated counts, skipped details, inserted/updated IDs and per-chunk reports.
     """
-    all_sheets = pd.read_excel(file_obj, sheet_name=None, dtype=str)
-    inserted = 0
-    inserted_ids = []
-    skipped = []
-
-    for sheet_name, df in all_sheets.items():
-        try:
-            # Normalize original headers for mapping
-            df.columns = df.columns.str.strip().str.lower()
-            mapping = _map_extended_columns(df)
-            rename_dict = {v: k for k, v in mapping.items() if v}
-            # Fallback substring-based renaming to catch unit-suffixed headers
-            auto_map = {}
-            for col in df.columns:
-                if col in rename_dict.values():
-                    continue
-                c = str(col).strip().lower().replace(' ', '_')
-                if ('tinggi' in c) or ('height' in c) or c.startswith('tb'):
-                    auto_map[col] = 'tinggi'
-                elif ('berat' in c) or ('weight' in c) or c.startswith('bb'):
-                    auto_map[col] = 'berat'
-                elif ('bmi' in c) or ('imt' in c) or ('body_mass_index' in c):
-                    auto_map[col] = 'bmi'
-            if auto_map:
-                df = df.rename(columns=auto_map)
-            # Apply explicit mapping after fallback to ensure canonical keys
-            df = df.rename(columns=rename_dict)
-
-            # Ensure lokasi filled
-            sheet_lokasi = normalize_string(sheet_name)
-            if "lokasi" not in df.columns or df["lokasi"].isnull().all():
-                df["lokasi"] = sheet_lokasi
-
-            # Ensure tanggal_checkup; fall back to 'tanggal_MCU' if present
-            if "tanggal_checkup" not in df.columns:
-                if "tanggal_MCU" in df.columns:
-                    df["tanggal_checkup"] = df["tanggal_MCU"]
-                else:
-                    df["tanggal_checkup"] = pd.Timestamp.today().date()
-
-            # Type safety for dates (day-first) and normalize via safe_date
-            for col in ["tanggal_lahir", "tanggal_checkup"]:
-                if col in df.columns:
-                    df[col] = df[col].apply(lambda x: safe_date(pd.to_datetime(x, dayfirst=True, errors="coerce")))
-
-            # Clean anthropometric numerics
-            for col in ["tinggi", "berat", "bmi"]:
-                if col in df.columns:
-                    df[col] = df[col].apply(safe_float)
-
-            # No BMI auto-calculation; use XLS-provided value as-is
-
-            # Determine UID mapping if not provided
-            if "uid" not in df.columns:
-                # Require at least nama and jabatan for mapping
-                if not {"nama", "jabatan"}.issubset(df.columns):
-                    skipped.append({"sheet": sheet_name, "row": "all", "reason": "Missing nama/jabatan for UID mapping"})
-                    continue
-                try:
-                    # Normalize text keys to match master DB values
-                    for col in ["nama", "jabatan", "lokasi"]:
-                        if col in df.columns:
-                            df[col] = df[col].apply(normalize_string)
-                    uid_map = get_karyawan_uid_bulk(df)
-                    def _map_uid(row):
-                        key = (
-                            row.get("nama"),
-                            row.get("jabatan"),
-                            row.get("lokasi"),
-                            row.get("tanggal_lahir")
-                        )
-                        return uid_map.get(key)
-                    df["uid"] = df.apply(_map_uid, axis=1)
-                except Exception as e:
-                    skipped.append({"sheet": sheet_name, "row": "all", "reason": f"UID mapping failed: {e}"})
-                    continue
-
-            # Iterate rows and insert
-            for idx, row in df.iterrows():
-                uid_val = row.get("uid")
-                if not uid_val or str(uid_val).lower() == "nan":
-                    skipped.append({"sheet": sheet_name, "row": idx + 2, "reason": "UID missing"})
-                    continue
-                try:
-                    record = {
-                        "uid_id": str(uid_val),  # pass FK raw ID for Checkup.uid
-                        "tanggal_checkup": row.get("tanggal_checkup") or pd.Timestamp.today().date(),
-                        "tanggal_lahir": row.get("tanggal_lahir"),
-                        "umur": safe_float(row.get("umur")) if "umur" in df.columns else None,
-                        "lokasi": row.get("lokasi") or sheet_lokasi,
-                        # Anthropometrics
-                        "tinggi": row.get("tinggi"),
-                        "berat": row.get("berat"),
-                        "bmi": row.get("bmi"),
-                        # Optional baseline health grade
-                        "derajat_kesehatan": row.get("derajat_kesehatan"),
-                    }
-                    obj = insert_medical_checkup(**record)
-                    inserted_ids.append(obj.checkup_id)
-                    inserted += 1
-                except Exception as e:
-                    skipped.append({"sheet": sheet_name, "row": idx + 2, "reason": str(e)})
-        except Exception as e:
-            skipped.append({"sheet": sheet_name, "row": "all", "reason": str(e)})
+    from core.checkup_uploader import upload_mode
+
+    writer = CheckupWriter("checkup_anthropometric", upload_mode(mode))
+    size = chunk_rows(chunk_size)
+    workers = parse_workers() if workers is None else workers
+    # Parse workers have no DB access: hand them the employee master for UID mapping (one query)
+    employees = karyawan_uid_candidates() if workers > 1 else None
+    sheets = map_sheets(file_obj, prepare_anthropometric_sheet, args=(employees,), workers=workers, dtype=str)
+    for sheet_name, (frame, reason) in sheets:
+        if frame is None:
+            writer.skip(sheet_name, "all", reason)
             continue
+        for chunk in iter_chunks(frame, size):
+            writer.write(sheet_name, chunk)
 
-    return {"inserted": inserted, "skipped": skipped, "inserted_ids": inserted_ids}
+    result = writer.result()
+    metrics.record_upload("checkup_anthropometric", result["inserted"], len(result["skipped"]))
+    return result
 
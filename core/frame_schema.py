@@ -0,0 +1,135 @@
+# core/frame_schema.py
+"""
+Compact in-memory schema for the employee / checkup / dashboard frames.
+
+get_employees(), load_checkups() and get_dashboard_checkup_data() return display-shaped frames:
+object strings for low-cardinality text, float64 metrics and dates as date objects or '%d/%m/%y'
+strings. That shape is what the views and templates consume, but it is several times larger than
+needed for frames kept around per worker. `compact_frame()` converts any of them to:
+
+- pandas categoricals for low-cardinality text (lokasi, jabatan, status, derajat_kesehatan, ...)
+- float32 metrics (values have at most 6 digits / 2 decimals, so float32 round-trips after round(2))
+- nullable small ints for umur / bulan / tahun
+- datetime64[ns] for every date, whatever format it arrived in
+
+and `display_frame()` turns a compact frame back into plain objects/float64/formatted dates at
+render time. Columns not listed in COMPACT_SCHEMA pass through unchanged.
+"""
+import pandas as pd
+
+CATEGORY = "category"
+FLOAT32 = "float32"
+INT16 = "Int16"
+INT32 = "Int32"
+DATE = "date"
+
+COMPACT_SCHEMA = {
+    # Identity: unique per employee in get_employees(), repeated per checkup in load_checkups()
+    "uid": CATEGORY,
+    "nama": CATEGORY,
+    "checkup_id": INT32,
+    # Low-cardinality text
+    "jabatan": CATEGORY,
+    "lokasi": CATEGORY,
+    "status": CATEGORY,
+    "derajat_kesehatan": CATEGORY,
+    "bmi_category": CATEGORY,
+    "tekanan_darah": CATEGORY,
+    # Metrics
+    "tinggi": FLOAT32,
+    "berat": FLOAT32,
+    "bmi": FLOAT32,
+    "lingkar_perut": FLOAT32,
+    "gula_darah_puasa": FLOAT32,
+    "gula_darah_sewaktu": FLOAT32,
+    "cholesterol": FLOAT32,
+    "asam_urat": FLOAT32,
+    "gestational_diabetes": FLOAT32,
+    "umur": INT16,
+    "bulan": INT16,
+    "tahun": INT16,
+    # Dates
+    "tanggal_checkup": DATE,
+    "tanggal_lahir": DATE,
+    "tanggal_MCU": DATE,
+    "expired_MCU": DATE,
+}
+
+# Formats the display frames use for dates held as strings (get_employees / dashboard)
+_DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%y")
+
+
+def _to_datetime(series):
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.astype("datetime64[ns]")
+    parsed = None
+    for fmt in _DATE_FORMATS:
+        attempt = pd.to_datetime(series, format=fmt, errors="coerce")
+        parsed = attempt if parsed is None else parsed.fillna(attempt)
+    # date / datetime objects (and anything else parseable) for rows no string format matched
+    rest = parsed.isna() & series.notna()
+    if rest.any():
+        parsed[rest] = pd.to_datetime(series[rest], errors="coerce")
+    return parsed.astype("datetime64[ns]")
+
+
+def _to_category(series, max_ratio):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series
+    # Near-unique columns (uid / nama in the employee frame) are smaller as plain objects
+    if len(series) and series.nunique(dropna=True) > max_ratio * len(series):
+        return series
+    return series.astype(CATEGORY)
+
+
+def compact_frame(df: pd.DataFrame, schema: dict | None = None, category_max_ratio: float = 0.5) -> pd.DataFrame:
+    """
+    Copy of `df` with COMPACT_SCHEMA (or `schema`) dtypes applied to the columns it names. Text columns
+    become categoricals only when their distinct values are at most `category_max_ratio` of the rows.
+    """
+    schema = COMPACT_SCHEMA if schema is None else schema
+    columns = {}
+    for col in df.columns:
+        kind = schema.get(col)
+        series = df[col]
+        try:
+            if kind == CATEGORY:
+                series = _to_category(series, category_max_ratio)
+            elif kind == FLOAT32:
+                series = pd.to_numeric(series, errors="coerce").astype("float32")
+            elif kind in (INT16, INT32):
+                series = pd.to_numeric(series, errors="coerce").round().astype(kind)
+            elif kind == DATE:
+                series = _to_datetime(series)
+        except (TypeError, ValueError, OverflowError):
+            # Unexpected content (e.g. free text in a numeric column): keep the column as it was
+            pass
+        columns[col] = series
+    return pd.DataFrame(columns, index=df.index)
+
+
+def display_frame(df: pd.DataFrame, date_format: str | None = None, decimals: int = 2) -> pd.DataFrame:
+    """
+    Render-time inverse of compact_frame(), giving the dtypes the loaders return: categoricals -> their
+    categories' text dtype, float32 -> float64 rounded to `decimals`, nullable ints -> int64 (float64
+    when NULLs are present), datetimes -> date objects or `date_format` strings.
+    """
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        dtype = series.dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            series = series.astype(dtype.categories.dtype)
+        elif dtype == "float32":
+            series = series.astype("float64").round(decimals)
+        elif isinstance(dtype, pd.api.extensions.ExtensionDtype) and pd.api.types.is_integer_dtype(dtype):
+            series = series.astype("float64") if series.isna().any() else series.astype("int64")
+        elif pd.api.types.is_datetime64_any_dtype(dtype):
+            series = series.dt.strftime(date_format) if date_format else series.dt.date
+        columns[col] = series
+    return pd.DataFrame(columns, index=df.index)
+
+
+def frame_memory(df: pd.DataFrame) -> int:
+    """Deep memory footprint of a frame in bytes (object strings included)."""
+    return int(df.memory_usage(index=True, deep=True).sum())
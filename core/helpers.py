@@ -1,5 +1,6 @@
 # core/helpers.py
 from core.queries import get_employees, get_latest_medical_checkup
+from core.instrumentation import timed
 try:
     import pandas as pd
 except Exception:
@@ -107,6 +108,7 @@ def compute_bmi_category(bmi_value):
 # Dashboard / Tab Helpers
 # ---------------------------
 
+@timed()
 def get_dashboard_checkup_data(employees_df=None, checkups_df=None):
     """
     Return the employee base data merged with their latest medical checkup data.
@@ -299,43 +301,132 @@ def get_active_menu_for_view(view_name: str) -> str:
     return mapping.get(view_name, "")
 
 
-# ---------------------------
-# MCU Expiry Helpers
-# ---------------------------
+def get_default_employee_uid():
+    """
+    First employee uid (ORDER BY uid LIMIT 1) for the "Edit Master Data" / QR menu links.
+    Cached until the next master data write.
+    """
+    from core import data_version, db_router
+    from core.core_models import Karyawan
+    from utils.cache_utils import get_cache, set_cache
+
+    version = data_version.current(data_version.KARYAWAN)
+    cached = get_cache("default_uid")
+    if cached and cached["version"] == version:
+        return cached["value"]
+    # Cached under the primary's version, so read the primary
+    with db_router.primary():
+        uid = Karyawan.objects.order_by("uid").values_list("uid", flat=True).first()
+    uid = str(uid) if uid else None
+    set_cache("default_uid", {"version": version, "value": uid}, ttl=3600)
+    return uid
+
+
+def _build_menu_items(role: str, default_uid):
+    from django.urls import reverse
+
+    if role == "nurse":
+        return [
+            {'name': 'Dashboard', 'url': reverse('nurse:dashboard'), 'icon': 'home', 'key': 'dashboard'},
+            {'name': 'QR Codes', 'url': reverse('nurse:qr_detail', kwargs={'uid': default_uid}) if default_uid else '#', 'icon': 'qrcode', 'key': 'qr'},
+            {'name': 'Upload / Export Data', 'url': reverse('nurse:upload_export'), 'icon': 'upload', 'key': 'upload_export'},
+            {'name': 'Edit Data Checkup', 'url': reverse('nurse:karyawan_detail', kwargs={'uid': default_uid}) if default_uid else '#', 'icon': 'edit', 'key': 'edit_karyawan'},
+        ]
+    return [
+        {'name': 'Dashboard', 'url': reverse('manager:dashboard'), 'icon': 'home', 'key': 'dashboard'},
+        {'name': 'User Management', 'url': reverse('manager:user_management'), 'icon': 'users', 'key': 'user'},
+        {'name': 'QR Codes', 'url': reverse('manager:qr_codes'), 'icon': 'qrcode', 'key': 'qr'},
+        {'name': 'Upload / Export Data', 'url': reverse('manager:upload_export'), 'icon': 'upload', 'key': 'data'},
+        {'name': 'Hapus Data Karyawan', 'url': reverse('manager:hapus_data_karyawan'), 'icon': 'database', 'key': 'hapus_data_karyawan'},
+        {'name': 'Edit Master Data', 'url': reverse('manager:edit_karyawan', kwargs={'uid': default_uid}) if default_uid else '#', 'icon': 'edit', 'key': 'edit_karyawan'},
+    ]
 
-def get_mcu_expiry_alerts(window_days: int = 30) -> dict:
+
+def get_menu_items(role: str = "manager") -> list:
     """
-    Compute MCU expiry alerts across all employees.
-    Returns a dict with counts:
-      - expired: expired before today
-      - due_soon: expiring within next `window_days`
-      - total: expired + due_soon
+    Sidebar menu items for "manager" or "nurse", shared by the context processors and views.
+    Rebuilt only when the default employee uid changes.
     """
-    try:
-        df = get_employees()
-    except Exception:
-        df = None
+    from utils.cache_utils import get_cache, set_cache
 
-    if df is None or df.empty:
-        return {"expired": 0, "due_soon": 0, "total": 0}
+    default_uid = get_default_employee_uid()
+    cache_key = f"menu_items:{role}"
+    cached = get_cache(cache_key)
+    if not cached or cached["default_uid"] != default_uid:
+        cached = {"default_uid": default_uid, "items": _build_menu_items(role, default_uid)}
+        set_cache(cache_key, cached, ttl=3600)
+    # Copies, so callers can annotate items without touching the cache
+    return [dict(item) for item in cached["items"]]
 
-    # Parse expiry dates safely
-    exp_series = pd.to_datetime(df.get('expired_MCU'), errors='coerce') if 'expired_MCU' in df.columns else pd.Series([])
-    if exp_series is None or getattr(exp_series, 'empty', True):
-        return {"expired": 0, "due_soon": 0, "total": 0}
 
-    today = pd.Timestamp.today().normalize()
-    window_end = today + pd.Timedelta(days=window_days)
+# ---------------------------
+# MCU Expiry Helpers
+# ---------------------------
 
-    expired_mask = (exp_series < today) & exp_series.notna()
-    due_soon_mask = (exp_series >= today) & (exp_series <= window_end) & exp_series.notna()
+MCU_EXPIRY_ITEM_LIMIT = 12
 
-    expired_count = int(expired_mask.sum())
-    due_soon_count = int(due_soon_mask.sum())
 
-    return {
+@timed()
+def get_mcu_expiry_summary(window_days: int = 30, limit: int = MCU_EXPIRY_ITEM_LIMIT) -> dict:
+    """
+    MCU expiry counts plus the first `limit` expired / due-soon employees (earliest expiry first).
+    Two COUNT queries and one LIMIT query; cached until the next master data write or the next day.
+    """
+    from datetime import date, datetime, time as dt_time, timedelta
+    from core import data_version, db_router
+    from core.core_models import Karyawan
+    from utils.cache_utils import get_cache, set_cache
+
+    today = date.today()
+    version = (data_version.current(data_version.KARYAWAN), today.isoformat())
+    cache_key = f"mcu_expiry:{window_days}:{limit}"
+    cached = get_cache(cache_key)
+    if cached and cached["version"] == version:
+        return cached["value"]
+
+    # Cached under the primary's version, so read the primary
+    with db_router.primary():
+        window_end = today + timedelta(days=window_days)
+        expired_count = Karyawan.objects.filter(expired_MCU__lt=today).count()
+        due_soon_count = Karyawan.objects.filter(expired_MCU__gte=today, expired_MCU__lte=window_end).count()
+
+        items = []
+        rows = (
+            Karyawan.objects.filter(expired_MCU__lte=window_end)
+            .order_by("expired_MCU", "uid")
+            .values("uid", "nama", "jabatan", "expired_MCU")[:limit]
+        )
+        for r in rows:
+            exp = r["expired_MCU"]
+            expired = exp < today
+            items.append({
+                "type": "expired" if expired else "due_soon",
+                "title": f"{r['nama']} ({r['jabatan']})",
+                "expired_at": exp.strftime("%Y-%m-%d"),
+                "days_left": None if expired else (exp - today).days,
+                "uid": str(r["uid"]) if r["uid"] else None,
+            })
+
+    value = {
         "expired": expired_count,
         "due_soon": due_soon_count,
         "total": expired_count + due_soon_count,
+        "items": items,
     }
+    # Expire at midnight at the latest; master writes bump the version earlier
+    ttl = int((datetime.combine(today + timedelta(days=1), dt_time.min) - datetime.now()).total_seconds()) + 1
+    set_cache(cache_key, {"version": version, "value": value}, ttl=max(ttl, 1))
+    return value
+
+
+def get_mcu_expiry_alerts(window_days: int = 30) -> dict:
+    """
+    Compute MCU expiry alerts across all employees.
+    Returns a dict with counts:
+      - expired: expired before today
+      - due_soon: expiring within next `window_days`
+      - total: expired + due_soon
+    """
+    summary = get_mcu_expiry_summary(window_days)
+    return {k: summary[k] for k in ("expired", "due_soon", "total")}
 
@@ -0,0 +1,384 @@
+# core/ingest.py
+"""
+Chunked checkup ingestion shared by the upload parsers (core.checkup_uploader, core.excel_parser).
+
+A parser reads one sheet at a time, cuts it into chunks of CHECKUP_UPLOAD_CHUNK_ROWS rows and hands
+each normalized chunk to CheckupWriter.write(), which per chunk:
+
+- validates with vectorized checks (missing uid, uid unknown to the Karyawan master: one query);
+- in upsert mode, loads the checkups already stored for the chunk's (uid, tanggal_checkup) keys
+  (one query) and merges the rows into them, only overwriting with non-empty values;
+- writes everything in one transaction: one bulk INSERT, one bulk UPDATE, one data version bump.
+
+A chunk that fails is rolled back on its own and reported; chunks before it stay committed. The
+result carries per-chunk counts, skip reasons and timings, plus rows per second for the whole upload.
+
+CSV, TSV and NDJSON files (lab machines, HRIS exports) go through the same prepare/write steps without
+a workbook: map_text_chunks() reads them `size` rows at a time and hands each chunk to the parser's
+per-sheet `prepare` as if it were a sheet named after the file.
+
+Workbooks with one sheet per lokasi can be read and normalized in parallel: map_sheets() runs a parser's
+per-sheet `prepare` in a short-lived process pool of UPLOAD_PARSE_WORKERS processes (each reads only its
+own sheet), returns the results in workbook order and leaves every write to the calling process. Row
+numbers come from each sheet's own index, so skip reports are the same either way.
+"""
+import csv
+import io
+import os
+import time
+from collections import Counter
+from datetime import date
+
+import pandas as pd
+from django.conf import settings
+from django.db import connection, transaction
+
+from core import core_models, data_version
+from core.instrumentation import logger
+from core.query_budget import query_budget
+
+# Columns a record may carry (attnames, so the uid FK is written as uid_id)
+CHECKUP_FIELDS = [f.attname for f in core_models.Checkup._meta.concrete_fields if not f.primary_key]
+# Columns an upsert may overwrite; their stored values are kept as the batch's before-image
+RESTORABLE_FIELDS = [f for f in CHECKUP_FIELDS if f not in ("uid_id", "tanggal_checkup")]
+# Statements one chunk may take: uid check, existing rows, savepoint, version bump, plus the
+# INSERT and UPDATE batches (bulk_statements)
+CHUNK_QUERY_BUDGET = 8
+BULK_BATCH = 500
+
+
+def bulk_statements(rows, fields, batch_size=BULK_BATCH) -> int:
+    """
+    Statements one bulk_create / bulk_update of `rows` rows over `fields` takes: batch_size rows
+    each, or fewer where the backend caps query parameters per statement (SQLite).
+    """
+    if rows <= 0:
+        return 0
+    per_statement = connection.ops.bulk_batch_size(["pk", "pk"] + list(fields), [None] * rows) or batch_size
+    return -(-rows // max(1, min(batch_size, per_statement)))
+
+
+def chunk_rows(value=None) -> int:
+    return max(1, int(value or getattr(settings, "CHECKUP_UPLOAD_CHUNK_ROWS", 500)))
+
+
+def read_sheets(file_obj, **read_kwargs):
+    """(sheet_name, DataFrame) for each sheet of a workbook, parsing one sheet at a time."""
+    with pd.ExcelFile(file_obj) as book:
+        for sheet_name in book.sheet_names:
+            yield sheet_name, book.parse(sheet_name, **read_kwargs)
+
+
+# -------------------------
+# Per-sheet parsing (optionally in a process pool)
+# -------------------------
+def parse_workers() -> int:
+    """Processes for map_sheets(): UPLOAD_PARSE_WORKERS, 0 = min(4, CPU count), 1 = parse in-process."""
+    configured = int(getattr(settings, "UPLOAD_PARSE_WORKERS", 1) or 0)
+    return configured if configured > 0 else min(4, os.cpu_count() or 1)
+
+
+def _prepare(prepare, df, sheet_name, args):
+    """prepare(df, sheet_name, *args) -> (value, reason); an exception becomes (None, its message)."""
+    try:
+        return prepare(df, sheet_name, *args)
+    except Exception as e:
+        return None, str(e)
+
+
+def _prepare_sheet(source, sheet_name, prepare, read_kwargs, args):
+    # Module-level so the pool can pickle it; `source` is a path or the workbook bytes
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    return _prepare(prepare, pd.read_excel(source, sheet_name=sheet_name, **read_kwargs), sheet_name, args)
+
+
+def map_sheets(file_obj, prepare, args=(), workers=None, **read_kwargs):
+    """
+    (sheet_name, (value, reason)) in workbook order, where `prepare(df, sheet_name, *args)` (a
+    module-level function without DB access) normalizes one sheet. With more than one worker and sheet
+    the sheets are parsed in a "spawn" process pool; otherwise (or if the pool cannot start) one at a
+    time in-process.
+    """
+    workers = parse_workers() if workers is None else max(1, int(workers))
+    if workers > 1:
+        if isinstance(file_obj, (str, os.PathLike)):
+            source = os.fspath(file_obj)
+        else:
+            if hasattr(file_obj, "seek"):
+                file_obj.seek(0)
+            source = file_obj.read()
+            file_obj = io.BytesIO(source)
+        with pd.ExcelFile(file_obj) as book:
+            names = list(book.sheet_names)
+        if len(names) > 1:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            import django
+
+            n = min(workers, len(names))
+            try:
+                # django.setup() before the first task: unpickling `prepare` imports the parsers and models
+                with ProcessPoolExecutor(n, mp_context=multiprocessing.get_context("spawn"), initializer=django.setup) as pool:
+                    results = list(pool.map(
+                        _prepare_sheet, [source] * len(names), names,
+                        [prepare] * len(names), [read_kwargs] * len(names), [args] * len(names),
+                    ))
+            except Exception as e:
+                logger.warning("upload parse pool unavailable, parsing sheets in-process: %s", e)
+            else:
+                yield from zip(names, results)
+                return
+    for name, df in read_sheets(file_obj, **read_kwargs):
+        yield name, _prepare(prepare, df, name, args)
+
+
+# -------------------------
+# Delimited / line-delimited text files
+# -------------------------
+TEXT_FORMATS = {".csv": "csv", ".tsv": "tsv", ".tab": "tsv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+
+
+def text_format(name):
+    """"csv" | "tsv" | "ndjson" for a file name by its extension, or None (a workbook)."""
+    return TEXT_FORMATS.get(os.path.splitext(str(getattr(name, "name", name) or ""))[1].lower())
+
+
+def text_row_offset(fmt) -> int:
+    """Line number of the first record: CSV/TSV start after the header line, NDJSON has none."""
+    return 1 if fmt == "ndjson" else 2
+
+
+def _open_text(file_obj):
+    # Paths are opened by pandas; file objects are rewound (they may have been hashed or peeked)
+    if isinstance(file_obj, (str, os.PathLike)):
+        return os.fspath(file_obj)
+    if hasattr(file_obj, "seek"):
+        file_obj.seek(0)
+    return file_obj
+
+
+def _delimiter(file_obj, fmt):
+    """Tab for TSV; for CSV the first of , ; | that splits the header line (locale-dependent exports)."""
+    if fmt == "tsv":
+        return "\t"
+    source = _open_text(file_obj)
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            sample = f.read(65536)
+    else:
+        sample = source.read(65536)
+        source.seek(0)
+    if isinstance(sample, bytes):
+        sample = sample.decode("utf-8-sig", errors="replace")
+    try:
+        return csv.Sniffer().sniff(sample.splitlines()[0] if sample else "", delimiters=",;|").delimiter
+    except (csv.Error, IndexError):
+        return ","
+
+
+def read_text_chunks(file_obj, fmt, size):
+    """
+    DataFrames of up to `size` records from a CSV/TSV/NDJSON file or path, values as strings (empty: NaN),
+    indexed by record number from 0 across chunks. Only one chunk is in memory at a time.
+    """
+    if fmt == "ndjson":
+        reader = pd.read_json(_open_text(file_obj), lines=True, chunksize=size, dtype=False, convert_dates=False)
+    else:
+        sep = _delimiter(file_obj, fmt)
+        reader = pd.read_csv(
+            _open_text(file_obj), sep=sep, dtype=str, chunksize=size, encoding="utf-8-sig", skipinitialspace=True,
+        )
+    with reader:
+        for chunk in reader:
+            if fmt == "ndjson":
+                chunk = chunk.astype(object).map(lambda v: v if _empty(v) else str(v))
+            yield chunk
+
+
+def map_text_chunks(file_obj, prepare, label, fmt=None, size=None, args=()):
+    """
+    (record index, (value, reason)) per chunk of a text file, where `prepare(df, label, *args)` is the
+    same per-sheet function map_sheets() uses; `label` stands in for the sheet name.
+    """
+    fmt = fmt or text_format(file_obj)
+    if fmt not in TEXT_FORMATS.values():
+        raise ValueError(f"Unsupported file format: {fmt or file_obj}")
+    for chunk in read_text_chunks(file_obj, fmt, chunk_rows(size)):
+        yield chunk.index, _prepare(prepare, chunk, label, args)
+
+
+def iter_chunks(df: pd.DataFrame, size: int):
+    """Consecutive row slices of `df`; each keeps its original index (the sheet row position)."""
+    for start in range(0, len(df), size):
+        yield df.iloc[start:start + size]
+
+
+def _empty(value):
+    return value is None or (not isinstance(value, str) and pd.isna(value))
+
+
+class CheckupWriter:
+    """Accumulates the outcome of one upload while its chunks are written."""
+
+    def __init__(self, kind, mode="upsert"):
+        self.kind = kind
+        self.mode = mode
+        self.inserted_ids = []
+        self.updated_ids = []
+        self.skipped = []
+        self.chunks = []
+        self.before_images = {}  # checkup_id -> RESTORABLE_FIELDS values before this upload changed it
+        self.rows = 0
+        self._started = time.perf_counter()
+
+    # -------------------------
+    # Skips
+    # -------------------------
+    def skip(self, sheet, row, reason):
+        self.skipped.append({"sheet": sheet, "row": row, "reason": reason})
+
+    def _skip_rows(self, sheet, rows, reason, reasons):
+        for row in rows:
+            self.skip(sheet, row, reason)
+        if rows:
+            reasons[reason] += len(rows)
+
+    # -------------------------
+    # Chunk
+    # -------------------------
+    def write(self, sheet, frame: pd.DataFrame, row_offset=2):
+        """
+        Validate and store one chunk. `frame` has canonical checkup columns (uid, tanggal_checkup, ...);
+        its index + `row_offset` is the spreadsheet row number used in skip reports.
+        """
+        started = time.perf_counter()
+        rows = [int(i) + row_offset for i in frame.index]
+        report = {"sheet": sheet, "first_row": rows[0] if rows else None, "last_row": rows[-1] if rows else None,
+                  "rows": len(frame), "inserted": 0, "updated": 0, "skipped": 0, "committed": True}
+        reasons = Counter()
+        self.rows += len(frame)
+
+        uid = frame["uid"].astype("string").str.strip() if "uid" in frame.columns else pd.Series(pd.NA, index=frame.index, dtype="string")
+        missing = uid.isna() | uid.isin(["", "nan", "None", "<NA>"])
+        budget = CHUNK_QUERY_BUDGET + 2 * bulk_statements(len(frame), CHECKUP_FIELDS)
+        with query_budget(budget, name=f"{self.kind} upload chunk"):
+            candidates = set(uid[~missing])
+            known = set(
+                core_models.Karyawan.objects.filter(uid__in=candidates).values_list("uid", flat=True)
+            ) if candidates else set()
+            unknown = ~missing & ~uid.isin(known)
+            self._skip_rows(sheet, [r for r, m in zip(rows, missing) if m], "UID missing", reasons)
+            self._skip_rows(sheet, [r for r, m in zip(rows, unknown) if m], "UID not found in database", reasons)
+
+            valid = frame[~(missing | unknown).to_numpy()]
+            columns = [c for c in valid.columns if c in CHECKUP_FIELDS and c != "uid_id"]
+            today = date.today()
+            records = []
+            for row, uid_value, values in zip(
+                [r for r, m in zip(rows, missing | unknown) if not m],
+                uid[~(missing | unknown)],
+                valid[columns].astype(object).itertuples(index=False, name=None),
+            ):
+                record = {c: (None if _empty(v) else v) for c, v in zip(columns, values)}
+                record["uid_id"] = str(uid_value)
+                record["tanggal_checkup"] = record.get("tanggal_checkup") or today
+                records.append((row, record))
+
+            try:
+                inserted, updated = self._store(records)
+            except Exception as e:
+                logger.warning("%s upload: chunk %s rows %s-%s rolled back: %s", self.kind, sheet, report["first_row"], report["last_row"], e)
+                report["committed"] = False
+                self._skip_rows(sheet, [r for r, _ in records], f"Chunk gagal disimpan: {e}", reasons)
+                inserted, updated = [], []
+
+        self.inserted_ids += inserted
+        self.updated_ids += updated
+        report.update(
+            inserted=len(inserted), updated=len(updated), skipped=sum(reasons.values()),
+            reasons=dict(reasons), seconds=round(time.perf_counter() - started, 4),
+        )
+        self.chunks.append(report)
+        return report
+
+    def _existing(self, records):
+        """{(uid, tanggal_checkup): newest stored Checkup} for the keys of `records` (one query)."""
+        keys = {(r["uid_id"], r["tanggal_checkup"]) for _, r in records}
+        stored = {}
+        qs = core_models.Checkup.objects.filter(
+            uid_id__in={k[0] for k in keys}, tanggal_checkup__in={k[1] for k in keys}
+        )
+        for obj in qs:
+            key = (str(obj.uid_id), obj.tanggal_checkup)
+            if key in keys and obj.checkup_id > getattr(stored.get(key), "checkup_id", 0):
+                stored[key] = obj
+        return stored
+
+    def _store(self, records):
+        """Write one chunk's records in one transaction; returns (inserted ids, updated ids), one per row."""
+        if not records:
+            return [], []
+        with transaction.atomic():
+            stored = self._existing(records) if self.mode == "upsert" else {}
+            new, new_keys, changed, changed_fields = [], {}, {}, set()
+            inserted_rows, updated_rows, before = [], [], {}
+            for _, record in records:
+                key = (record["uid_id"], record["tanggal_checkup"])
+                target = stored.get(key) if self.mode == "upsert" else None
+                if target is None and self.mode == "upsert" and key in new_keys:
+                    target = new_keys[key]
+                if target is None:
+                    obj = core_models.Checkup(**record)
+                    new.append(obj)
+                    inserted_rows.append(obj)
+                    if self.mode == "upsert":
+                        new_keys[key] = obj
+                    continue
+                # Same uid and date as a stored (or earlier) row: merge the non-empty values into it
+                fields = {k: v for k, v in record.items() if k not in ("uid_id", "tanggal_checkup") and v is not None}
+                if target.checkup_id is not None and target.checkup_id not in before:
+                    before[target.checkup_id] = {f: getattr(target, f) for f in RESTORABLE_FIELDS}
+                for k, v in fields.items():
+                    setattr(target, k, v)
+                if target.checkup_id is None:
+                    # Merged into a row this chunk inserts: still an inserted row
+                    inserted_rows.append(target)
+                    continue
+                updated_rows.append(target)
+                changed[target.checkup_id] = target
+                changed_fields |= set(fields)
+
+            if new:
+                if connection.features.can_return_rows_from_bulk_insert:
+                    core_models.Checkup.objects.bulk_create(new, batch_size=BULK_BATCH)
+                else:
+                    for obj in new:
+                        obj.save(force_insert=True)
+            if changed and changed_fields:
+                core_models.Checkup.objects.bulk_update(list(changed.values()), sorted(changed_fields), batch_size=BULK_BATCH)
+            if new or changed:
+                data_version.bump(data_version.CHECKUPS, changes=[("U", cid) for cid in sorted(changed)])
+        # Committed: the first image of a row (from an earlier chunk) is the one a rollback restores
+        for checkup_id, values in before.items():
+            self.before_images.setdefault(checkup_id, values)
+        return [obj.checkup_id for obj in inserted_rows], [obj.checkup_id for obj in updated_rows]
+
+    # -------------------------
+    # Result
+    # -------------------------
+    def result(self) -> dict:
+        seconds = time.perf_counter() - self._started
+        return {
+            "inserted": len(self.inserted_ids),
+            "updated": len(self.updated_ids),
+            "skipped": self.skipped,
+            "inserted_ids": self.inserted_ids,
+            "updated_ids": self.updated_ids,
+            "chunks": self.chunks,
+            "before_images": self.before_images,
+            "rows": self.rows,
+            "seconds": round(seconds, 3),
+            "rows_per_second": round(self.rows / seconds, 1) if seconds > 0 else None,
+        }
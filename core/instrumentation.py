@@ -0,0 +1,164 @@
+# core/instrumentation.py
+"""
+Per-request performance instrumentation.
+
+- PerfInstrumentationMiddleware: DB query count/time (via connection.execute_wrapper), total
+  request time, time in @timed helpers and response size per request. Emitted as a
+  Server-Timing header and as sampled one-line JSON logs on the "mini_mcu.perf" logger.
+  Queries slower than SLOW_QUERY_MS are also handed to core.slow_queries.
+- timed: decorator for pandas-heavy helpers; per-request stats only inside a request,
+  duration histogram (core.metrics) always.
+"""
+import functools
+import json
+import logging
+import random
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from core import metrics, slow_queries
+
+logger = logging.getLogger("mini_mcu.perf")
+
+_local = threading.local()
+
+
+class RequestStats:
+    """Counters for the request currently being served on this thread."""
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.view = None
+        self.helpers = {}  # name -> [calls, seconds]
+
+    def add_helper(self, name, seconds):
+        entry = self.helpers.setdefault(name, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+
+def current_stats():
+    """RequestStats of the active request, or None outside the middleware."""
+    return getattr(_local, "stats", None)
+
+
+# -------------------------
+# Helper timing decorator
+# -------------------------
+def timed(name=None):
+    """Record the wall time of a helper in the active request's stats (Server-Timing entry `name`)."""
+    def decorator(func):
+        metric = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                metrics.observe("mini_mcu_helper_duration_seconds", elapsed, {"helper": metric})
+                stats = current_stats()
+                if stats is not None:
+                    stats.add_helper(metric, elapsed)
+        return wrapper
+    return decorator
+
+
+# -------------------------
+# Middleware
+# -------------------------
+def _db_wrapper(execute, sql, params, many, context):
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        stats = current_stats()
+        if stats is not None:
+            stats.db_queries += 1
+            stats.db_seconds += elapsed
+        if elapsed * 1000 >= slow_queries.threshold_ms():
+            cursor = context.get("cursor")
+            slow_queries.record(
+                sql, params, many, elapsed, getattr(cursor, "rowcount", None),
+                view=stats.view if stats is not None else None,
+            )
+
+
+def _response_size(response):
+    if getattr(response, "streaming", False):
+        try:
+            return int(response.get("Content-Length"))
+        except (TypeError, ValueError):
+            return None
+    return len(response.content)
+
+
+class PerfInstrumentationMiddleware:
+    """Collect per-request timings; see module docstring. Configured via PERF_* settings."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.server_timing = getattr(settings, "PERF_SERVER_TIMING", False)
+        self.sample_rate = float(getattr(settings, "PERF_LOG_SAMPLE_RATE", 0.0))
+        self.slow_ms = float(getattr(settings, "PERF_LOG_SLOW_MS", 1000))
+
+    def __call__(self, request):
+        stats = RequestStats()
+        previous = current_stats()
+        _local.stats = stats
+        try:
+            with ExitStack() as stack:
+                for conn in connections.all():
+                    stack.enter_context(conn.execute_wrapper(_db_wrapper))
+                start = time.perf_counter()
+                response = self.get_response(request)
+                total_seconds = time.perf_counter() - start
+        finally:
+            _local.stats = previous
+
+        record = self._record(request, response, stats, total_seconds)
+        if self.server_timing:
+            response["Server-Timing"] = self._server_timing(stats, total_seconds)
+        if record["total_ms"] >= self.slow_ms or (self.sample_rate and random.random() < self.sample_rate):
+            logger.info(json.dumps(record, ensure_ascii=False))
+        request.perf_record = record
+        metrics.observe_request(record)
+        metrics.flush()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Lets the slow-query recorder attribute queries to a view while the request is running
+        stats = current_stats()
+        if stats is not None:
+            match = getattr(request, "resolver_match", None)
+            stats.view = getattr(match, "view_name", None) or getattr(view_func, "__name__", None)
+        return None
+
+    def _record(self, request, response, stats, total_seconds):
+        match = getattr(request, "resolver_match", None)
+        return {
+            "method": request.method,
+            "path": request.path,
+            "view": getattr(match, "view_name", None),
+            "status": response.status_code,
+            "total_ms": round(total_seconds * 1000, 1),
+            "db_ms": round(stats.db_seconds * 1000, 1),
+            "db_queries": stats.db_queries,
+            "helpers": {k: {"calls": v[0], "ms": round(v[1] * 1000, 1)} for k, v in stats.helpers.items()},
+            "response_bytes": _response_size(response),
+        }
+
+    def _server_timing(self, stats, total_seconds):
+        parts = [f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.db_queries} queries"']
+        for name, (calls, seconds) in stats.helpers.items():
+            parts.append(f'{name};dur={seconds * 1000:.1f};desc="{calls}x"')
+        parts.append(f"total;dur={total_seconds * 1000:.1f}")
+        return ", ".join(parts)
+
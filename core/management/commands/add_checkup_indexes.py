@@ -0,0 +1,83 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+# Indexes backing the per-uid checkup reads (karyawan QR landing page, employee profile)
+# and the MCU expiry counts in the manager/nurse notification panel.
+# Tables are unmanaged, so these are applied as a safe patch instead of a migration.
+CHECKUP_INDEXES = [
+    ("idx_checkups_uid_tanggal", "checkups", [("uid", ""), ("tanggal_checkup", " DESC")]),
+    ("idx_karyawan_expired_mcu", "karyawan", [("expired_MCU", "")]),
+]
+# One checkup per employee and date: what CHECKUP_UPLOAD_MODE=upsert relies on, enforced by the DB so
+# concurrent uploads cannot both insert the same pair. Only created when no duplicates exist yet.
+UNIQUE_INDEXES = [
+    ("uq_checkups_uid_tanggal", "checkups", ["uid", "tanggal_checkup"]),
+]
+
+class Command(BaseCommand):
+    help = "Create the checkup / MCU expiry read-path indexes and the unique (uid, tanggal_checkup) index (safe patch, idempotent)."
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        self.stdout.write(self.style.NOTICE(f"DB vendor: {vendor}"))
+
+        for name, table, column_spec in CHECKUP_INDEXES:
+            # Quote per vendor: expired_MCU is mixed-case and must stay that way on Postgres
+            columns = ", ".join(f"{connection.ops.quote_name(col)}{order}" for col, order in column_spec)
+            if vendor == "mysql":
+                # MySQL has no CREATE INDEX IF NOT EXISTS; check information_schema first
+                try:
+                    with connection.cursor() as cursor:
+                        cursor.execute(
+                            "SELECT 1 FROM information_schema.statistics WHERE table_name=%s AND index_name=%s",
+                            [table, name]
+                        )
+                        if cursor.fetchone():
+                            self.stdout.write(self.style.SUCCESS(f"Index '{name}' already exists on '{table}'. No action taken."))
+                            continue
+                except Exception as e:
+                    self.stdout.write(self.style.WARNING(f"Could not introspect indexes: {e}"))
+                sql = f"CREATE INDEX {name} ON {table} ({columns})"
+            else:
+                sql = f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"
+
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute(sql)
+                self.stdout.write(self.style.SUCCESS(f"Index '{name}' present on '{table}' ({columns})."))
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"Failed to create index '{name}' on '{table}': {e}"))
+
+        for name, table, column_names in UNIQUE_INDEXES:
+            self._create_unique(vendor, name, table, column_names)
+
+    def _create_unique(self, vendor, name, table, column_names):
+        columns = ", ".join(connection.ops.quote_name(col) for col in column_names)
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT {columns}, COUNT(*) FROM {table} GROUP BY {columns} HAVING COUNT(*) > 1 ORDER BY COUNT(*) DESC"
+                )
+                duplicates = cursor.fetchall()
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f"Could not check '{table}' for duplicates: {e}"))
+            return
+        if duplicates:
+            self.stdout.write(self.style.WARNING(
+                f"Unique index '{name}' not created: {len(duplicates)} duplicate ({', '.join(column_names)}) pair(s) "
+                f"in '{table}'. Merge or delete them, then run this command again. Keep CHECKUP_UPLOAD_MODE=insert until then."
+            ))
+            for row in duplicates[:10]:
+                self.stdout.write(f"  {row[:-1]}: {row[-1]} rows")
+            return
+        if vendor == "mysql":
+            sql = f"CREATE UNIQUE INDEX {name} ON {table} ({columns})"
+        else:
+            sql = f"CREATE UNIQUE INDEX IF NOT EXISTS {name} ON {table} ({columns})"
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(sql)
+            self.stdout.write(self.style.SUCCESS(f"Unique index '{name}' present on '{table}' ({columns})."))
+        except Exception as e:
+            # MySQL without IF NOT EXISTS: an existing index lands here too
+            self.stdout.write(self.style.ERROR(f"Failed to create unique index '{name}' on '{table}': {e}"))
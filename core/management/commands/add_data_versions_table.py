@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core import data_version
+
+class Command(BaseCommand):
+    help = "Create the data_versions / data_version_changes tables used for cache invalidation (safe patch, idempotent)."
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.NOTICE(f"DB vendor: {connection.vendor}"))
+        try:
+            created = data_version.ensure_tables()
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f"Failed to create data_versions tables: {e}"))
+            return
+        if created:
+            self.stdout.write(self.style.SUCCESS("Tables 'data_versions' and 'data_version_changes' created."))
+        else:
+            self.stdout.write(self.style.SUCCESS("Tables 'data_versions' and 'data_version_changes' already exist. No action taken."))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core import upload_ledger
+
+class Command(BaseCommand):
+    help = "Create the upload_batches / upload_batch_ranges / upload_batch_updates ledger tables and import legacy JSON upload logs (safe patch, idempotent)."
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.NOTICE(f"DB vendor: {connection.vendor}"))
+        try:
+            created = upload_ledger.ensure_tables()
+            # ensure_tables() imports on creation; run again for logs written by an older deploy since
+            imported = 0 if created else upload_ledger.import_legacy_logs()
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f"Failed to create upload ledger tables: {e}"))
+            return
+        if created:
+            self.stdout.write(self.style.SUCCESS("Upload ledger tables created."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Upload ledger tables already exist. {imported} legacy log(s) imported."))
@@ -0,0 +1,81 @@
+import glob
+import os
+import shutil
+
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+
+from core import checkup_uploader, upload_store
+from core.ingest import TEXT_FORMATS
+
+WORKBOOK_EXTENSIONS = (".xls", ".xlsx")
+
+
+def _expand(paths):
+    """Files named on the command line; directories contribute their checkup files (not recursive), by name."""
+    extensions = tuple(TEXT_FORMATS) + WORKBOOK_EXTENSIONS
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                full = os.path.join(path, name)
+                if os.path.isfile(full) and name.lower().endswith(extensions):
+                    yield full
+        else:
+            matches = sorted(glob.glob(path))
+            if not matches:
+                raise CommandError(f"No such file: {path}")
+            yield from matches
+
+
+class Command(BaseCommand):
+    help = (
+        "Ingest checkup files (CSV, TSV, NDJSON, XLS/XLSX) from paths or drop directories, like a manager upload: "
+        "stored, deduplicated by content and recorded in the upload ledger."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="Files, glob patterns or directories to ingest.")
+        parser.add_argument("--mode", choices=list(checkup_uploader.UPLOAD_MODES), help="Default: CHECKUP_UPLOAD_MODE.")
+        parser.add_argument("--chunk-rows", type=int, help="Rows per chunk. Default: CHECKUP_UPLOAD_CHUNK_ROWS.")
+        parser.add_argument(
+            "--anthropometric", choices=["auto", "yes", "no"], default="auto",
+            help="Use the anthropometric (tinggi/berat/bmi) parser. auto = by header names.",
+        )
+        parser.add_argument("--done-dir", help="Move each file here after it was ingested or found to be a duplicate.")
+
+    def handle(self, *args, **options):
+        anthropometric = {"auto": None, "yes": True, "no": False}[options["anthropometric"]]
+        done_dir = options.get("done_dir")
+        if done_dir:
+            os.makedirs(done_dir, exist_ok=True)
+
+        def parse(path):
+            return checkup_uploader.parse_checkup_file(
+                path, mode=options.get("mode"), anthropometric=anthropometric, chunk_size=options.get("chunk_rows"),
+            )
+
+        failed = 0
+        for path in _expand(options["paths"]):
+            try:
+                with open(path, "rb") as f:
+                    result, duplicate = upload_store.ingest_checkups(File(f, name=os.path.basename(path)), parse)
+            except Exception as e:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f"{path}: {e}"))
+                continue
+            if duplicate:
+                self.stdout.write(self.style.WARNING(f"{path}: {upload_store.duplicate_message(duplicate)}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    f"{path}: {result['inserted']} inserted, {result['updated']} updated, "
+                    f"{len(result['skipped'])} skipped, {result['rows']} rows in {result['seconds']}s "
+                    f"({result['rows_per_second'] or 0:g} rows/s)"
+                ))
+                for skip in result["skipped"][:10]:
+                    self.stdout.write(f"  skipped {skip['sheet']} row {skip['row']}: {skip['reason']}")
+                if len(result["skipped"]) > 10:
+                    self.stdout.write(f"  ... {len(result['skipped']) - 10} more")
+            if done_dir:
+                shutil.move(path, os.path.join(done_dir, os.path.basename(path)))
+        if failed:
+            raise CommandError(f"{failed} file(s) failed")
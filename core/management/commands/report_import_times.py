@@ -0,0 +1,128 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# App modules loaded by a gunicorn worker when it builds the URLconf / serves its first request.
+DEFAULT_MODULES = [
+    "core.queries",
+    "core.helpers",
+    "core.excel_parser",
+    "core.checkup_uploader",
+    "utils.export_utils",
+    "accounts.views",
+    "users_ui.karyawan.karyawan_views",
+    "users_ui.qr.qr_views",
+    "users_ui.qr.qr_urls",
+    "users_ui.manager.context_processors",
+    "users_ui.manager.manager_views",
+    "users_ui.nurse.context_processors",
+    "users_ui.nurse.nurse_views",
+    "users_ui.master.master_views",
+    "mini_mcu.main_urls",
+]
+
+_MARKER = "--report-import-times--"
+
+# Runs inside a fresh interpreter started with -X importtime, so every module is measured cold.
+# Prints one JSON line on stdout; the importtime trace goes to stderr.
+_CHILD_SCRIPT = """
+import json, sys, time, importlib
+def rss_kb():
+    # Current RSS; ru_maxrss is unusable here because the peak is inherited from the forking parent
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+import django
+django.setup()
+rss_before = rss_kb()
+sys.stderr.write("%s\\n" % sys.argv[2])
+sys.stderr.flush()
+t0 = time.perf_counter()
+importlib.import_module(sys.argv[1])
+elapsed = time.perf_counter() - t0
+rss_after = rss_kb()
+print(json.dumps({"elapsed_ms": elapsed * 1000, "rss_before_kb": rss_before, "rss_after_kb": rss_after}))
+"""
+
+
+def _parse_importtime(stderr: str):
+    """Parse `-X importtime` lines after the marker into (package, cumulative_us) for top-level imports."""
+    rows = []
+    trace = stderr.split(_MARKER, 1)[-1]
+    for line in trace.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        try:
+            _, cum_us, name = line[len("import time:"):].split("|", 2)
+            # Nesting depth is encoded as extra leading spaces in the name column
+            if len(name) - len(name.lstrip(" ")) != 1:
+                continue
+            rows.append((name.strip(), int(cum_us)))
+        except ValueError:
+            continue
+    return rows
+
+
+class Command(BaseCommand):
+    help = "Report cold import time and RSS growth per app module (python -X importtime, one subprocess per module)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("modules", nargs="*", help="Dotted module paths (default: all app view/query modules).")
+        parser.add_argument("--top", type=int, default=5, help="Heaviest top-level dependencies to list per module.")
+        parser.add_argument("--json", dest="json_path", default=None, help="Also write the report to this JSON file.")
+
+    def handle(self, *args, **options):
+        modules = options["modules"] or DEFAULT_MODULES
+        top_n = options["top"]
+
+        env = os.environ.copy()
+        env.setdefault("DJANGO_SETTINGS_MODULE", "mini_mcu.settings")
+        env["PYTHONPATH"] = os.pathsep.join([str(settings.BASE_DIR)] + [p for p in sys.path if p])
+
+        report = []
+        for module in modules:
+            proc = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", _CHILD_SCRIPT, module, _MARKER],
+                cwd=str(settings.BASE_DIR), env=env, capture_output=True, text=True,
+            )
+            result_line = (proc.stdout.strip().splitlines() or [""])[-1]
+            try:
+                result = json.loads(result_line)
+            except Exception:
+                err = (proc.stderr.strip().splitlines() or ["unknown error"])[-1]
+                self.stdout.write(self.style.ERROR(f"{module}: import failed ({err})"))
+                report.append({"module": module, "error": err})
+                continue
+
+            # Only dependencies imported after django.setup() (i.e. after the marker) count for this module
+            heaviest = sorted(_parse_importtime(proc.stderr), key=lambda d: d[1], reverse=True)[:top_n]
+
+            entry = {
+                "module": module,
+                "import_ms": round(result["elapsed_ms"], 1),
+                "rss_delta_mb": round((result["rss_after_kb"] - result["rss_before_kb"]) / 1024, 1),
+                "rss_total_mb": round(result["rss_after_kb"] / 1024, 1),
+                "heaviest": [{"package": name, "cumulative_ms": round(cum / 1000, 1)} for name, cum in heaviest],
+            }
+            report.append(entry)
+
+            self.stdout.write(self.style.SUCCESS(
+                f"{module}: {entry['import_ms']} ms, +{entry['rss_delta_mb']} MB RSS (total {entry['rss_total_mb']} MB)"
+            ))
+            for dep in entry["heaviest"]:
+                self.stdout.write(f"    {dep['cumulative_ms']:>8} ms  {dep['package']}")
+
+        if options["json_path"]:
+            with open(options["json_path"], "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.NOTICE(f"Report written to {options['json_path']}"))
@@ -0,0 +1,293 @@
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime
+
+import pandas as pd
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment
+from django.urls import reverse
+
+from core import core_models, upload_ledger
+
+MANAGER = "Manager"
+NURSE = "Tenaga Kesehatan"
+
+
+def _percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[k]
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the hot endpoints with the Django test client and write latency percentiles, "
+        "query counts and peak memory to a JSON file (seed data first with seed_synthetic_data)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=20, help="Timed requests per read scenario.")
+        parser.add_argument("--warmup", type=int, default=2, help="Untimed requests per scenario before measuring.")
+        parser.add_argument("--upload-iterations", type=int, default=3, help="Timed requests per upload scenario.")
+        parser.add_argument("--upload-rows", type=int, default=200, help="Rows in each generated upload XLS.")
+        parser.add_argument("--only", nargs="*", default=None, help="Run only these scenario names.")
+        parser.add_argument("--output", default=None, help="JSON report path (default: benchmark-<timestamp>.json).")
+        parser.add_argument("--compare", default=None, help="Previous JSON report to print p50/p95 deltas against.")
+
+    # -------------------------
+    # Scenarios
+    # -------------------------
+    def _scenarios(self, sample_uids, upload_rows):
+        today = date.today()
+        month_to = f"{today.year}-{today.month:02d}"
+        month_from_dt = pd.Timestamp(today) - pd.DateOffset(months=11)
+        month_from = f"{month_from_dt.year}-{month_from_dt.month:02d}"
+        uid = sample_uids[0]
+
+        def rotating_uid(i):
+            return {"uid": sample_uids[i % len(sample_uids)]}
+
+        return [
+            # name, role, method, url, params (dict or callable(i)), file factory, is_write
+            ("dashboard_table", MANAGER, "get", reverse("manager:dashboard"), {}, None, False),
+            ("dashboard_grafik_json", MANAGER, "get", reverse("manager:dashboard"),
+             {"submenu": "grafik", "grafik_json": "1", "uid": "all", "start_month": month_from, "end_month": month_to}, None, False),
+            ("well_unwell_summary_json", MANAGER, "get", reverse("manager:well_unwell_summary_json"),
+             {"month_from": month_from, "month_to": month_to}, None, False),
+            ("health_metrics_summary_json", MANAGER, "get", reverse("manager:health_metrics_summary_json"),
+             {"month_from": month_from, "month_to": month_to}, None, False),
+            ("karyawan_landing", None, "get", reverse("karyawan:landing"), rotating_uid, None, False),
+            ("export_checkup_excel", MANAGER, "get", reverse("manager:export_checkup_data"), {}, None, False),
+            ("export_master_karyawan_excel", MANAGER, "get", reverse("manager:export_master_karyawan"), {}, None, False),
+            ("export_checkup_pdf", NURSE, "get", reverse("nurse:export_checkup_pdf"), {}, None, False),
+            ("export_history_pdf", MANAGER, "get",
+             reverse("manager:export_checkup_history_by_uid_pdf", kwargs={"uid": uid}), {}, None, False),
+            ("qr_zip", MANAGER, "get", reverse("manager:qr_codes"), {"bulk": "1"}, None, False),
+            ("upload_master_karyawan_xls", MANAGER, "post", reverse("manager:upload_master_karyawan_xls"), {},
+             lambda: self._master_xls(upload_rows), True),
+            ("upload_medical_checkup_xls", MANAGER, "post", reverse("manager:upload_medical_checkup_xls"), {},
+             lambda: self._checkup_xls(upload_rows), True),
+        ]
+
+    def _master_xls(self, rows):
+        qs = core_models.Karyawan.objects.order_by("uid").values(
+            "uid", "nama", "jabatan", "lokasi", "tanggal_lahir", "tanggal_MCU", "expired_MCU", "derajat_kesehatan"
+        )[:rows]
+        return self._to_xlsx(pd.DataFrame(list(qs)), "master_karyawan_bench.xlsx")
+
+    def _checkup_xls(self, rows):
+        qs = core_models.Checkup.objects.order_by("-checkup_id").values(
+            "uid_id", "gula_darah_puasa", "gula_darah_sewaktu", "tekanan_darah",
+            "cholesterol", "asam_urat", "lingkar_perut", "lokasi",
+        )[:rows]
+        df = pd.DataFrame(list(qs)).rename(columns={"uid_id": "uid"})
+        if not df.empty:
+            df.insert(1, "tanggal_checkup", date.today().strftime("%Y-%m-%d"))
+        return self._to_xlsx(df, "checkup_bench.xlsx")
+
+    def _to_xlsx(self, df, name):
+        buf = io.BytesIO()
+        df.to_excel(buf, index=False, sheet_name="bench")
+        return self._named_buffer(buf.getvalue(), name)
+
+    def _named_buffer(self, blob, name):
+        buf = io.BytesIO(blob)
+        buf.name = name
+        return buf
+
+    # -------------------------
+    # Runner
+    # -------------------------
+    def _client_for(self, role):
+        client = Client()
+        if role:
+            session = client.session
+            session["authenticated"] = True
+            session["user_role"] = role
+            session["username"] = "benchmark"
+            session.save()
+            # Signed-cookie sessions get a new key on every save
+            client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+        return client
+
+    def _request(self, client, method, url, params, files, i):
+        data = params(i) if callable(params) else dict(params)
+        if method == "post":
+            if files:
+                data["file"] = files()
+            return client.post(url, data)
+        return client.get(url, data)
+
+    def _measure_once(self, client, method, url, params, files, i, is_write):
+        """One request: returns {seconds, queries, status, bytes}."""
+        result = {}
+        try:
+            # Writes run inside a rolled-back transaction so repeated runs see the same data
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as ctx:
+                    t0 = time.perf_counter()
+                    response = self._request(client, method, url, params, files, i)
+                    content = b"".join(response.streaming_content) if response.streaming else response.content
+                    result["seconds"] = time.perf_counter() - t0
+                result.update(queries=len(ctx.captured_queries), status=response.status_code, bytes=len(content))
+                if is_write:
+                    raise _Rollback()
+        except _Rollback:
+            pass
+        return result
+
+    def handle(self, *args, **options):
+        sample_uids = list(core_models.Karyawan.objects.order_by("uid").values_list("uid", flat=True)[:50])
+        if not sample_uids:
+            raise CommandError("No karyawan rows found. Seed data first: manage.py seed_synthetic_data")
+
+        setup_test_environment()
+        # Created outside the rolled-back upload requests, so the DDL is not rolled back with them
+        upload_ledger.ensure_tables()
+        scenarios = self._scenarios(sample_uids, options["upload_rows"])
+        if options["only"]:
+            scenarios = [s for s in scenarios if s[0] in set(options["only"])]
+
+        # Uploads write files and JSON logs; keep them out of the real media directories
+        scratch = tempfile.TemporaryDirectory(prefix="mini_mcu_bench_")
+        overrides = override_settings(
+            UPLOAD_DIR=scratch.name,
+            UPLOAD_CHECKUPS_DIR=os.path.join(scratch.name, "checkups"),
+            UPLOAD_LOG_DIR=os.path.join(scratch.name, "logs"),
+        )
+
+        results = {}
+        with overrides:
+            for name, role, method, url, params, files, is_write in scenarios:
+                client = self._client_for(role)
+                if files:
+                    # Build the upload once so generating it is not part of the measurement
+                    template = files()
+                    files = lambda blob=template.getvalue(), fname=template.name: self._named_buffer(blob, fname)
+                iterations = options["upload_iterations"] if is_write else options["iterations"]
+                for i in range(options["warmup"]):
+                    self._measure_once(client, method, url, params, files, i, is_write)
+
+                samples = [self._measure_once(client, method, url, params, files, i, is_write) for i in range(iterations)]
+
+                # Separate pass under tracemalloc: tracing skews latency, so peak memory is measured alone
+                tracemalloc.start()
+                self._measure_once(client, method, url, params, files, 0, is_write)
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+                latencies_ms = [s["seconds"] * 1000 for s in samples]
+                results[name] = {
+                    "url": url,
+                    "role": role,
+                    "iterations": iterations,
+                    "status": sorted({s["status"] for s in samples}),
+                    "p50_ms": round(_percentile(latencies_ms, 50), 2),
+                    "p90_ms": round(_percentile(latencies_ms, 90), 2),
+                    "p95_ms": round(_percentile(latencies_ms, 95), 2),
+                    "p99_ms": round(_percentile(latencies_ms, 99), 2),
+                    "mean_ms": round(statistics.mean(latencies_ms), 2),
+                    "max_ms": round(max(latencies_ms), 2),
+                    "queries": int(statistics.median(s["queries"] for s in samples)),
+                    "response_bytes": int(statistics.median(s["bytes"] for s in samples)),
+                    "peak_mem_mb": round(peak / (1024 * 1024), 2),
+                }
+                r = results[name]
+                self.stdout.write(
+                    f"{name:<30} p50={r['p50_ms']:>9.1f}ms p95={r['p95_ms']:>9.1f}ms "
+                    f"queries={r['queries']:>5} peak={r['peak_mem_mb']:>7.1f}MB status={r['status']}"
+                )
+        scratch.cleanup()
+
+        report = {
+            "meta": self._meta(options),
+            "results": results,
+            "frame_memory": self._frame_memory(),
+        }
+        output = options["output"] or f"benchmark-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Report written to {output}"))
+
+        if options["compare"]:
+            self._compare(options["compare"], results)
+
+    def _frame_memory(self):
+        """Deep memory of the hot frames as returned today vs. converted with core.frame_schema."""
+        from core.frame_schema import compact_frame, frame_memory
+        from core.helpers import get_dashboard_checkup_data
+        from core.queries import get_employees, load_checkups
+
+        report = {}
+        for name, loader in (
+            ("get_employees", get_employees),
+            ("load_checkups", load_checkups),
+            ("get_dashboard_checkup_data", get_dashboard_checkup_data),
+        ):
+            df = loader()
+            before, after = frame_memory(df), frame_memory(compact_frame(df))
+            report[name] = {
+                "rows": len(df),
+                "bytes": before,
+                "compact_bytes": after,
+                "saved_pct": round((before - after) / before * 100, 1) if before else 0.0,
+            }
+            self.stdout.write(
+                f"{name:<30} rows={len(df):>7} memory={before / 1024:>9.1f}KB "
+                f"compact={after / 1024:>9.1f}KB (-{report[name]['saved_pct']}%)"
+            )
+        return report
+
+    def _meta(self, options):
+        try:
+            git_rev = subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], cwd=str(settings.BASE_DIR), capture_output=True, text=True
+            ).stdout.strip() or None
+        except Exception:
+            git_rev = None
+        return {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_rev": git_rev,
+            "python": platform.python_version(),
+            "db_vendor": connection.vendor,
+            "karyawan_rows": core_models.Karyawan.objects.count(),
+            "checkup_rows": core_models.Checkup.objects.count(),
+            "iterations": options["iterations"],
+            "upload_iterations": options["upload_iterations"],
+            "upload_rows": options["upload_rows"],
+        }
+
+    def _compare(self, path, results):
+        try:
+            with open(path, encoding="utf-8") as f:
+                previous = json.load(f).get("results", {})
+        except Exception as e:
+            self.stdout.write(self.style.WARNING(f"Could not read {path}: {e}"))
+            return
+        self.stdout.write(self.style.NOTICE(f"Compared with {path}:"))
+        for name, cur in results.items():
+            prev = previous.get(name)
+            if not prev:
+                continue
+            for key in ("p50_ms", "p95_ms", "queries", "peak_mem_mb"):
+                before, after = prev.get(key), cur.get(key)
+                if not before:
+                    continue
+                change = (after - before) / before * 100
+                style = self.style.SUCCESS if change <= 0 else self.style.WARNING
+                self.stdout.write(style(f"  {name:<30} {key:<12} {before:>10} -> {after:<10} ({change:+.1f}%)"))
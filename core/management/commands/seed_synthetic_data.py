@@ -0,0 +1,171 @@
+import random
+import uuid
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core import core_models, data_version
+from core.helpers import compute_bmi_category, compute_status
+
+# Every synthetic employee is tagged by its lokasi so --clear never touches real data. uids are
+# deterministic UUIDs: karyawan.uid / checkups.uid are uuid columns on Postgres, and master uploads
+# lowercase uids, so a re-uploaded seeded master updates these rows instead of inserting new ones.
+SYNTHETIC_LOKASI_PREFIX = "syn-site-"
+SYNTHETIC_UID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_DNS, "synthetic.mini-mcu")
+
+
+def synthetic_uid(i):
+    return str(uuid.uuid5(SYNTHETIC_UID_NAMESPACE, f"syn-{i}"))
+
+
+def synthetic_karyawan():
+    return core_models.Karyawan.objects.filter(lokasi__startswith=SYNTHETIC_LOKASI_PREFIX)
+
+JABATAN_CHOICES = ["operator", "mekanik", "driver", "supervisor", "admin", "helper", "foreman", "engineer"]
+DERAJAT_WEIGHTS = [("P1", 30), ("P2", 30), ("P3", 15), ("P4", 10), ("P5", 8), ("P6", 5), ("P7", 2)]
+
+
+def _clip(value, low, high):
+    return max(low, min(high, value))
+
+
+class Command(BaseCommand):
+    help = "Seed N synthetic employees across M lokasi with K months of checkups (for benchmarks / local dev)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--employees", type=int, default=500, help="Number of employees (N).")
+        parser.add_argument("--lokasi", type=int, default=10, help="Number of lokasi (M).")
+        parser.add_argument("--months", type=int, default=12, help="Months of checkup history ending this month (K).")
+        parser.add_argument("--coverage", type=float, default=0.8, help="Probability an employee has a checkup in a given month.")
+        parser.add_argument("--seed", type=int, default=42, help="Random seed (same seed = same data).")
+        parser.add_argument("--batch-size", type=int, default=1000, help="bulk_create batch size.")
+        parser.add_argument("--clear", action="store_true", help="Delete previously seeded synthetic rows first.")
+        parser.add_argument(
+            "--create-tables", action="store_true",
+            help="Create the unmanaged users/lokasi/karyawan/checkups tables if missing (scratch databases only).",
+        )
+
+    def handle(self, *args, **options):
+        n_emp, n_lok, n_months = options["employees"], options["lokasi"], options["months"]
+        if n_emp <= 0 or n_lok <= 0 or n_months <= 0:
+            raise CommandError("--employees, --lokasi and --months must be positive.")
+        rng = random.Random(options["seed"])
+        batch_size = options["batch_size"]
+
+        self.stdout.write(self.style.NOTICE(f"DB vendor: {connection.vendor}"))
+
+        if options["create_tables"]:
+            self._create_missing_tables()
+
+        if options["clear"]:
+            self._clear()
+        elif synthetic_karyawan().exists():
+            raise CommandError("Synthetic data already present. Re-run with --clear to replace it.")
+
+        lokasi_names = [f"{SYNTHETIC_LOKASI_PREFIX}{i:02d}" for i in range(1, n_lok + 1)]
+        today = date.today()
+        month_starts = []
+        y, m = today.year, today.month
+        for _ in range(n_months):
+            month_starts.append(date(y, m, 1))
+            y, m = (y - 1, 12) if m == 1 else (y, m - 1)
+        month_starts.reverse()
+
+        employees = []
+        for i in range(1, n_emp + 1):
+            tanggal_lahir = date(rng.randint(1965, 2003), rng.randint(1, 12), rng.randint(1, 28))
+            tanggal_mcu = today - timedelta(days=rng.randint(0, 400))
+            tinggi = round(_clip(rng.gauss(165, 8), 145, 195), 1)
+            berat = round(_clip(rng.gauss(68, 12), 40, 130), 1)
+            bmi = round(berat / ((tinggi / 100) ** 2), 2)
+            employees.append(core_models.Karyawan(
+                uid=synthetic_uid(i),
+                nama=f"karyawan sintetis {i}",
+                jabatan=rng.choice(JABATAN_CHOICES),
+                lokasi=lokasi_names[i % n_lok],
+                tanggal_lahir=tanggal_lahir,
+                umur=today.year - tanggal_lahir.year,
+                tanggal_MCU=tanggal_mcu,
+                expired_MCU=tanggal_mcu + timedelta(days=365),
+                derajat_kesehatan=rng.choices([d for d, _ in DERAJAT_WEIGHTS], [w for _, w in DERAJAT_WEIGHTS])[0],
+                tinggi=tinggi,
+                berat=berat,
+                bmi=bmi,
+                bmi_category=compute_bmi_category(bmi),
+            ))
+
+        checkups = []
+        for emp in employees:
+            berat = float(emp.berat)
+            for month_start in month_starts:
+                if rng.random() > options["coverage"]:
+                    continue
+                day = month_start + timedelta(days=rng.randint(0, 27))
+                if day > today:
+                    day = today
+                # Weight drifts a little month to month; lab values are drawn around typical population means
+                berat = round(_clip(berat + rng.gauss(0, 1.2), 40, 140), 1)
+                tinggi = float(emp.tinggi)
+                values = {
+                    "bmi": round(berat / ((tinggi / 100) ** 2), 2),
+                    "gula_darah_puasa": round(_clip(rng.gauss(98, 20), 60, 300), 1),
+                    "gula_darah_sewaktu": round(_clip(rng.gauss(135, 40), 70, 400), 1),
+                    "cholesterol": round(_clip(rng.gauss(195, 38), 110, 380), 1),
+                    "asam_urat": round(_clip(rng.gauss(5.8, 1.5), 2, 12), 1),
+                }
+                systolic = int(_clip(rng.gauss(122, 15), 90, 200))
+                diastolic = int(_clip(systolic * 0.65 + rng.gauss(0, 6), 55, 120))
+                checkups.append(core_models.Checkup(
+                    uid_id=emp.uid,
+                    tanggal_checkup=day,
+                    tanggal_lahir=emp.tanggal_lahir,
+                    umur=emp.umur,
+                    tinggi=tinggi,
+                    berat=berat,
+                    lingkar_perut=round(_clip(rng.gauss(86, 11), 60, 140), 1),
+                    gestational_diabetes=None,
+                    tekanan_darah=f"{systolic}/{diastolic}",
+                    status=compute_status(values),
+                    lokasi=emp.lokasi,
+                    derajat_kesehatan=emp.derajat_kesehatan,
+                    **values,
+                ))
+
+        with transaction.atomic():
+            existing_lokasi = set(core_models.Lokasi.objects.filter(nama__in=lokasi_names).values_list("nama", flat=True))
+            core_models.Lokasi.objects.bulk_create(
+                [core_models.Lokasi(nama=name) for name in lokasi_names if name not in existing_lokasi],
+                batch_size=batch_size,
+            )
+            core_models.Karyawan.objects.bulk_create(employees, batch_size=batch_size)
+            core_models.Checkup.objects.bulk_create(checkups, batch_size=batch_size)
+            data_version.bump(data_version.KARYAWAN)
+            data_version.bump(data_version.CHECKUPS)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(employees)} karyawan across {n_lok} lokasi with {len(checkups)} checkups "
+            f"({month_starts[0]:%Y-%m} .. {month_starts[-1]:%Y-%m})."
+        ))
+
+    def _clear(self):
+        with transaction.atomic():
+            uids = list(synthetic_karyawan().values_list("uid", flat=True))
+            n_chk = n_emp = 0
+            for i in range(0, len(uids), 500):
+                n_chk += core_models.Checkup.objects.filter(uid_id__in=uids[i:i + 500]).delete()[0]
+                n_emp += core_models.Karyawan.objects.filter(uid__in=uids[i:i + 500]).delete()[0]
+            n_lok, _ = core_models.Lokasi.objects.filter(nama__startswith=SYNTHETIC_LOKASI_PREFIX).delete()
+            data_version.bump(data_version.KARYAWAN)
+            data_version.bump(data_version.CHECKUPS)
+        self.stdout.write(self.style.WARNING(f"Cleared synthetic data: {n_emp} karyawan, {n_chk} checkups, {n_lok} lokasi."))
+
+    def _create_missing_tables(self):
+        existing = set(connection.introspection.table_names())
+        with connection.schema_editor() as editor:
+            for model in (core_models.User, core_models.Lokasi, core_models.Karyawan, core_models.Checkup):
+                table = model._meta.db_table
+                if table in existing:
+                    continue
+                editor.create_model(model)
+                self.stdout.write(self.style.SUCCESS(f"Created table '{table}'."))
@@ -0,0 +1,286 @@
+# core/metrics.py
+"""
+Minimal Prometheus-style metrics aggregated across gunicorn workers.
+
+Each worker keeps counters/histograms in memory and periodically dumps them to
+METRICS_DIR/metrics-<pid>.json (atomic replace). The /metrics view merges every
+worker file, so no external service or shared memory is needed. Counters and histograms
+of workers that have exited are folded into metrics-retired.json and their files deleted,
+so totals stay cumulative while the directory holds one file per live worker; gauges
+only count live workers. Gauges are sampled by collectors (add_collector) right before each flush.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows dev server: a single process, nothing to serialize against
+    fcntl = None
+
+# Histogram buckets (seconds) shared by request, helper and export durations
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_lock = threading.Lock()
+_counters = {}    # (name, labels) -> float
+_histograms = {}  # (name, labels) -> {"buckets": [..], "sum": float, "count": int}
+_gauges = {}      # (name, labels) -> float, this worker's latest sample
+_collectors = []  # callables that set_gauge() before each flush
+_last_flush = 0.0
+
+RETIRED_FILE = "metrics-retired.json"
+
+HELP = {
+    "mini_mcu_http_requests_total": "HTTP requests by view, method and status.",
+    "mini_mcu_http_request_duration_seconds": "Request latency by view.",
+    "mini_mcu_db_queries_total": "DB queries issued, by view.",
+    "mini_mcu_db_query_seconds_total": "Time spent in DB queries, by view.",
+    "mini_mcu_helper_duration_seconds": "Duration of @timed helpers (pandas loads, parsers, exports).",
+    "mini_mcu_cache_requests_total": "utils.cache_utils lookups by result (hit/miss).",
+    "mini_mcu_upload_rows_total": "Upload rows by upload kind and outcome (inserted/skipped).",
+    "mini_mcu_process_resident_memory_bytes": "Resident memory of each live worker.",
+    "mini_mcu_db_pool_size": "Connections currently open in the worker's pool.",
+    "mini_mcu_db_pool_available": "Idle connections ready in the worker's pool.",
+    "mini_mcu_db_pool_max": "Configured maximum pool size.",
+    "mini_mcu_db_pool_requests_waiting": "Requests currently queued for a pool connection.",
+    "mini_mcu_db_pool_requests": "Connections handed out by the pool since the worker started.",
+    "mini_mcu_db_pool_requests_wait_ms": "Total time spent waiting for a pool connection (ms).",
+    "mini_mcu_db_pool_connections": "Connections the pool opened since the worker started.",
+    "mini_mcu_db_pool_connection_errors": "Failed connection attempts of the pool.",
+    "mini_mcu_db_pool_connections_lost": "Connections found broken by the pool health check.",
+}
+
+
+def _labels_key(labels):
+    return tuple(sorted((labels or {}).items()))
+
+
+def inc(name, labels=None, value=1.0):
+    """Increment a counter."""
+    key = (name, _labels_key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0.0) + value
+
+
+def observe(name, seconds, labels=None, buckets=DEFAULT_BUCKETS):
+    """Record one observation in a histogram."""
+    key = (name, _labels_key(labels))
+    with _lock:
+        h = _histograms.get(key)
+        if h is None:
+            h = _histograms[key] = {"le": list(buckets), "buckets": [0] * len(buckets), "sum": 0.0, "count": 0}
+        for i, bound in enumerate(h["le"]):
+            if seconds <= bound:
+                h["buckets"][i] += 1
+        h["sum"] += seconds
+        h["count"] += 1
+
+
+def set_gauge(name, value, labels=None):
+    """Set this worker's current value of a gauge."""
+    with _lock:
+        _gauges[(name, _labels_key(labels))] = float(value)
+
+
+def add_collector(fn):
+    """Register fn() to refresh gauges before each flush (e.g. core.db_pool.record_pool_metrics)."""
+    if fn not in _collectors:
+        _collectors.append(fn)
+
+
+def record_upload(kind, inserted, skipped):
+    """Count rows of one upload; rows/sec is rate(mini_mcu_upload_rows_total[...]) in Prometheus."""
+    inc("mini_mcu_upload_rows_total", {"kind": kind, "outcome": "inserted"}, float(inserted or 0))
+    inc("mini_mcu_upload_rows_total", {"kind": kind, "outcome": "skipped"}, float(skipped or 0))
+
+
+def observe_request(record):
+    """Feed one PerfInstrumentationMiddleware record into the request metrics."""
+    view = record.get("view") or "unresolved"
+    inc("mini_mcu_http_requests_total", {"view": view, "method": record.get("method"), "status": str(record.get("status"))})
+    observe("mini_mcu_http_request_duration_seconds", record.get("total_ms", 0) / 1000.0, {"view": view})
+    inc("mini_mcu_db_queries_total", {"view": view}, float(record.get("db_queries", 0)))
+    inc("mini_mcu_db_query_seconds_total", {"view": view}, record.get("db_ms", 0) / 1000.0)
+
+
+# -------------------------
+# Cross-worker aggregation
+# -------------------------
+def metrics_dir():
+    path = getattr(settings, "METRICS_DIR", None) or os.path.join(tempfile.gettempdir(), "mini_mcu_metrics")
+    os.makedirs(path, exist_ok=True)
+    return str(path)
+
+
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        try:
+            import resource
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        except Exception:
+            return None
+
+
+def flush(force=False):
+    """Write this worker's snapshot; throttled to METRICS_FLUSH_SECONDS unless forced."""
+    global _last_flush
+    interval = float(getattr(settings, "METRICS_FLUSH_SECONDS", 2.0))
+    now = time.time()
+    if not force and now - _last_flush < interval:
+        return
+    _last_flush = now
+    for collect in _collectors:
+        try:
+            collect()
+        except Exception:
+            pass
+    with _lock:
+        snapshot = {
+            "pid": os.getpid(),
+            "rss": _rss_bytes(),
+            "counters": [[name, list(map(list, labels)), value] for (name, labels), value in _counters.items()],
+            "histograms": [[name, list(map(list, labels)), h] for (name, labels), h in _histograms.items()],
+            "gauges": [[name, list(map(list, labels)), value] for (name, labels), value in _gauges.items()],
+        }
+    try:
+        directory = metrics_dir()
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        with os.fdopen(fd, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, os.path.join(directory, f"metrics-{os.getpid()}.json"))
+    except Exception:
+        pass
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except Exception:
+        return True
+
+
+def _fmt_labels(labels):
+    if not labels:
+        return ""
+    inner = ",".join('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in labels)
+    return "{" + inner + "}"
+
+
+def _merge(counters, histograms, snap):
+    """Add a snapshot's counters and histograms into the (name, labels)-keyed dicts."""
+    for name, labels, value in snap.get("counters", []):
+        key = (name, tuple(map(tuple, labels)))
+        counters[key] = counters.get(key, 0.0) + value
+    for name, labels, h in snap.get("histograms", []):
+        key = (name, tuple(map(tuple, labels)))
+        agg = histograms.get(key)
+        if agg is None:
+            histograms[key] = {"le": h["le"], "buckets": list(h["buckets"]), "sum": h["sum"], "count": h["count"]}
+        elif agg["le"] == h["le"]:
+            agg["buckets"] = [a + b for a, b in zip(agg["buckets"], h["buckets"])]
+            agg["sum"] += h["sum"]
+            agg["count"] += h["count"]
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
+def _retire_dead_workers(directory):
+    """Fold the files of exited workers into RETIRED_FILE and delete them (under a lock, so two
+    /metrics requests never fold the same file twice)."""
+    with open(os.path.join(directory, ".retire.lock"), "a") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        dead = []
+        for fname in os.listdir(directory):
+            pid = fname[len("metrics-"):-len(".json")] if fname.startswith("metrics-") and fname.endswith(".json") else ""
+            if pid.isdigit() and int(pid) != os.getpid() and not _pid_alive(int(pid)):
+                dead.append(os.path.join(directory, fname))
+        if not dead:
+            return
+        counters, histograms = {}, {}
+        retired_path = os.path.join(directory, RETIRED_FILE)
+        for path in [retired_path] + dead:
+            snap = _read(path)
+            if snap:
+                _merge(counters, histograms, snap)
+        retired = {
+            "counters": [[name, list(map(list, labels)), value] for (name, labels), value in counters.items()],
+            "histograms": [[name, list(map(list, labels)), h] for (name, labels), h in histograms.items()],
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        with os.fdopen(fd, "w") as f:
+            json.dump(retired, f)
+        os.replace(tmp_path, retired_path)
+        for path in dead:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def render_prometheus():
+    """Merge all worker snapshots and render the Prometheus text exposition format."""
+    flush(force=True)
+    counters, histograms, gauges, rss = {}, {}, {}, []
+    directory = metrics_dir()
+    try:
+        _retire_dead_workers(directory)
+    except Exception:
+        pass
+    for fname in os.listdir(directory):
+        if not (fname.startswith("metrics-") and fname.endswith(".json")):
+            continue
+        snap = _read(os.path.join(directory, fname))
+        if snap is None:
+            continue
+        _merge(counters, histograms, snap)
+        pid = snap.get("pid")
+        if not pid or not _pid_alive(pid):
+            continue
+        if snap.get("rss") is not None:
+            rss.append((pid, snap["rss"]))
+        for name, labels, value in snap.get("gauges", []):
+            gauges[(name, tuple(map(tuple, labels)) + (("pid", str(pid)),))] = value
+
+    lines = []
+    seen = set()
+
+    def header(name, kind):
+        if name not in seen:
+            seen.add(name)
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), value in sorted(counters.items()):
+        header(name, "counter")
+        lines.append(f"{name}{_fmt_labels(labels)} {value}")
+    for (name, labels), h in sorted(histograms.items(), key=lambda kv: kv[0]):
+        header(name, "histogram")
+        for bound, count in zip(h["le"], h["buckets"]):
+            lines.append(f"{name}_bucket{_fmt_labels(labels + (('le', str(bound)),))} {count}")
+        lines.append(f"{name}_bucket{_fmt_labels(labels + (('le', '+Inf'),))} {h['count']}")
+        lines.append(f"{name}_sum{_fmt_labels(labels)} {h['sum']}")
+        lines.append(f"{name}_count{_fmt_labels(labels)} {h['count']}")
+    for (name, labels), value in sorted(gauges.items()):
+        header(name, "gauge")
+        lines.append(f"{name}{_fmt_labels(labels)} {value}")
+    header("mini_mcu_process_resident_memory_bytes", "gauge")
+    for pid, value in sorted(rss):
+        lines.append(f'mini_mcu_process_resident_memory_bytes{{pid="{pid}"}} {value}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,52 @@
+# core/passwords.py
+"""
+bcrypt hashing for user passwords.
+
+Single hashes (add_user, reset_user_password) run inline with BCRYPT_ROUNDS. Bulk operations
+(queries.reset_all_passwords) hash in a short-lived process pool of PASSWORD_HASH_WORKERS processes,
+so N users cost about N / workers hashes of wall time instead of N. Every hash still gets its own salt.
+The pool uses the "spawn" start method: the web worker has DB connections and background threads
+that must not be forked.
+"""
+import os
+
+import bcrypt
+from django.conf import settings
+
+from core.instrumentation import logger
+
+
+def rounds() -> int:
+    """bcrypt cost factor (4..31); each +1 doubles the time of a hash and of a login check."""
+    return min(max(int(getattr(settings, "BCRYPT_ROUNDS", 12)), 4), 31)
+
+
+def workers() -> int:
+    configured = int(getattr(settings, "PASSWORD_HASH_WORKERS", 0) or 0)
+    return configured if configured > 0 else min(4, os.cpu_count() or 1)
+
+
+def _hash(password: str, cost: int) -> str:
+    # Module-level so the pool can pickle it
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(cost)).decode("utf-8")
+
+
+def hash_password(password: str) -> str:
+    return _hash(password, rounds())
+
+
+def hash_passwords(passwords) -> list:
+    """Hashes for `passwords`, in order. Falls back to hashing inline if the pool cannot start."""
+    passwords = list(passwords)
+    cost = rounds()
+    n_workers = min(workers(), len(passwords))
+    if n_workers > 1:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        try:
+            with ProcessPoolExecutor(n_workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                return list(pool.map(_hash, passwords, [cost] * len(passwords)))
+        except Exception as e:
+            logger.warning("password hash pool unavailable, hashing inline: %s", e)
+    return [_hash(p, cost) for p in passwords]
@@ -1,16 +1,20 @@
 # core/queries.py
 import os
 import uuid
-import bcrypt
 import pandas as pd
 from django.db import transaction
 from django.db import connection
 from django.db.models import Count, Max
 from core import core_models
-from core.db_utils import fetch_all, fetch_one, execute_raw
+from core.db_utils import fetch_all, fetch_one, execute_raw, fetch_frame, iter_frames, column_types
 from django.conf import settings
 import json
 from datetime import datetime
+from core.instrumentation import timed, logger
+from core.query_budget import query_budget
+from core import data_version, passwords, snapshot
+from core.db_router import replica_reads
+from core.frame_schema import compact_frame, display_frame
 
 # --- Expected schema for checkups table ---
 CHECKUP_COLUMNS = [
@@ -36,20 +40,53 @@ def _round_numeric_cols(df: pd.DataFrame, cols=None, decimals=2) -> pd.DataFrame
     return df
 
 # Add a safe DB introspection helper to avoid selecting non-existent columns on unmanaged tables
+# Positive results are memoized per process: columns are only ever added by patch scripts,
+# and hot per-uid lookups should not pay an introspection query on every request.
+_COLUMN_PRESENCE = {}
+
 def _db_has_column(table_name: str, column_name: str) -> bool:
+    if _COLUMN_PRESENCE.get((table_name, column_name)):
+        return True
     try:
         with connection.cursor() as cursor:
             cols = connection.introspection.get_table_description(cursor, table_name)
-            return any(getattr(c, "name", None) == column_name for c in cols)
+            found = any(getattr(c, "name", None) == column_name for c in cols)
     except Exception as e:
         print(f"DEBUG: Introspection failed for {table_name}.{column_name}: {e}")
         return False
+    if found:
+        _COLUMN_PRESENCE[(table_name, column_name)] = True
+    return found
+
+# Typed columns for fetch_frame: Decimal -> float64, dates -> datetime64 (also where SQLite returns strings)
+_FRAME_TYPES = {}
+
+def _frame_types():
+    if not _FRAME_TYPES:
+        _FRAME_TYPES.update(column_types(core_models.Checkup, core_models.Karyawan))
+    return _FRAME_TYPES
+
+def _qn(name: str) -> str:
+    return connection.ops.quote_name(name)
+
+def _select_list(alias: str, columns) -> str:
+    return ", ".join(f"{alias}.{_qn(c)} AS {_qn(c)}" for c in columns)
 
 # -------------------------
 # Karyawan
 # -------------------------
+@timed()
 def get_employees() -> pd.DataFrame:
     """Return all employees as a DataFrame with properly formatted dates."""
+    if snapshot.enabled():
+        try:
+            frame = snapshot.get_frame("employees", lambda: compact_frame(_fetch_employees()))
+            return display_frame(frame, date_format="%Y-%m-%d")
+        except Exception as e:
+            logger.warning("employees snapshot unavailable, reading the database: %s", e)
+    return _fetch_employees()
+
+def _fetch_employees() -> pd.DataFrame:
     # Build field list dynamically to avoid selecting columns that don't exist in the DB
     fields = [
         "uid", "nama", "jabatan", "lokasi", "tanggal_lahir",
@@ -62,8 +99,7 @@ def get_employees() -> pd.DataFrame:
     if _db_has_column("karyawan", "umur"):
         fields.insert(5, "umur")  # keep umur near tanggal_lahir for template expectations
 
-    qs = core_models.Karyawan.objects.all().values(*fields)
-    df = pd.DataFrame(list(qs))
+    df = fetch_frame(f"SELECT {_select_list('k', fields)} FROM karyawan k", types=_frame_types())
 
     # Ensure umur column exists for templates (pass-through only; no auto-compute)
     if "umur" not in df.columns:
@@ -121,59 +157,235 @@ def add_employee_from_sheet(username, jabatan, sheet_name, tanggal_lahir=None, b
         return existing.uid
     raise ValueError(f"Karyawan '{username}' with jabatan '{jabatan}' not found in master data.")
 
-def get_karyawan_uid_bulk(df: pd.DataFrame):
+def _uid_keys(df: pd.DataFrame):
+    return df[["nama", "jabatan", "lokasi", "tanggal_lahir"]].drop_duplicates().to_dict(orient="records")
+
+def match_karyawan_uids(df: pd.DataFrame, employees) -> dict:
     """
-    Optimized bulk lookup of Karyawan UIDs from uploaded XLS.
+    {(nama, jabatan, lokasi, tanggal_lahir): uid} for the rows of `df`, matched against `employees`
+    (dicts with uid/nama/jabatan/lokasi/tanggal_lahir). No queries, so upload parse workers can use it.
     """
-    keys = df[["nama", "jabatan", "lokasi", "tanggal_lahir"]].drop_duplicates().to_dict(orient="records")
+    def _as_date(value):
+        try:
+            return pd.Timestamp(value).date()
+        except Exception:
+            return value
+
+    candidates = {}
+    for emp in employees:
+        candidates.setdefault(emp["nama"], []).append(emp)
+
     mapping = {}
-    for row in keys:
-        qs = core_models.Karyawan.objects.filter(nama=row["nama"])
-        if row.get("jabatan"):
-            qs = qs.filter(jabatan=row["jabatan"])
-        if row.get("lokasi"):
-            qs = qs.filter(lokasi=row["lokasi"])
-        if row.get("tanggal_lahir"):
-            qs = qs.filter(tanggal_lahir=row["tanggal_lahir"])
-        obj = qs.first()
-        if obj:
-            mapping[(row["nama"], row.get("jabatan"), row.get("lokasi"), row.get("tanggal_lahir"))] = obj.uid
+    for row in _uid_keys(df):
+        for emp in candidates.get(row["nama"], []):
+            if row.get("jabatan") and emp["jabatan"] != row["jabatan"]:
+                continue
+            if row.get("lokasi") and emp["lokasi"] != row["lokasi"]:
+                continue
+            if row.get("tanggal_lahir") and _as_date(emp["tanggal_lahir"]) != _as_date(row["tanggal_lahir"]):
+                continue
+            mapping[(row["nama"], row.get("jabatan"), row.get("lokasi"), row.get("tanggal_lahir"))] = emp["uid"]
+            break
     return mapping
 
+def karyawan_uid_candidates(names=None) -> list:
+    """Employees (uid, nama, jabatan, lokasi, tanggal_lahir) for match_karyawan_uids; all when `names` is None."""
+    qs = core_models.Karyawan.objects.all()
+    if names is not None:
+        qs = qs.filter(nama__in=set(names))
+    return list(qs.values("uid", "nama", "jabatan", "lokasi", "tanggal_lahir"))
+
+@query_budget(2)
+def get_karyawan_uid_bulk(df: pd.DataFrame):
+    """
+    Optimized bulk lookup of Karyawan UIDs from uploaded XLS.
+    One query for all names; jabatan/lokasi/tanggal_lahir are matched in Python when present in the row.
+    """
+    keys = _uid_keys(df)
+    if not keys:
+        return {}
+    return match_karyawan_uids(df, karyawan_uid_candidates({row["nama"] for row in keys}))
+
 # -------------------------
 # Checkups
 # -------------------------
+_CHECKUP_FRAME_COLUMNS = [
+    "checkup_id", "uid", "tanggal_checkup", "tanggal_lahir", "umur",
+    "tinggi", "berat", "lingkar_perut", "bmi",
+    "gula_darah_puasa", "gula_darah_sewaktu", "cholesterol", "asam_urat",
+    "tekanan_darah", "derajat_kesehatan", "lokasi",
+]
+
+def _finish_checkup_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Shared tail of the checkup loaders: rounding and date objects (the shape callers expect)."""
+    df = _round_numeric_cols(df)
+    for col in ["tanggal_checkup", "tanggal_lahir"]:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors="coerce").dt.date
+    return df
+
+@timed()
 def load_checkups():
-    qs = core_models.Checkup.objects.select_related("uid").order_by("-tanggal_checkup").values(
-        "checkup_id", "uid_id", "tanggal_checkup", "tanggal_lahir", "umur",
-        "tinggi", "berat", "lingkar_perut", "bmi",
-        "gula_darah_puasa", "gula_darah_sewaktu", "cholesterol", "asam_urat",
-        "tekanan_darah", "derajat_kesehatan",
-        # Keep both sources of lokasi but we will standardize to a single column below
-        "lokasi",           # lokasi recorded on checkups (may be null or outdated)
-        "uid__lokasi",      # authoritative lokasi from Karyawan master
-        "uid__nama", "uid__jabatan"
+    """All checkups with nama/jabatan/lokasi from the Karyawan master, newest first."""
+    if snapshot.enabled():
+        try:
+            return display_frame(snapshot.get_frame("checkups", _build_checkups, refresh=_refresh_checkups))
+        except Exception as e:
+            logger.warning("checkups snapshot unavailable, reading the database: %s", e)
+    return _fetch_checkups()
+
+def _fetch_checkups(where: str = "", params=None):
+    # Checkups joined to the Karyawan master (the FK is NOT NULL, so an inner join like select_related)
+    df = fetch_frame(
+        f"SELECT {_select_list('c', _CHECKUP_FRAME_COLUMNS)}, "
+        f"k.lokasi AS lokasi_master, k.nama AS nama, k.jabatan AS jabatan "
+        f"FROM checkups c INNER JOIN karyawan k ON k.uid = c.uid "
+        f"{'WHERE ' + where if where else ''} "
+        f"ORDER BY c.tanggal_checkup DESC, c.checkup_id DESC",
+        params,
+        types=_frame_types(),
     )
-    df = pd.DataFrame(list(qs))
-    # Normalize related field names
-    df = df.rename(columns={
-        "uid__nama": "nama",
-        "uid__jabatan": "jabatan",
-        "uid__lokasi": "lokasi_master",  # avoid duplicate column name
-        "uid_id": "uid",
-    })
     # Standardize to a single 'lokasi' column: prefer master lokasi when available
     if not df.empty:
         if "lokasi_master" in df.columns:
             # Prefer lokasi from Karyawan master, fallback to checkup.lokasi
             df["lokasi"] = df["lokasi_master"].where(df["lokasi_master"].notnull(), df.get("lokasi"))
-            # Drop helper column to prevent duplicate name issues downstream
-            df = df.drop(columns=["lokasi_master"]) if "lokasi_master" in df.columns else df
-    df = _round_numeric_cols(df)
-    for col in ["tanggal_checkup", "tanggal_lahir"]:
-        if col in df.columns:
-            df[col] = pd.to_datetime(df[col], errors="coerce").dt.date
-    return df
+    # Drop helper column to prevent duplicate name issues downstream
+    df = df.drop(columns=["lokasi_master"])
+    return _finish_checkup_frame(df)
+
+# -------------------------
+# Checkups snapshot: full build and incremental refresh (core.snapshot)
+# -------------------------
+# Edited ids re-read per refresh at most (one IN list); more than that reloads in full
+_DELTA_MAX_IDS = 500
+
+def _delta_max_rows(n_rows: int) -> int:
+    """Largest delta applied incrementally: DATA_SNAPSHOT_DELTA_MAX_ROWS or 10% of the frame."""
+    configured = getattr(settings, "DATA_SNAPSHOT_DELTA_MAX_ROWS", None)
+    return int(configured) if configured else max(1000, n_rows // 10)
+
+def _checkups_state(df: pd.DataFrame, karyawan_version, journal) -> dict:
+    ids = pd.to_numeric(df["checkup_id"], errors="coerce") if len(df) else pd.Series(dtype="float64")
+    return {
+        "karyawan": karyawan_version,
+        "journal": journal,
+        "high_water": int(ids.max()) if ids.notna().any() else 0,
+        "rows": len(df),
+    }
+
+def _build_checkups():
+    """Full load for the snapshot, with the state _refresh_checkups() continues from."""
+    # Read the versions first: a write landing during the fetch is replayed again by the next refresh
+    karyawan_version = data_version.current(data_version.KARYAWAN)
+    journal = data_version.journal_position(data_version.CHECKUPS)
+    df = _fetch_checkups()
+    return compact_frame(df), _checkups_state(df, karyawan_version, journal)
+
+def _refresh_checkups(frame: pd.DataFrame, state: dict):
+    """
+    Bring the previous snapshot up to date without reloading every row: fetch rows above its
+    high-water checkup_id plus the ids edited since (from the data_version journal), drop deleted ids.
+    Returns None, meaning full reload, when the employee master changed (nama/jabatan/lokasi are
+    joined in), the journal cannot be replayed, the delta is large, or the result does not match
+    the table's count / max id.
+    """
+    karyawan_version = data_version.current(data_version.KARYAWAN)
+    if karyawan_version != state.get("karyawan"):
+        return None
+    journal = data_version.journal_position(data_version.CHECKUPS)
+    changes = data_version.read_changes(data_version.CHECKUPS, state.get("journal"), journal)
+    if changes is None:
+        return None
+    edited, deleted, deleted_uids, deleted_ranges = set(), set(), set(), []
+    for op, key in changes:
+        if op == "U":
+            edited.add(int(key))
+        elif op == "D":
+            deleted.add(int(key))
+        elif op == "DU":
+            deleted_uids.add(key)
+        elif op == "DR":
+            # Upload rollback (core.upload_ledger): ids first..last
+            first, last = (int(x) for x in str(key).split("-"))
+            deleted_ranges.append((first, last))
+        else:
+            return None
+    edited = {i for i in edited - deleted if not any(lo <= i <= hi for lo, hi in deleted_ranges)}
+    limit = _delta_max_rows(len(frame))
+    n_deleted = len(deleted) + sum(hi - lo + 1 for lo, hi in deleted_ranges)
+    if len(edited) > _DELTA_MAX_IDS or len(edited) + n_deleted > limit:
+        return None
+
+    where, params = "c.checkup_id > %s", [state.get("high_water", 0)]
+    if edited:
+        where += f" OR c.checkup_id IN ({', '.join(['%s'] * len(edited))})"
+        params += sorted(edited)
+    fresh = _fetch_checkups(where, params)
+    if len(fresh) > limit:
+        return None
+
+    base = display_frame(frame)
+    fresh_ids = pd.to_numeric(fresh["checkup_id"], errors="coerce")
+    stale = base["checkup_id"].isin(deleted | set(fresh_ids.dropna().astype(int))) | base["uid"].isin(deleted_uids)
+    for lo, hi in deleted_ranges:
+        stale |= base["checkup_id"].between(lo, hi)
+    df = pd.concat([base[~stale], fresh], ignore_index=True) if len(fresh) else base[~stale].reset_index(drop=True)
+    df = df.sort_values(["tanggal_checkup", "checkup_id"], ascending=False, kind="stable", ignore_index=True)
+
+    # Inserts committed out of id order, or writes that skipped the journal, show up here
+    agg = core_models.Checkup.objects.aggregate(n=Count("checkup_id"), last_id=Max("checkup_id"))
+    new_state = _checkups_state(df, karyawan_version, journal)
+    if new_state["rows"] != (agg.get("n") or 0) or new_state["high_water"] != (agg.get("last_id") or 0):
+        return None
+    return compact_frame(df), new_state
+
+@replica_reads
+def iter_checkups(uid: str = None, start=None, end=None, by_uid=False, chunk_size=None):
+    """
+    load_checkups() rows streamed as DataFrame chunks (see core.db_utils.iter_frames), optionally
+    restricted to one uid and/or an inclusive tanggal_checkup range. Newest first, or grouped by uid
+    (oldest first within each uid) when by_uid=True.
+    """
+    where, params = [], []
+    if uid:
+        where.append("c.uid = %s")
+        params.append(str(uid))
+    if start is not None:
+        where.append("c.tanggal_checkup >= %s")
+        params.append(start)
+    if end is not None:
+        where.append("c.tanggal_checkup <= %s")
+        params.append(end)
+    order = "c.uid, c.tanggal_checkup, c.checkup_id" if by_uid else "c.tanggal_checkup DESC, c.checkup_id DESC"
+    sql = (
+        f"SELECT {_select_list('c', _CHECKUP_FRAME_COLUMNS)}, "
+        f"k.lokasi AS lokasi_master, k.nama AS nama, k.jabatan AS jabatan "
+        f"FROM checkups c INNER JOIN karyawan k ON k.uid = c.uid "
+        f"{'WHERE ' + ' AND '.join(where) if where else ''} ORDER BY {order}"
+    )
+    for df in iter_frames(sql, params, types=_frame_types(), chunk_size=chunk_size):
+        df["lokasi"] = df["lokasi_master"].where(df["lokasi_master"].notnull(), df["lokasi"])
+        yield _finish_checkup_frame(df.drop(columns=["lokasi_master"]))
+
+@timed()
+@replica_reads
+def get_latest_checkups_in_range(start, end) -> pd.DataFrame:
+    """
+    Latest checkup per employee within [start, end], one row per uid (ties on the date go to the
+    highest checkup_id). Streams the range ordered by uid and keeps only the last row per uid of each
+    chunk, so memory is one chunk plus one row per employee rather than the whole history.
+    """
+    latest = []
+    for df in iter_checkups(start=start, end=end, by_uid=True):
+        tail = df.drop_duplicates("uid", keep="last")
+        # A uid can straddle two chunks; its later rows always arrive in the later chunk
+        if latest and latest[-1]["uid"].iloc[-1] == tail["uid"].iloc[0]:
+            latest[-1] = latest[-1].iloc[:-1]
+        latest.append(tail)
+    if not latest:
+        return _finish_checkup_frame(pd.DataFrame(columns=_CHECKUP_FRAME_COLUMNS + ["nama", "jabatan"]))
+    return pd.concat(latest, ignore_index=True)
 
 def save_checkups(df: pd.DataFrame):
     missing_cols = [col for col in CHECKUP_COLUMNS if col not in df.columns]
@@ -188,7 +400,9 @@ def save_checkups(df: pd.DataFrame):
             rec["uid_id"] = rec.pop("uid")
         normalized.append(rec)
     objs = [core_models.Checkup(**rec) for rec in normalized]
-    core_models.Checkup.objects.bulk_create(objs, ignore_conflicts=True)
+    with data_version.writing():
+        core_models.Checkup.objects.bulk_create(objs, ignore_conflicts=True)
+        data_version.bump(data_version.CHECKUPS)
 
 def save_uploaded_checkups(df: pd.DataFrame):
     required_cols = [
@@ -221,17 +435,41 @@ def save_uploaded_checkups(df: pd.DataFrame):
     if not df.empty:
         save_checkups(df)
 
+@timed()
+def get_checkups_for_uid(uid: str) -> pd.DataFrame:
+    """
+    Checkups for a single employee, newest first.
+    Filters on the uid column in SQL (served by idx_checkups_uid_tanggal, see
+    `manage.py add_checkup_indexes`) instead of filtering load_checkups() in pandas.
+    Columns and rounding match load_checkups().
+    """
+    df = fetch_frame(
+        f"SELECT {_select_list('c', _CHECKUP_FRAME_COLUMNS)} FROM checkups c "
+        f"WHERE c.uid = %s ORDER BY c.tanggal_checkup DESC, c.checkup_id DESC",
+        [str(uid)],
+        types=_frame_types(),
+    )
+    return _finish_checkup_frame(df)
+
+def get_checkup_version_for_uid(uid: str) -> tuple:
+    """Cheap (count, max checkup_id) fingerprint of one employee's checkups, used as a cache version."""
+    agg = core_models.Checkup.objects.filter(uid_id=str(uid)).aggregate(
+        n=Count("checkup_id"), last_id=Max("checkup_id")
+    )
+    return (agg.get("n") or 0, agg.get("last_id") or 0)
+
+def _all_checkup_columns():
+    return [f.column for f in core_models.Checkup._meta.concrete_fields]
+
 def get_medical_checkups_by_uid(uid: str):
-    qs = core_models.Checkup.objects.filter(uid_id=str(uid)).order_by("-tanggal_checkup")
-    df = pd.DataFrame(list(qs.values()))
-    # Normalize foreign key column name for downstream consistency
-    if not df.empty and 'uid_id' in df.columns:
-        df = df.rename(columns={'uid_id': 'uid'})
-    # Ensure date columns are parsed to date to avoid tz/utcoffset issues
-    for col in ["tanggal_checkup", "tanggal_lahir"]:
-        if col in df.columns:
-            df[col] = pd.to_datetime(df[col], errors="coerce").dt.date
-    return _round_numeric_cols(df)
+    df = fetch_frame(
+        f"SELECT {_select_list('c', _all_checkup_columns())} FROM checkups c "
+        f"WHERE c.uid = %s ORDER BY c.tanggal_checkup DESC",
+        [str(uid)],
+        types=_frame_types(),
+    )
+    # Ensure date columns are date objects to avoid tz/utcoffset issues
+    return _finish_checkup_frame(df)
 
 def insert_medical_checkup(**kwargs):
     """Create a Checkup record.
@@ -239,38 +477,65 @@ def insert_medical_checkup(**kwargs):
     """
     uid = kwargs.pop("uid", None)
     if uid is not None and "uid_id" not in kwargs:
-        # Normalize raw UID string to ForeignKey field name
-        kwargs["uid_id"] = uid
-    return core_models.Checkup.objects.create(**kwargs)
+        # Normalize raw UID string (or a Karyawan instance) to ForeignKey field name
+        kwargs["uid_id"] = getattr(uid, "pk", uid)
+    with data_version.writing():
+        obj = core_models.Checkup.objects.create(**kwargs)
+        data_version.bump(data_version.CHECKUPS)
+    return obj
+
+def update_checkup(checkup_id, **fields) -> int:
+    """Update one checkup row in place; returns the number of rows changed (0 or 1)."""
+    with data_version.writing():
+        updated = core_models.Checkup.objects.filter(checkup_id=checkup_id).update(**fields)
+        if updated:
+            data_version.bump(data_version.CHECKUPS, changes=[("U", checkup_id)])
+    return updated
 
 def delete_checkup(checkup_id: str):
-    core_models.Checkup.objects.filter(checkup_id=checkup_id).delete()
-
+    with data_version.writing():
+        core_models.Checkup.objects.filter(checkup_id=checkup_id).delete()
+        data_version.bump(data_version.CHECKUPS, changes=[("D", checkup_id)])
+
+def delete_checkups(checkup_ids=None, uid: str = None, chunk_size: int = 500) -> int:
+    """Delete checkups by id (chunked IN lists) and/or every checkup of `uid`; returns rows deleted."""
+    deleted, changes = 0, []
+    ids = sorted(set(str(x) for x in (checkup_ids or []) if x))
+    with data_version.writing():
+        if uid is not None:
+            deleted += core_models.Checkup.objects.filter(uid_id=str(uid)).delete()[0]
+            changes.append(("DU", uid))
+        for i in range(0, len(ids), chunk_size):
+            deleted += core_models.Checkup.objects.filter(checkup_id__in=ids[i:i + chunk_size]).delete()[0]
+        changes += [("D", x) for x in ids]
+        if deleted:
+            data_version.bump(data_version.CHECKUPS, changes=changes)
+    return deleted
+
+@timed()
 def get_latest_medical_checkup(uid: str = None):
+    columns = _select_list('c', _all_checkup_columns())
     if uid:
-        qs = core_models.Checkup.objects.filter(uid_id=uid).order_by("-tanggal_checkup")
+        sql = f"SELECT {columns} FROM checkups c WHERE c.uid = %s ORDER BY c.tanggal_checkup DESC"
+        params = [uid]
     else:
-        print("DEBUG: Getting latest medical checkups for all employees")
-        latest_dates = core_models.Checkup.objects.values("uid").annotate(latest=Max("tanggal_checkup"))
-        print(f"DEBUG: Found {len(latest_dates)} latest dates")
-        qs = core_models.Checkup.objects.filter(
-            uid_id__in=[row["uid"] for row in latest_dates],
-            tanggal_checkup__in=[row["latest"] for row in latest_dates]
+        # Each employee's rows on their latest checkup date, in one query
+        sql = (
+            f"SELECT {columns} FROM checkups c INNER JOIN ("
+            f"SELECT uid, MAX(tanggal_checkup) AS latest FROM checkups GROUP BY uid"
+            f") m ON m.uid = c.uid AND m.latest = c.tanggal_checkup"
         )
-        print(f"DEBUG: Found {qs.count()} latest checkups")
-    
-    # Convert queryset to DataFrame
-    df = pd.DataFrame(list(qs.values()))
-    
-    # Rename uid_id to uid if present
-    if not df.empty and 'uid_id' in df.columns:
-        df = df.rename(columns={'uid_id': 'uid'})
-    
-    print(f"DEBUG: DataFrame has {len(df)} rows")
-    return _round_numeric_cols(df)
+        params = None
+    return _finish_checkup_frame(fetch_frame(sql, params, types=_frame_types()))
 
 def delete_all_checkups():
-    core_models.Checkup.objects.all().delete()
+    from core import upload_ledger
+
+    with data_version.writing():
+        core_models.Checkup.objects.all().delete()
+        # Their upload batches are gone too: the same files may be imported again
+        upload_ledger.forget(upload_ledger.CHECKUPS)
+        data_version.bump(data_version.CHECKUPS, changes=[("ALL", "")])
 
 # -------------------------
 # Users
@@ -290,7 +555,7 @@ def add_user(username, password, role):
     if role == "Tenaga Kesehatan" and count_users_by_role("Tenaga Kesehatan") >= 10:
         raise ValueError("Limit akun Tenaga Kesehatan telah mencapai 10. Tidak dapat menambah lagi.")
 
-    hashed_pw = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode("utf-8")
+    hashed_pw = passwords.hash_password(password)
     core_models.User.objects.create(username=username, password=hashed_pw, role=role)
 
 def delete_user_by_id(user_id: int):
@@ -300,9 +565,21 @@ def delete_user_by_id(user_id: int):
     core_models.User.objects.filter(id=user_id).delete()
 
 def reset_user_password(username: str, new_password: str):
-    hashed_pw = bcrypt.hashpw(new_password.encode(), bcrypt.gensalt()).decode("utf-8")
+    hashed_pw = passwords.hash_password(new_password)
     core_models.User.objects.filter(username=username).update(password=hashed_pw)
 
+def reset_all_passwords(new_password: str) -> int:
+    """
+    Set every user's password to `new_password` (each with its own salt). Hashes in a process pool
+    before opening the transaction, then writes all rows with one bulk UPDATE. Returns the user count.
+    """
+    users = list(core_models.User.objects.only("id", "password"))
+    for user, hashed_pw in zip(users, passwords.hash_passwords([new_password] * len(users))):
+        user.password = hashed_pw
+    with transaction.atomic():
+        core_models.User.objects.bulk_update(users, ["password"], batch_size=1000)
+    return len(users)
+
 def count_users_by_role(role: str) -> int:
     return core_models.User.objects.filter(role=role).count()
 
@@ -323,25 +600,46 @@ def get_upload_history() -> pd.DataFrame:
 def delete_employee_by_uid(uid: str):
     """Delete a single Karyawan by UID."""
     # Use raw SQL to avoid ORM selecting non-existent columns in some DBs
-    execute_raw("DELETE FROM karyawan WHERE uid=%s", [uid])
+    with data_version.writing():
+        execute_raw("DELETE FROM karyawan WHERE uid=%s", [uid])
+        data_version.bump(data_version.KARYAWAN)
 
 
+@query_budget(5)
 def save_manual_karyawan_edits(df: pd.DataFrame):
+    """Apply manual master edits (NaN = unchanged) with one SELECT and one bulk UPDATE, whatever the row count."""
     if df.empty:
         return 0
-    for _, row in df.iterrows():
+    edits = {}
+    for row in df.to_dict("records"):
         uid = row.get("uid")
         if not uid:
             continue
         # Exclude 'umur' to match legacy DB schemas where Karyawan table has no 'umur' column
-        updates = {col: row[col] for col in row.index if col not in ("uid", "umur") and pd.notna(row[col])}
+        updates = {col: value for col, value in row.items() if col not in ("uid", "umur") and pd.notna(value)}
         if updates:
-            core_models.Karyawan.objects.filter(uid=uid).update(**updates)
+            edits.setdefault(uid, {}).update(updates)
+    fields = sorted({col for updates in edits.values() for col in updates})
+    with data_version.writing():
+        if edits:
+            # Rows keep their stored value for columns they do not edit, so every row can share one UPDATE
+            objs = list(core_models.Karyawan.objects.filter(uid__in=list(edits)).only(*fields))
+            for obj in objs:
+                for col, value in edits[obj.uid].items():
+                    setattr(obj, col, value)
+            core_models.Karyawan.objects.bulk_update(objs, fields)
+        data_version.bump(data_version.KARYAWAN)
     return len(df)
 
 def reset_karyawan_data():
+    from core import upload_ledger
+
     # Use raw SQL to avoid ORM SELECT of non-existent columns (e.g., umur) on managed=False models
-    execute_raw("DELETE FROM karyawan")
+    with data_version.writing():
+        execute_raw("DELETE FROM karyawan")
+        # Checkups cascade with their employees, so every checkup batch is gone
+        upload_ledger.forget(upload_ledger.CHECKUPS)
+        data_version.bump(data_version.KARYAWAN)
 
 
 def change_username(old_username: str, new_username: str):
@@ -356,51 +654,21 @@ def change_username(old_username: str, new_username: str):
     core_models.User.objects.filter(username=old_username).update(username=new_username)
 
 
-def write_checkup_upload_log(filename: str, result: dict):
-    """Write a JSON log entry for a checkup upload result."""
-    os.makedirs(settings.UPLOAD_LOG_DIR, exist_ok=True)
-    log_entry = {
-        "filename": filename,
-        "inserted": int(result.get("inserted", 0)),
-        "skipped_count": int(len(result.get("skipped", [])) if isinstance(result.get("skipped"), list) else result.get("skipped", 0)),
-        "timestamp": datetime.now().isoformat(timespec="seconds"),
-        "inserted_ids": result.get("inserted_ids", []),
-    }
-    # Use timestamp + filename for uniqueness
-    safe_name = os.path.basename(filename)
-    ts = datetime.now().strftime("%Y%m%d-%H%M%S")
-    log_path = os.path.join(settings.UPLOAD_LOG_DIR, f"checkups-{ts}-{safe_name}.json")
-    with open(log_path, "w", encoding="utf-8") as f:
-        json.dump(log_entry, f, ensure_ascii=False, indent=2)
-    return log_path
+def write_checkup_upload_log(filename: str, result: dict, sha256: str = None, stored_file: str = None):
+    """Record a checkup upload in the upload ledger (core.upload_ledger); returns its batch id.
+    Rolling the batch back removes its inserted_ids and restores the before_images of the rows it updated.
+    """
+    from core import upload_ledger
 
+    return upload_ledger.record(upload_ledger.CHECKUPS, filename, result, sha256=sha256, stored_file=stored_file)
 
+
+@timed()
 def get_checkup_upload_history() -> pd.DataFrame:
-    """Return DataFrame of checkup upload logs by reading JSON files from UPLOAD_LOG_DIR."""
-    os.makedirs(settings.UPLOAD_LOG_DIR, exist_ok=True)
-    records = []
-    for fname in os.listdir(settings.UPLOAD_LOG_DIR):
-        if not fname.startswith("checkups-") or not fname.endswith(".json"):
-            continue
-        path = os.path.join(settings.UPLOAD_LOG_DIR, fname)
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                records.append({
-                    "filename": data.get("filename"),
-                    "inserted": int(data.get("inserted", 0)),
-                    "skipped_count": int(data.get("skipped_count", 0)),
-                    "timestamp": pd.to_datetime(data.get("timestamp")),
-                    "log_file": fname,
-                    "inserted_ids": data.get("inserted_ids", []),
-                })
-        except Exception:
-            # Skip malformed logs
-            continue
-    df = pd.DataFrame(records)
-    if not df.empty:
-        df = df.sort_values("timestamp", ascending=False)
-    return df
+    """Return DataFrame of checkup uploads from the upload ledger, newest first."""
+    from core import upload_ledger
+
+    return upload_ledger.history(upload_ledger.CHECKUPS)
 
 # -------------------------
 # Manual Input Logs
@@ -481,6 +749,7 @@ def get_manual_input_logs(uid: str) -> pd.DataFrame:
     return df
 
 # NEW: Global manual input logs with optional month filter (YYYY-MM)
+@timed()
 def get_all_manual_input_logs(month: str | None = None) -> pd.DataFrame:
     """Return DataFrame of all manual input logs across all UIDs.
 
@@ -523,6 +792,7 @@ def get_all_manual_input_logs(month: str | None = None) -> pd.DataFrame:
 
 # NEW (simple, no pandas): Get recent manual input logs globally
 # Returns a list of dicts sorted by timestamp desc. Optionally filter by month (YYYY-MM) and limit the count.
+@timed()
 def get_recent_manual_input_logs(month: str | None = None, limit: int | None = 200) -> list:
     os.makedirs(settings.UPLOAD_LOG_DIR, exist_ok=True)
     items = []
@@ -586,6 +856,7 @@ def get_recent_manual_input_logs(month: str | None = None, limit: int | None = 2
     return items
 
 
+@timed()
 def get_well_unwell_summary(month: str = None, lokasi: str = None):
     """Aggregate Well vs Unwell totals filtered by month (YYYY-MM) and lokasi.
     Returns a dict: {"Well": int, "Unwell": int}
@@ -0,0 +1,110 @@
+# core/query_budget.py
+"""
+Query-budget guard against N+1 / per-row query regressions.
+
+    with query_budget(5, name="reset_all_passwords"):
+        ...
+
+    @query_budget(5)
+    def save_manual_karyawan_edits(df): ...
+
+When a block issues more queries than declared, the guard reports the count and the most repeated
+SQL shapes (literals/IN-lists normalized, see core.slow_queries.sql_shape). QUERY_BUDGET_MODE decides
+what happens: "raise" (QueryBudgetExceeded; default under the test runner / pytest), "warn"
+(QueryBudgetWarning + "mini_mcu.perf" log; default when DEBUG) or "off" (no execute_wrapper at all).
+"""
+import functools
+import sys
+import warnings
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from core.instrumentation import logger
+from core.slow_queries import sql_shape
+
+# Shapes seen at least this often are listed in the report
+REPEAT_REPORT_MIN = 3
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryBudgetWarning(RuntimeWarning):
+    pass
+
+
+def budget_mode():
+    mode = getattr(settings, "QUERY_BUDGET_MODE", None)
+    if mode:
+        return str(mode).lower()
+    if "pytest" in sys.modules or sys.argv[1:2] == ["test"]:
+        return "raise"
+    return "warn" if settings.DEBUG else "off"
+
+
+class query_budget:
+    """Context manager / decorator enforcing at most `max_queries` queries (and optionally at most
+    `max_repeats` executions of any single SQL shape) inside the block."""
+
+    def __init__(self, max_queries, name=None, max_repeats=None):
+        self.max_queries = max_queries
+        self.max_repeats = max_repeats
+        self.name = name
+        self.shapes = Counter()
+        self._stack = None
+        self._mode = "off"
+
+    def __call__(self, func):
+        name = self.name or f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # Fresh instance per call so recursion / threads do not share counters
+            with query_budget(self.max_queries, name=name, max_repeats=self.max_repeats):
+                return func(*args, **kwargs)
+        return wrapper
+
+    def _wrapper(self, execute, sql, params, many, context):
+        self.shapes[sql_shape(sql)] += 1
+        return execute(sql, params, many, context)
+
+    @property
+    def count(self):
+        return sum(self.shapes.values())
+
+    def __enter__(self):
+        self._mode = budget_mode()
+        self.shapes.clear()
+        if self._mode != "off":
+            self._stack = ExitStack()
+            for conn in connections.all():
+                self._stack.enter_context(conn.execute_wrapper(self._wrapper))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._stack is not None:
+            self._stack.close()
+            self._stack = None
+        if self._mode == "off" or exc_type is not None:
+            return False
+
+        repeated = [(shape, n) for shape, n in self.shapes.most_common() if n >= REPEAT_REPORT_MIN]
+        over_total = self.count > self.max_queries
+        over_repeat = self.max_repeats is not None and repeated and repeated[0][1] > self.max_repeats
+        if not (over_total or over_repeat):
+            return False
+
+        lines = [f"Query budget exceeded in {self.name or 'block'}: {self.count} queries (budget {self.max_queries})."]
+        for shape, n in repeated[:5]:
+            lines.append(f"  {n}x {shape[:300]}")
+        message = "\n".join(lines)
+
+        if self._mode == "raise":
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+        warnings.warn(message, QueryBudgetWarning, stacklevel=2)
+        return False
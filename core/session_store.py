@@ -0,0 +1,83 @@
+# core/session_store.py
+"""
+Signed-cookie sessions (SESSION_BACKEND=signed_cookies, opt-in; the default is database sessions).
+
+The session only carries the login flags (authenticated, user_role, username) and one-shot flash
+messages, so it fits in the cookie and `request.session` costs no django_session query. On top of
+Django's signed_cookies backend:
+
+- Migration: a cookie still holding a database session key (issued before the switch) is read from
+  django_session once, re-issued as a signed cookie and its row deleted, so nobody is logged out.
+- Size budget: browsers drop cookies over ~4 KB, which would silently log the user out. Above
+  SESSION_COOKIE_MAX_BYTES the flash messages are shortened; a session still over it is logged.
+
+The cookie is the session: whoever knows SECRET_KEY can sign any role, so the development key is
+refused, and logout cannot revoke a copied cookie before SESSION_COOKIE_AGE.
+"""
+import re
+
+from django.conf import settings
+from django.contrib.sessions.backends import signed_cookies
+from django.core.exceptions import ImproperlyConfigured
+
+from core.instrumentation import logger
+
+# django.contrib.sessions.backends.db keys: 32 chars of [a-z0-9]; signed cookies always contain ":"
+_DB_SESSION_KEY = re.compile(r"^[a-z0-9]{32}$")
+FLASH_KEYS = ("error", "success", "info", "warning")
+FLASH_TRIM_CHARS = 300
+
+
+if settings.SECRET_KEY == getattr(settings, "DEV_SECRET_KEY", "dev-secret-key"):
+    raise ImproperlyConfigured("core.session_store requires DJANGO_SECRET_KEY to be set")
+
+
+def _is_flash(key):
+    return key in FLASH_KEYS or key.endswith("_message")
+
+
+def max_bytes() -> int:
+    return int(getattr(settings, "SESSION_COOKIE_MAX_BYTES", 3800))
+
+
+class SessionStore(signed_cookies.SessionStore):
+    def load(self):
+        key = self.session_key
+        if key and _DB_SESSION_KEY.match(key):
+            data = self._load_db_session(key)
+            if data is not None:
+                return data
+        return super().load()
+
+    def _load_db_session(self, key):
+        """Session data of a pre-migration django_session row (then deleted), or None."""
+        try:
+            from django.contrib.sessions.backends.db import SessionStore as DBStore
+
+            legacy = DBStore(key)
+            row = legacy._get_session_from_db()
+            if row is None:
+                return None
+            data = legacy.decode(row.session_data)
+            row.delete()
+        except Exception as e:
+            logger.warning("legacy session lookup failed: %s", e)
+            return None
+        self.modified = True  # re-issue as a signed cookie at the end of this request
+        return data
+
+    def _get_session_key(self):
+        value = super()._get_session_key()
+        if len(value) <= max_bytes():
+            return value
+        session = self._session
+        for key, text in list(session.items()):
+            if _is_flash(key) and isinstance(text, str) and len(text) > FLASH_TRIM_CHARS:
+                session[key] = text[:FLASH_TRIM_CHARS] + "…"
+        value = super()._get_session_key()
+        if len(value) > max_bytes():
+            logger.warning(
+                "session cookie is %d bytes (budget %d), keys: %s",
+                len(value), max_bytes(), sorted(session.keys()),
+            )
+        return value
@@ -0,0 +1,168 @@
+# core/slow_queries.py
+"""
+Slow-query recorder.
+
+PerfInstrumentationMiddleware passes every query slower than SLOW_QUERY_MS here. Each one is
+written as a JSON line to SLOW_QUERY_LOG_FILE (default VAR_DIR/perf, outside MEDIA_ROOT) with the SQL, the *shape* of the
+parameters (types only: values can be medical data), duration, row count, the app call site
+(e.g. core.queries.load_checkups:172) and the view name. `top_offenders()` ranks them for the
+Master slow-query page.
+
+All workers append to the same file through a WatchedFileHandler, so rotation is external
+(logrotate, without copytruncate): a worker reopens the file once it has been moved.
+"""
+import glob
+import json
+import logging
+import os
+import re
+import sys
+import time
+from logging.handlers import WatchedFileHandler
+
+from django.conf import settings
+
+# Frames from these packages count as "app" call sites; the recorder's own modules are skipped
+APP_PREFIXES = ("core.", "users_ui.", "utils.", "accounts.", "mini_mcu.")
+SKIP_MODULES = ("core.instrumentation", "core.slow_queries")
+
+_logger = None
+
+
+def threshold_ms():
+    return float(getattr(settings, "SLOW_QUERY_MS", 200))
+
+
+def log_path():
+    path = getattr(settings, "SLOW_QUERY_LOG_FILE", None) or os.path.join(settings.VAR_DIR, "perf", "slow_queries.log")
+    return str(path)
+
+
+def _get_logger():
+    global _logger
+    if _logger is None:
+        path = log_path()
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        logger = logging.getLogger("mini_mcu.slow_sql")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        if not logger.handlers:
+            handler = WatchedFileHandler(path, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+        _logger = logger
+    return _logger
+
+
+def call_site():
+    """First app frame on the stack as 'module.function:lineno' (None when called from library code only)."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module.startswith(APP_PREFIXES) and not module.startswith(SKIP_MODULES):
+            return f"{module}.{frame.f_code.co_name}:{frame.f_lineno}"
+        frame = frame.f_back
+    return None
+
+
+def _type_list(values):
+    names = [type(v).__name__ for v in values]
+    # Long IN (...) lists collapse to e.g. '300 x str'
+    if len(names) > 5 and len(set(names)) == 1:
+        return f"({len(names)} x {names[0]})"
+    return f"({', '.join(names)})"
+
+
+def params_shape(params, many=False):
+    """Describe parameters without their values, e.g. '(str, int, date)' or '200 rows x (str, float)'."""
+    if params is None:
+        return None
+    try:
+        if many:
+            params = list(params)
+            first = params[0] if params else ()
+            return f"{len(params)} rows x {_type_list(first)}"
+        if isinstance(params, dict):
+            return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in params.items()) + "}"
+        return _type_list(params)
+    except Exception:
+        return type(params).__name__
+
+
+def record(sql, params, many, duration_s, rowcount, view=None):
+    try:
+        _get_logger().info(json.dumps({
+            "ts": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "ms": round(duration_s * 1000, 1),
+            "sql": str(sql)[:2000],
+            "params": params_shape(params, many),
+            "rows": rowcount if isinstance(rowcount, int) and rowcount >= 0 else None,
+            "site": call_site(),
+            "view": view,
+            "pid": os.getpid(),
+        }, ensure_ascii=False, default=str))
+    except Exception:
+        # Recording must never break the query that triggered it
+        pass
+
+
+# -------------------------
+# Ranking
+# -------------------------
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\bIN\s*\((?:\s*(?:\?|%s|'[^']*'|\d+)\s*,?)+\)", re.IGNORECASE)
+_WS_RE = re.compile(r"\s+")
+
+
+def sql_shape(sql):
+    """Normalize SQL so the same statement with different literals / IN-list sizes groups together."""
+    shape = _IN_LIST_RE.sub("IN (...)", str(sql))
+    shape = _LITERAL_RE.sub("?", shape)
+    return _WS_RE.sub(" ", shape).strip()
+
+
+def read_entries():
+    """All recorded entries from the current and rotated (uncompressed: slow_queries.log.1, ...) log files."""
+    base = log_path()
+    paths = [base] + sorted(p for p in glob.glob(glob.escape(base) + ".*") if p[len(base) + 1:].isdigit())
+    entries = []
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+    return entries
+
+
+def top_offenders(limit=50, order_by="total_ms"):
+    """Group entries by (SQL shape, call site) and rank by total/max/avg duration or count."""
+    groups = {}
+    for e in read_entries():
+        key = (sql_shape(e.get("sql", "")), e.get("site"))
+        g = groups.get(key)
+        if g is None:
+            g = groups[key] = {
+                "shape": key[0], "site": key[1], "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                "views": set(), "params": e.get("params"), "rows": e.get("rows"), "last_seen": e.get("ts"),
+            }
+        ms = float(e.get("ms") or 0)
+        g["count"] += 1
+        g["total_ms"] += ms
+        g["max_ms"] = max(g["max_ms"], ms)
+        if e.get("view"):
+            g["views"].add(e["view"])
+        g["last_seen"] = max(g["last_seen"] or "", e.get("ts") or "")
+    rows = []
+    for g in groups.values():
+        g["avg_ms"] = round(g["total_ms"] / g["count"], 1) if g["count"] else 0.0
+        g["total_ms"] = round(g["total_ms"], 1)
+        g["views"] = ", ".join(sorted(g["views"]))
+        rows.append(g)
+    if order_by not in ("total_ms", "max_ms", "avg_ms", "count"):
+        order_by = "total_ms"
+    rows.sort(key=lambda r: r[order_by], reverse=True)
+    return rows[:limit]
@@ -0,0 +1,270 @@
+# core/snapshot.py
+"""
+Shared, memory-mapped snapshots of the employee and checkup frames.
+
+Every gunicorn worker used to build its own copy of the same frames from the database. Instead, the
+first worker that needs a dataset at a new data version publishes it once, as the compact frame
+(core.frame_schema) with one .npy file per column:
+
+    SNAPSHOT_DIR/<dataset>/<token>/manifest.json
+    SNAPSHOT_DIR/<dataset>/<token>/<n>.npy  (+ <n>.mask.npy for nullable ints)
+    SNAPSHOT_DIR/<dataset>/CURRENT          -> token
+
+Other workers np.load(mmap_mode="r") those files, so numeric, date and categorical-code columns live
+in the OS page cache once per host however many workers there are, and a freshly started worker
+serves warm data straight away. The token is derived from core.data_version, so a bump after a write
+makes the next reader republish; a worker only re-maps when the token changes.
+
+A dataset may also pass a `refresh(previous_frame, state)` callable: on a version change the
+publisher first tries to derive the new frame from the previous snapshot (e.g. only the checkups
+written since, see core.queries._refresh_checkups) and falls back to the full `build()` when it
+returns None. The state a builder returns is kept in the manifest for the next refresh. Within one
+age bucket only refreshes happen; a new bucket always rebuilds in full.
+
+Frames returned by `get_frame()` are read-only: replace columns or go through display_frame()/copy()
+rather than assigning into them.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+
+from core import data_version, db_router
+from core.instrumentation import logger
+
+# dataset -> data_version names its contents depend on
+DATASETS = {
+    "employees": (data_version.KARYAWAN,),
+    "checkups": (data_version.KARYAWAN, data_version.CHECKUPS),
+}
+
+# Snapshots kept per dataset besides CURRENT (older ones may still be mapped by slow requests)
+KEEP_PREVIOUS = 2
+
+# In-process cache of mapped frames: dataset -> (token, DataFrame)
+_mapped = {}
+
+# SNAPSHOT_DIR bases already checked by this process
+_owned_bases = set()
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def enabled():
+    """Snapshots are used outside transactions only: inside one, reads must see its own writes."""
+    from django.db import connection
+
+    return bool(getattr(settings, "DATA_SNAPSHOT_ENABLED", True)) and not connection.in_atomic_block
+
+
+def _own_base(base):
+    """Create SNAPSHOT_DIR as 0o700 and refuse one owned by another user (PermissionError: callers
+    fall back to the database), so no other local account can read or plant snapshot files."""
+    if base in _owned_bases:
+        return
+    os.makedirs(base, mode=0o700, exist_ok=True)
+    if hasattr(os, "getuid"):
+        st = os.stat(base)
+        if st.st_uid != os.getuid():
+            raise PermissionError(f"snapshot directory {base} is not owned by this user")
+        if st.st_mode & 0o077:
+            os.chmod(base, 0o700)
+    _owned_bases.add(base)
+
+
+def snapshot_dir():
+    """SNAPSHOT_DIR/<database key>: a dev SQLite file and a Postgres DB on one host never share snapshots."""
+    from django.db import connection
+
+    base = str(getattr(settings, "SNAPSHOT_DIR", None) or os.path.join(settings.VAR_DIR, "snapshot"))
+    _own_base(base)
+    db = connection.settings_dict
+    key = hashlib.sha1(
+        f"{connection.vendor}|{db.get('HOST')}|{db.get('PORT')}|{db.get('NAME')}".encode("utf-8")
+    ).hexdigest()[:12]
+    path = os.path.join(base, key)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _max_age():
+    return float(getattr(settings, "DATA_SNAPSHOT_MAX_AGE", 600))
+
+
+def expected_token(dataset):
+    """Token of the data the snapshot must reflect: the versions it depends on, plus an age bucket
+    so writes that bypass core.data_version (patch scripts, manual SQL) are picked up eventually."""
+    versions = [str(data_version.current(name)) for name in DATASETS[dataset]]
+    bucket = int(time.time() // _max_age()) if _max_age() > 0 else 0
+    return "-".join(versions + [str(bucket)])
+
+
+def _current_token(dataset):
+    try:
+        with open(os.path.join(snapshot_dir(), dataset, "CURRENT"), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+# -------------------------
+# Publish
+# -------------------------
+def _write_columns(df, path, state=None):
+    import numpy as np
+    import pandas as pd
+
+    columns = []
+    for i, col in enumerate(df.columns):
+        series = df[col]
+        dtype = series.dtype
+        entry = {"name": col, "file": f"{i}.npy"}
+        if isinstance(dtype, pd.CategoricalDtype) or dtype == object or pd.api.types.is_string_dtype(dtype):
+            cat = series if isinstance(dtype, pd.CategoricalDtype) else series.astype("category")
+            categories = cat.cat.categories
+            if not all(isinstance(v, str) for v in categories):
+                raise SnapshotError(f"column {col!r} holds non-text values")
+            entry.update(kind="category", categories=list(categories))
+            np.save(os.path.join(path, entry["file"]), cat.array.codes)
+        elif isinstance(dtype, pd.api.extensions.ExtensionDtype) and pd.api.types.is_integer_dtype(dtype):
+            entry.update(kind="nullable_int", dtype=str(dtype), mask=f"{i}.mask.npy")
+            np.save(os.path.join(path, entry["file"]), series.to_numpy(dtype=dtype.numpy_dtype, na_value=0))
+            np.save(os.path.join(path, entry["mask"]), series.isna().to_numpy())
+        elif pd.api.types.is_datetime64_any_dtype(dtype) or pd.api.types.is_numeric_dtype(dtype):
+            entry.update(kind="array")
+            np.save(os.path.join(path, entry["file"]), series.to_numpy())
+        else:
+            raise SnapshotError(f"column {col!r} has unsupported dtype {dtype}")
+        columns.append(entry)
+    with open(os.path.join(path, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump({"columns": columns, "rows": len(df), "state": state}, f)
+
+
+def _prune(dataset_dir, keep):
+    entries = []
+    for name in os.listdir(dataset_dir):
+        full = os.path.join(dataset_dir, name)
+        if os.path.isdir(full) and name != keep and not name.startswith("."):
+            entries.append((os.path.getmtime(full), full))
+    for _, full in sorted(entries, reverse=True)[KEEP_PREVIOUS:]:
+        # Files still mapped by another worker stay readable on POSIX; Windows refuses, retry next time
+        shutil.rmtree(full, ignore_errors=True)
+
+
+def publish(dataset, frame, token, state=None):
+    """
+    Write `frame` (already compact) as the snapshot for `token`, with the JSON-able `state` its
+    builder returned, and point CURRENT at it.
+    """
+    dataset_dir = os.path.join(snapshot_dir(), dataset)
+    os.makedirs(dataset_dir, exist_ok=True)
+    final = os.path.join(dataset_dir, token)
+    if not os.path.isdir(final):
+        staging = tempfile.mkdtemp(prefix=".staging-", dir=dataset_dir)
+        try:
+            _write_columns(frame, staging, state)
+            os.replace(staging, final)
+        except OSError:
+            # Another worker published the same token first
+            shutil.rmtree(staging, ignore_errors=True)
+            if not os.path.isdir(final):
+                raise
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+    pointer = os.path.join(dataset_dir, f".CURRENT.{os.getpid()}")
+    with open(pointer, "w", encoding="utf-8") as f:
+        f.write(token)
+    os.replace(pointer, os.path.join(dataset_dir, "CURRENT"))
+    _prune(dataset_dir, keep=token)
+
+
+# -------------------------
+# Map
+# -------------------------
+def _map(dataset, token):
+    """(frame, state) of a published snapshot."""
+    import numpy as np
+    import pandas as pd
+
+    path = os.path.join(snapshot_dir(), dataset, token)
+    with open(os.path.join(path, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    columns = {}
+    for entry in manifest["columns"]:
+        data = np.load(os.path.join(path, entry["file"]), mmap_mode="r")
+        if entry["kind"] == "category":
+            dtype = pd.CategoricalDtype(pd.Index(entry["categories"], dtype=str))
+            values = pd.Categorical.from_codes(data, dtype=dtype, validate=False)
+        elif entry["kind"] == "nullable_int":
+            mask = np.load(os.path.join(path, entry["mask"]), mmap_mode="r")
+            values = pd.arrays.IntegerArray(data, mask)
+        else:
+            values = data
+        columns[entry["name"]] = pd.Series(values, copy=False)
+    return pd.DataFrame(columns, copy=False), manifest.get("state")
+
+
+def _built(result):
+    # build()/refresh() return the compact frame, or (frame, state)
+    return result if isinstance(result, tuple) else (result, None)
+
+
+def _refreshed(dataset, previous, token, refresh):
+    """refresh() applied to the `previous` snapshot, or None when a full build is needed."""
+    if not previous or previous.rsplit("-", 1)[-1] != token.rsplit("-", 1)[-1]:
+        return None
+    try:
+        frame, state = _map(dataset, previous)
+        if state is None:
+            return None
+        result = refresh(frame, state)
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning("snapshot refresh failed for %s: %s", dataset, e)
+        return None
+    return _built(result) if result is not None else None
+
+
+def get_frame(dataset, build, refresh=None):
+    """
+    Compact frame for `dataset`, mapped from the shared snapshot. `build()` returns the compact frame
+    (or (frame, state)) from the database; it runs only when no snapshot exists for the current data
+    version and `refresh` cannot update the previous one, and that worker publishes the result for
+    the others.
+    """
+    token = expected_token(dataset)
+    cached = _mapped.get(dataset)
+    if cached and cached[0] == token:
+        return cached[1]
+
+    previous = _current_token(dataset)
+    if previous != token:
+        # Always from the primary: a lagging replica must not be published under the primary's version
+        with db_router.primary():
+            built = (refresh and _refreshed(dataset, previous, token, refresh)) or _built(build())
+        try:
+            publish(dataset, built[0], token, built[1])
+        except Exception as e:
+            logger.warning("snapshot publish failed for %s: %s", dataset, e)
+            return built[0]
+
+    try:
+        frame, _ = _map(dataset, token)
+    except (OSError, ValueError, KeyError) as e:
+        # Pruned or half-written by a concurrent publisher: serve from the database this time
+        logger.warning("snapshot map failed for %s: %s", dataset, e)
+        with db_router.primary():
+            return _built(build())[0]
+    _mapped[dataset] = (token, frame)
+    return frame
+
+
+def invalidate_local():
+    """Drop this process's mapped frames (tests / management commands that rewrite the data)."""
+    _mapped.clear()
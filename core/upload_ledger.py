@@ -0,0 +1,327 @@
+# core/upload_ledger.py
+"""
+Ledger of uploads: one `upload_batches` row per ingested file (name, stored copy, SHA-256, counts) and
+the checkup ids it inserted as compact [first_id, last_id] ranges in `upload_batch_ranges`. A
+200-row upload whose inserts got consecutive ids is a single range row.
+
+- Rollback of any number of batches is one DELETE on checkups joined to their ranges, instead of one
+  DELETE per inserted id; the snapshot journal gets ("DR", "first-last") per range.
+- Checkups a batch updated (upsert mode) keep their previous values in `upload_batch_updates`; rollback
+  restores them. A batch whose rows a later batch has since inserted into or updated is not rolled back
+  on its own (RollbackConflict): roll back the later batch first, or both together.
+- The upload history is one query instead of listing and parsing every JSON log.
+- core.upload_store looks identical files up by sha256 here, so rolling a batch back also allows
+  its file again. A checkup batch only counts as a duplicate while all of its rows still exist
+  (deleting an employee or single checkups re-allows the file); full resets forget() the ledger.
+
+Both tables are created on first use (or with `manage.py add_upload_ledger_table`). JSON logs written
+before the ledger (UPLOAD_LOG_DIR/checkups-*.json) are imported then and renamed to imported-*.json.
+"""
+import json
+import os
+import uuid
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+import pandas as pd
+from django.conf import settings
+from django.db import connection, transaction
+
+from core import data_version, db_router
+from core.db_utils import fetch_all
+from core.instrumentation import logger
+
+CHECKUPS = "checkups"
+MASTER = "master"
+
+TABLES_SQL = [
+    "CREATE TABLE IF NOT EXISTS upload_batches ("
+    "batch_id VARCHAR(36) PRIMARY KEY, kind VARCHAR(16) NOT NULL, filename VARCHAR(255) NOT NULL, "
+    "stored_file VARCHAR(255), sha256 VARCHAR(64), inserted INTEGER NOT NULL, updated INTEGER NOT NULL, "
+    "skipped INTEGER NOT NULL, data_version BIGINT, uploaded_at TIMESTAMP NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS idx_upload_batches_sha256 ON upload_batches (kind, sha256)",
+    "CREATE TABLE IF NOT EXISTS upload_batch_ranges ("
+    "batch_id VARCHAR(36) NOT NULL, first_id BIGINT NOT NULL, last_id BIGINT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS idx_upload_batch_ranges ON upload_batch_ranges (batch_id)",
+    "CREATE TABLE IF NOT EXISTS upload_batch_updates ("
+    "batch_id VARCHAR(36) NOT NULL, checkup_id BIGINT NOT NULL, before_values TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS idx_upload_batch_updates ON upload_batch_updates (batch_id)",
+    "CREATE INDEX IF NOT EXISTS idx_upload_batch_updates_checkup ON upload_batch_updates (checkup_id)",
+]
+_TABLES = {"upload_batches", "upload_batch_ranges", "upload_batch_updates"}
+
+_BATCH_COLUMNS = "batch_id, kind, filename, stored_file, sha256, inserted, updated, skipped, data_version, uploaded_at"
+
+# Per-process: tables checked once
+_state = {"ready": False}
+
+
+class RollbackConflict(Exception):
+    """A later upload has changed rows of the batches being rolled back."""
+
+
+# -------------------------
+# Tables
+# -------------------------
+def ensure_tables():
+    """Create the ledger tables if missing and import legacy JSON logs (idempotent)."""
+    existing = set(connection.introspection.table_names())
+    if _TABLES <= existing:
+        return False
+    # Savepoint: a failed CREATE must not poison a caller's transaction on PostgreSQL
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            for sql in TABLES_SQL:
+                cursor.execute(sql)
+    import_legacy_logs()
+    return True
+
+
+def _ready():
+    if not _state["ready"]:
+        ensure_tables()
+        _state["ready"] = True
+
+
+def import_legacy_logs() -> int:
+    """Move UPLOAD_LOG_DIR/checkups-*.json logs into the ledger; returns the number imported."""
+    log_dir = str(settings.UPLOAD_LOG_DIR)
+    if not os.path.isdir(log_dir):
+        return 0
+    imported = 0
+    for fname in sorted(os.listdir(log_dir)):
+        if not fname.startswith("checkups-") or not fname.endswith(".json"):
+            continue
+        path = os.path.join(log_dir, fname)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            # Derived from the file name, so a second import of the same log is a no-op
+            batch_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"mini-mcu-upload-log:{fname}"))
+            if not fetch_all("SELECT batch_id FROM upload_batches WHERE batch_id = %s", [batch_id]):
+                saved = int(data.get("inserted", 0)) + int(data.get("updated", 0)) > 0
+                record(
+                    CHECKUPS, data.get("filename") or fname, data,
+                    sha256=data.get("sha256") if saved else None, stored_file=data.get("stored_file"),
+                    batch_id=batch_id, uploaded_at=pd.to_datetime(data.get("timestamp")).to_pydatetime(),
+                    skipped=int(data.get("skipped_count", 0)),
+                )
+                imported += 1
+            os.replace(path, os.path.join(log_dir, f"imported-{fname}"))
+        except Exception as e:
+            logger.warning("could not import upload log %s: %s", fname, e)
+    return imported
+
+
+# -------------------------
+# Writes
+# -------------------------
+def compact_ranges(ids):
+    """Sorted [first, last] ranges covering exactly `ids`."""
+    ranges = []
+    for i in sorted(set(int(x) for x in ids if x not in (None, ""))):
+        if ranges and i == ranges[-1][1] + 1:
+            ranges[-1][1] = i
+        else:
+            ranges.append([i, i])
+    return ranges
+
+
+def record(kind, filename, result, sha256=None, stored_file=None, version=None, batch_id=None,
+           uploaded_at=None, skipped=None) -> str:
+    """Add a batch for a parser `result` ({inserted, updated, skipped, inserted_ids}); returns its id."""
+    _ready()
+    batch_id = batch_id or str(uuid.uuid4())
+    if skipped is None:
+        skipped = result.get("skipped", 0)
+        skipped = len(skipped) if isinstance(skipped, list) else int(skipped or 0)
+    ranges = compact_ranges(result.get("inserted_ids", []))
+    db_router.mark_write()
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO upload_batches ({_BATCH_COLUMNS}) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+                [
+                    batch_id, kind, os.path.basename(str(filename))[:255], stored_file, sha256,
+                    int(result.get("inserted", 0)), int(result.get("updated", 0)), skipped, version,
+                    # Full precision: rollback conflicts are decided by upload order
+                    uploaded_at or datetime.now(),
+                ],
+            )
+            if ranges:
+                cursor.executemany(
+                    "INSERT INTO upload_batch_ranges (batch_id, first_id, last_id) VALUES (%s, %s, %s)",
+                    [[batch_id, lo, hi] for lo, hi in ranges],
+                )
+            before_images = result.get("before_images") or {}
+            if before_images:
+                cursor.executemany(
+                    "INSERT INTO upload_batch_updates (batch_id, checkup_id, before_values) VALUES (%s, %s, %s)",
+                    [[batch_id, int(cid), json.dumps(values, cls=DjangoJSONEncoder)] for cid, values in sorted(before_images.items())],
+                )
+    return batch_id
+
+
+def _conflicts(in_batches, params):
+    """(batch, later batch) file names where a batch outside the rollback changed rows of one inside it."""
+    return fetch_all(
+        "SELECT DISTINCT o.filename AS batch, l.filename AS later FROM upload_batch_updates lu "
+        "JOIN upload_batches l ON l.batch_id = lu.batch_id "
+        f"JOIN upload_batches o ON o.batch_id IN ({in_batches}) "
+        f"WHERE l.batch_id NOT IN ({in_batches}) AND l.uploaded_at >= o.uploaded_at AND ("
+        "EXISTS (SELECT 1 FROM upload_batch_ranges r WHERE r.batch_id = o.batch_id "
+        "AND lu.checkup_id BETWEEN r.first_id AND r.last_id) "
+        "OR EXISTS (SELECT 1 FROM upload_batch_updates ou WHERE ou.batch_id = o.batch_id AND ou.checkup_id = lu.checkup_id))",
+        params + params,
+    )
+
+
+def _restore(in_batches, params, ranges):
+    """Put back the before-images of the rows the batches updated; returns the restored checkup ids."""
+    from core import core_models
+    from core.ingest import RESTORABLE_FIELDS
+
+    rows = fetch_all(
+        "SELECT u.checkup_id, u.before_values FROM upload_batch_updates u "
+        "JOIN upload_batches b ON b.batch_id = u.batch_id "
+        f"WHERE u.batch_id IN ({in_batches}) ORDER BY b.uploaded_at DESC",
+        params,
+    )
+    # Newest batch first, so the oldest image of a row (its value before any of them) wins
+    images = {}
+    for row in rows:
+        images.setdefault(int(row["checkup_id"]), {}).update(json.loads(row["before_values"]))
+    deleted = lambda cid: any(r["first_id"] <= cid <= r["last_id"] for r in ranges)  # noqa: E731
+    objs = []
+    for cid, values in images.items():
+        if deleted(cid):
+            continue
+        obj = core_models.Checkup(checkup_id=cid)
+        for field in RESTORABLE_FIELDS:
+            setattr(obj, field, values.get(field))
+        objs.append(obj)
+    if objs:
+        core_models.Checkup.objects.bulk_update(objs, RESTORABLE_FIELDS)
+    return [obj.checkup_id for obj in objs]
+
+
+def rollback(batch_ids=None, kind=CHECKUPS) -> dict:
+    """
+    Undo `batch_ids` (None: every batch of `kind`): delete the checkups they inserted, restore the
+    previous values of the checkups they updated, and drop the batches, in one transaction and a fixed
+    number of statements. Raises RollbackConflict (nothing changed) if a batch outside the set has
+    since changed one of their rows. Returns {"batches": n, "checkups": rows deleted, "restored": rows restored}.
+    """
+    _ready()
+    if batch_ids is None:
+        where, params = "kind = %s", [kind]
+    else:
+        batch_ids = sorted(set(str(b) for b in batch_ids if b))
+        if not batch_ids:
+            return {"batches": 0, "checkups": 0, "restored": 0}
+        where, params = f"batch_id IN ({', '.join(['%s'] * len(batch_ids))})", batch_ids
+    in_batches = f"SELECT batch_id FROM upload_batches WHERE {where}"
+
+    with db_router.primary(), data_version.writing():
+        conflicts = _conflicts(in_batches, params) if batch_ids is not None else []
+        if conflicts:
+            later = sorted({c["later"] for c in conflicts})
+            raise RollbackConflict(
+                f"Data dari upload ini sudah diubah oleh upload berikutnya ({', '.join(later[:3])}"
+                f"{' …' if len(later) > 3 else ''}). Hapus upload tersebut terlebih dahulu atau bersamaan."
+            )
+        ranges = fetch_all(f"SELECT first_id, last_id FROM upload_batch_ranges WHERE batch_id IN ({in_batches})", params)
+        db_router.mark_write()
+        restored = _restore(in_batches, params, ranges)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "DELETE FROM checkups WHERE EXISTS (SELECT 1 FROM upload_batch_ranges r "
+                f"WHERE r.batch_id IN ({in_batches}) AND checkups.checkup_id BETWEEN r.first_id AND r.last_id)",
+                params,
+            )
+            deleted = max(cursor.rowcount, 0)
+            cursor.execute(f"DELETE FROM upload_batch_ranges WHERE batch_id IN ({in_batches})", params)
+            cursor.execute(f"DELETE FROM upload_batch_updates WHERE batch_id IN ({in_batches})", params)
+            cursor.execute(f"DELETE FROM upload_batches WHERE {where}", params)
+            batches = max(cursor.rowcount, 0)
+        changes = [("DR", f"{r['first_id']}-{r['last_id']}") for r in ranges] if deleted else []
+        changes += [("U", cid) for cid in restored]
+        if changes:
+            data_version.bump(data_version.CHECKUPS, changes=changes)
+    return {"batches": batches, "checkups": deleted, "restored": len(restored)}
+
+
+def forget(kind=CHECKUPS) -> int:
+    """
+    Drop every batch of `kind` from the ledger without touching checkups. For resets that already
+    deleted all their rows: their files can be uploaded again and the history lists no vanished
+    data. Runs in the caller's transaction; returns the batches dropped.
+    """
+    _ready()
+    in_batches = "SELECT batch_id FROM upload_batches WHERE kind = %s"
+    db_router.mark_write()
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM upload_batch_ranges WHERE batch_id IN ({in_batches})", [kind])
+            cursor.execute(f"DELETE FROM upload_batch_updates WHERE batch_id IN ({in_batches})", [kind])
+            cursor.execute("DELETE FROM upload_batches WHERE kind = %s", [kind])
+            return max(cursor.rowcount, 0)
+
+
+# -------------------------
+# Reads
+# -------------------------
+def _intact(batch_id):
+    """True while every checkup the batch inserted or updated still exists (one query)."""
+    row = fetch_all(
+        "SELECT (SELECT COALESCE(SUM(r.last_id - r.first_id + 1), 0) FROM upload_batch_ranges r WHERE r.batch_id = %s) AS expected, "
+        "(SELECT COUNT(*) FROM checkups c JOIN upload_batch_ranges r ON c.checkup_id BETWEEN r.first_id AND r.last_id "
+        "WHERE r.batch_id = %s) AS kept, "
+        "(SELECT COUNT(*) FROM upload_batch_updates u WHERE u.batch_id = %s "
+        "AND NOT EXISTS (SELECT 1 FROM checkups c WHERE c.checkup_id = u.checkup_id)) AS lost",
+        [batch_id, batch_id, batch_id],
+    )[0]
+    return int(row["kept"]) == int(row["expected"]) and not int(row["lost"])
+
+
+def find(kind, sha256, version=None):
+    """
+    Newest batch of `kind` with this content (and data version, when given), or None. A checkups
+    batch whose rows were deleted since (delete_checkups, employee deletion) no longer matches.
+    """
+    if not sha256:
+        return None
+    _ready()
+    sql = f"SELECT {_BATCH_COLUMNS} FROM upload_batches WHERE kind = %s AND sha256 = %s"
+    params = [kind, sha256]
+    if version is not None:
+        sql += " AND data_version = %s"
+        params.append(version)
+    with db_router.primary():
+        rows = fetch_all(sql + " ORDER BY uploaded_at DESC", params)
+        if rows and kind == CHECKUPS and not _intact(rows[0]["batch_id"]):
+            return None
+    return rows[0] if rows else None
+
+
+def history(kind=CHECKUPS) -> pd.DataFrame:
+    """Batches of `kind`, newest first, with their inserted id ranges ("1001-1200") in id_ranges."""
+    _ready()
+    rows = fetch_all(
+        f"SELECT {', '.join('b.' + c.strip() for c in _BATCH_COLUMNS.split(','))}, r.first_id, r.last_id "
+        "FROM upload_batches b LEFT JOIN upload_batch_ranges r ON r.batch_id = b.batch_id "
+        "WHERE b.kind = %s ORDER BY b.uploaded_at DESC, b.batch_id, r.first_id",
+        [kind],
+    )
+    batches = {}
+    for row in rows:
+        first, last = row.pop("first_id"), row.pop("last_id")
+        batch = batches.setdefault(row["batch_id"], dict(row, id_ranges=[]))
+        if first is not None:
+            batch["id_ranges"].append(str(first) if first == last else f"{first}-{last}")
+    df = pd.DataFrame(list(batches.values()))
+    if not df.empty:
+        df["timestamp"] = pd.to_datetime(df["uploaded_at"])
+        df = df.rename(columns={"skipped": "skipped_count"})
+    return df
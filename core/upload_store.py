@@ -0,0 +1,131 @@
+# core/upload_store.py
+"""
+Upload files recognised by content (SHA-256), so an identical re-upload is a no-op.
+
+save_upload() streams an UploadedFile into UPLOAD_CHECKUPS_DIR and hashes the chunks on the way, so
+the digest costs no extra read. The digest is recorded with the upload's batch in core.upload_ledger;
+the upload views check find_duplicate() before parsing and keep neither the file nor a second batch
+for a duplicate.
+
+- Checkup batches live until they are rolled back, which allows the same workbook again.
+- Master uploads have no rollback; their batch carries the karyawan data version and only counts while
+  the master is unchanged (any edit in between makes the same file meaningful again).
+"""
+import hashlib
+import os
+import re
+import tempfile
+from datetime import datetime
+
+import pandas as pd
+from django.conf import settings
+
+from core import upload_ledger
+from core.instrumentation import logger
+
+
+def save_upload(uploaded_file, directory=None) -> dict:
+    """
+    Stream `uploaded_file` to a temporary file in `directory` (UPLOAD_CHECKUPS_DIR), hashing it.
+    Returns {"filename", "sha256", "size", "tmp_path"}; follow with keep() or discard().
+    """
+    directory = str(directory or settings.UPLOAD_CHECKUPS_DIR)
+    os.makedirs(directory, exist_ok=True)
+    digest, size = hashlib.sha256(), 0
+    fd, tmp_path = tempfile.mkstemp(prefix=".upload-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as dest:
+            for chunk in uploaded_file.chunks():
+                digest.update(chunk)
+                dest.write(chunk)
+                size += len(chunk)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    return {
+        "filename": os.path.basename(uploaded_file.name),
+        "sha256": digest.hexdigest(),
+        "size": size,
+        "tmp_path": tmp_path,
+    }
+
+
+def keep(stored) -> str:
+    """Move a save_upload() file to its final `{timestamp}-{filename}` name; returns the path."""
+    ts = datetime.now().strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(os.path.dirname(stored["tmp_path"]), f"{ts}-{stored['filename']}")
+    os.replace(stored["tmp_path"], path)
+    stored["path"] = path
+    return path
+
+
+def original_filename(path) -> str:
+    """Upload file name without the timestamp keep() put in front of it."""
+    name = os.path.basename(str(path))
+    return re.sub(r"^\d{8}-\d{6}-", "", name)
+
+
+def discard(stored):
+    try:
+        os.remove(stored["tmp_path"])
+    except OSError:
+        pass
+
+
+def hash_upload(uploaded_file) -> str:
+    """SHA-256 of an UploadedFile that is parsed straight from memory/temp (master uploads)."""
+    digest = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        digest.update(chunk)
+    uploaded_file.seek(0)
+    return digest.hexdigest()
+
+
+def find_duplicate(kind, digest, version=None):
+    """Ledger batch of an earlier upload with this content, or None. With `version`, only if it matches."""
+    try:
+        return upload_ledger.find(kind, digest, version=version)
+    except Exception as e:
+        # Only costs the dedup of this upload
+        logger.warning("upload ledger lookup failed for %s-%s: %s", kind, digest, e)
+        return None
+
+
+def duplicate_message(batch) -> str:
+    when = pd.to_datetime(batch.get("uploaded_at")).strftime("%Y-%m-%d %H:%M")
+    return f"File identik ({batch.get('filename')}) sudah diupload pada {when} — tidak ada data baru yang disimpan."
+
+
+def chunk_note(result) -> str:
+    """Message suffix with the upload's speed and, if any, its rolled-back chunks (core.ingest results)."""
+    if not isinstance(result, dict) or not result.get("rows_per_second"):
+        return ""
+    note = f" ({result['rows']} baris, {result['rows_per_second']:g} baris/detik)"
+    failed = [c for c in result.get("chunks", []) if not c.get("committed", True)]
+    if failed:
+        rows = ", ".join(f"{c['sheet']} baris {c['first_row']}-{c['last_row']}" for c in failed[:3])
+        note += f" {len(failed)} chunk gagal disimpan: {rows}{' …' if len(failed) > 3 else ''}."
+    return note
+
+
+def ingest_checkups(uploaded_file, parse):
+    """
+    Store, dedupe and ingest a checkup workbook. `parse(path)` returns the parser's result dict.
+    Returns (result, None), or (None, batch) when the same content was already ingested, in which
+    case nothing is stored or recorded.
+    """
+    from core.queries import write_checkup_upload_log
+
+    stored = save_upload(uploaded_file)
+    duplicate = find_duplicate(upload_ledger.CHECKUPS, stored["sha256"])
+    if duplicate:
+        discard(stored)
+        return None, duplicate
+    path = keep(stored)
+    result = parse(path)
+    # A file that saved nothing (unknown UIDs, wrong sheet) may be retried as-is once that is fixed
+    saved = int(result.get("inserted", 0)) + int(result.get("updated", 0)) > 0
+    write_checkup_upload_log(
+        stored["filename"], result, sha256=stored["sha256"] if saved else None, stored_file=os.path.basename(path)
+    )
+    return result, None
@@ -3,6 +3,7 @@ from django.urls import path, include
 from django.shortcuts import redirect
 from django.conf import settings
 from django.conf.urls.static import static
+from users_ui.master import master_views
 
 # --- Root redirect view ---
 def root_redirect(request):
@@ -22,6 +23,9 @@ urlpatterns = [
 
     # Authentication routes
     path("accounts/", include("accounts.auth_urls")),  # ✅ Login/logout URLs live here
+
+    # Prometheus scrape endpoint (Master session or METRICS_TOKEN)
+    path("metrics", master_views.metrics_view, name="metrics"),
 ]
 
 # Serve media files in development or when explicitly enabled for Railway Volume
@@ -1,12 +1,14 @@
 import os
 from pathlib import Path
+from django.core.exceptions import ImproperlyConfigured
 import dj_database_url
 from dotenv import load_dotenv
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 load_dotenv(BASE_DIR / ".env")
 
-SECRET_KEY = os.getenv("DJANGO_SECRET_KEY") or os.getenv("SECRET_KEY", "dev-secret-key")
+DEV_SECRET_KEY = "dev-secret-key"  # local development only; refused with signed-cookie sessions
+SECRET_KEY = os.getenv("DJANGO_SECRET_KEY") or os.getenv("SECRET_KEY", DEV_SECRET_KEY)
 DEBUG = os.getenv("DJANGO_DEBUG", os.getenv("DEBUG", "True")).lower() == "true"
 APP_BASE_URL = os.getenv("APP_BASE_URL")
 SERVE_MEDIA = os.getenv("DJANGO_SERVE_MEDIA", "False").lower() == "true"
@@ -49,9 +51,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.instrumentation.PerfInstrumentationMiddleware",  # outermost: times the whole stack
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
+    "core.db_router.ReadYourWritesMiddleware",  # needs the session; no-op without a read replica
     "django.contrib.auth.middleware.AuthenticationMiddleware",  # 👈 add this
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -158,6 +162,65 @@ elif db_url:
 else:
     DATABASES = {"default": local_db}
 
+# -----------------------------
+# Optional read replica (see core.db_router)
+# -----------------------------
+# Only grafik JSON, exports and QR bulk download read from it; everything else stays on default
+replica_db_url = _normalize_database_url(os.getenv("DATABASE_REPLICA_URL"))
+if os.getenv("DJANGO_USE_SQLITE", "False").lower() == "true":
+    if os.getenv("DJANGO_SQLITE_REPLICA"):
+        DATABASES["replica"] = {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.getenv("DJANGO_SQLITE_REPLICA"),
+        }
+elif replica_db_url:
+    DATABASES["replica"] = dj_database_url.parse(
+        replica_db_url,
+        conn_max_age=600,
+        ssl_require=not any(h in replica_db_url for h in ("railway.internal", "localhost", "127.0.0.1")),
+    )
+    DATABASES["replica"].setdefault("OPTIONS", {})["options"] = "-c search_path=public"
+if "replica" in DATABASES:
+    DATABASES["replica"]["TEST"] = {"MIRROR": "default"}
+DATABASE_ROUTERS = ["core.db_router.ReplicaRouter"]
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "15"))  # session reads default after a write
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", "30"))  # reads default after a replica failure
+
+# -----------------------------
+# Connection reuse (PostgreSQL, see core.db_pool)
+# -----------------------------
+# Ping persistent connections before reuse so ones dropped while idle (SSL proxies, Railway/Supabase) are replaced
+DB_CONN_HEALTH_CHECKS = os.getenv("DB_CONN_HEALTH_CHECKS", "True").lower() in ("1", "true", "yes")
+# Optional psycopg 3 pool per worker (pip install "psycopg[binary,pool]"); replaces CONN_MAX_AGE persistence
+DB_POOL = os.getenv("DB_POOL", "False").lower() in ("1", "true", "yes")
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "4"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))  # seconds to wait for a free connection
+DB_POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", "300"))  # close idle connections above min_size after this
+DB_POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", "1800"))  # recycle connections after this
+
+
+def _psycopg_pool_available() -> bool:
+    import importlib.util
+    return all(importlib.util.find_spec(name) for name in ("psycopg", "psycopg_pool"))
+
+
+DB_POOL_ACTIVE = False
+for _db in DATABASES.values():
+    if _db["ENGINE"] != "django.db.backends.postgresql":
+        continue
+    _db["CONN_HEALTH_CHECKS"] = DB_CONN_HEALTH_CHECKS
+    if DB_POOL and _psycopg_pool_available():
+        _db["CONN_MAX_AGE"] = 0  # Django requires 0 with a pool
+        _db.setdefault("OPTIONS", {})["pool"] = {
+            "min_size": DB_POOL_MIN_SIZE,
+            "max_size": DB_POOL_MAX_SIZE,
+            "timeout": DB_POOL_TIMEOUT,
+            "max_idle": DB_POOL_MAX_IDLE,
+            "max_lifetime": DB_POOL_MAX_LIFETIME,
+        }
+        DB_POOL_ACTIVE = True
+
 
 LANGUAGE_CODE = "en-us"
 TIME_ZONE = "Asia/Jakarta"
@@ -183,6 +246,8 @@ STORAGES = {
 
 MEDIA_URL = os.getenv("DJANGO_MEDIA_URL", "/media/")
 MEDIA_ROOT = Path(os.getenv("DJANGO_MEDIA_ROOT", str(BASE_DIR / "media")))
+# App-owned runtime files (slow-query log, data snapshots); never under MEDIA_ROOT, which may be served
+VAR_DIR = Path(os.getenv("DJANGO_VAR_DIR", str(BASE_DIR / "var")))
 
 # Add upload directories for saving uploaded files and logs
 UPLOAD_DIR = MEDIA_ROOT / "uploads"
@@ -192,11 +257,35 @@ os.makedirs(MEDIA_ROOT, exist_ok=True)
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(UPLOAD_CHECKUPS_DIR, exist_ok=True)
 os.makedirs(UPLOAD_LOG_DIR, exist_ok=True)
+# Checkup uploads (core.checkup_uploader): "insert" (default) always adds rows, "upsert" updates the checkup
+# already stored for the same uid + tanggal_checkup. Only use upsert once `manage.py add_checkup_indexes` has
+# created the unique (uid, tanggal_checkup) index. Identical files are skipped either way (core.upload_store)
+CHECKUP_UPLOAD_MODE = os.getenv("CHECKUP_UPLOAD_MODE", "insert").lower()
+# Rows per chunk of a checkup upload (core.ingest); each chunk is validated and written in one transaction
+CHECKUP_UPLOAD_CHUNK_ROWS = int(os.getenv("CHECKUP_UPLOAD_CHUNK_ROWS", "500"))
+# Processes that parse the sheets of a master/checkup workbook in parallel (core.ingest.map_sheets);
+# 1 = one sheet after another in the web worker, 0 = min(4, CPU count). Writes stay in the web worker
+UPLOAD_PARSE_WORKERS = int(os.getenv("UPLOAD_PARSE_WORKERS", "1"))
 # -----------------------------
 # Default primary key
 # -----------------------------
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# -----------------------------
+# Sessions
+# -----------------------------
+# "db" (default): Django's database sessions; logout deletes the session row.
+# "signed_cookies" (opt-in): the session lives in the signed cookie, no django_session query per request
+# (core.session_store; sessions issued by the db backend are migrated on their next request). Anyone
+# holding SECRET_KEY can forge any role, and a cookie stays valid until SESSION_COOKIE_AGE even after logout.
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "db").lower()
+if SESSION_BACKEND == "signed_cookies" and SECRET_KEY == DEV_SECRET_KEY:
+    raise ImproperlyConfigured("SESSION_BACKEND=signed_cookies requires DJANGO_SECRET_KEY to be set")
+SESSION_ENGINE = (
+    "core.session_store" if SESSION_BACKEND == "signed_cookies" else "django.contrib.sessions.backends.db"
+)
+SESSION_COOKIE_MAX_BYTES = int(os.getenv("SESSION_COOKIE_MAX_BYTES", "3800"))  # browsers drop cookies over ~4 KB
+
 # -----------------------------
 # Authentication Redirects
 # -----------------------------
@@ -204,6 +293,61 @@ LOGIN_URL = "accounts:login"
 LOGIN_REDIRECT_URL = "/manager/"   # or "/nurse/" depending on role
 LOGOUT_REDIRECT_URL = "/"
 
+# -----------------------------
+# Performance instrumentation (core.instrumentation)
+# -----------------------------
+# Server-Timing header on every response (visible in browser devtools); on by default only in DEBUG
+PERF_SERVER_TIMING = os.getenv("PERF_SERVER_TIMING", str(DEBUG)).lower() == "true"
+# Fraction of requests logged as one JSON line on the "mini_mcu.perf" logger; slow requests are always logged
+PERF_LOG_SAMPLE_RATE = float(os.getenv("PERF_LOG_SAMPLE_RATE", "0.05"))
+PERF_LOG_SLOW_MS = float(os.getenv("PERF_LOG_SLOW_MS", "1000"))
+
+# Prometheus metrics (core.metrics): per-worker snapshots merged by /metrics
+METRICS_DIR = os.getenv("METRICS_DIR")  # default: <tmp>/mini_mcu_metrics
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")  # bearer token for scrapers; Master session also works
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "2"))
+
+# Slow-query recorder (core.slow_queries): queries at/over SLOW_QUERY_MS go to a JSON-lines file shared by
+# all workers; rotate it externally (logrotate), the recorder reopens it when it is moved
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_LOG_FILE = os.getenv("SLOW_QUERY_LOG_FILE")  # default: VAR_DIR/perf/slow_queries.log
+
+# Cross-worker data versions (core.data_version) used to invalidate in-process caches and snapshots:
+# "db" = data_versions table (LISTEN/NOTIFY on PostgreSQL, one query per request elsewhere), "file" = per-host mtime stamps
+DATA_VERSION_BACKEND = os.getenv("DATA_VERSION_BACKEND", "db")
+DATA_VERSION_LISTEN = os.getenv("DATA_VERSION_LISTEN", "True").lower() in ("1", "true", "yes")
+DATA_VERSION_POLL_SECONDS = float(os.getenv("DATA_VERSION_POLL_SECONDS", "1"))  # reuse window outside requests
+DATA_VERSION_DIR = os.getenv("DATA_VERSION_DIR")  # file backend; default: <tmp>/mini_mcu_versions
+
+# Password hashing (core.passwords): bcrypt cost for new hashes; existing hashes keep theirs until reset
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Processes for bulk resets (reset_all_passwords); 0 = min(4, CPU count)
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "0"))
+
+# Query budgets (core.query_budget): "raise" | "warn" | "off"; unset = raise under tests, warn in DEBUG, else off
+QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE")
+
+# Rows per chunk for streamed exports (core.db_utils.iter_frames; server-side cursor on PostgreSQL)
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "2000"))
+
+# Shared memory-mapped employee/checkup snapshots (core.snapshot), republished when core.data_version changes
+DATA_SNAPSHOT_ENABLED = os.getenv("DATA_SNAPSHOT_ENABLED", "True").lower() in ("1", "true", "yes")
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR")  # default: VAR_DIR/snapshot (created 0o700)
+DATA_SNAPSHOT_MAX_AGE = int(os.getenv("DATA_SNAPSHOT_MAX_AGE", "600"))  # seconds; also catches writes made outside the app
+# Largest checkup delta applied to the previous snapshot instead of a full reload; unset = 10% of the rows (min 1000)
+DATA_SNAPSHOT_DELTA_MAX_ROWS = os.getenv("DATA_SNAPSHOT_DELTA_MAX_ROWS")
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "mini_mcu.perf": {"handlers": ["console"], "level": "INFO", "propagate": False},
+    },
+}
+
 # Production security hardening (only when not DEBUG)
 if not DEBUG:
     SECURE_SSL_REDIRECT = True
@@ -155,6 +155,7 @@
         healthMetrics:[],
         lokasiList:[],
         karyawanList:[],
+        karyawanQuery:'',
         // Initialize charts as null to avoid rendering ApexCharts with empty config
         chartSeries:[],
         chartOptions:null,
@@ -210,7 +211,9 @@
     },
     watch:{
       chartType(){ this.updateChartType(); },
-      activeMetric(){ this.updateMetricOpacity(); }
+      activeMetric(){ this.updateMetricOpacity(); },
+      karyawanQuery(){ this.searchKaryawanSoon(); },
+      'filters.lokasi'(){ this.searchKaryawanSoon(); }
     },
     methods:{
       // Build initial card entries based on metricsList
@@ -315,14 +318,24 @@
         }catch(e){ this.lokasiList = []; }
       },
       async fetchKaryawanList(){
+        // Top matches only (typeahead endpoint); the preselected employee is found by its uid
+        const q = this.karyawanQuery || (this.karyawanList.length ? '' : (this.filters.karyawan_uid||''));
+        const params = new URLSearchParams({ q, lokasi:this.filters.lokasi||'', limit:'50' });
         try{
-          const res = await fetch(`${API_BASE}/grafik/karyawan-list/`,{ headers:{'Accept':'application/json'} });
+          const res = await fetch(`${API_BASE}/grafik/karyawan-search/?${params.toString()}`,{ headers:{'Accept':'application/json'} });
           const json = await res.json();
-          const arr = Array.isArray(json) ? json : (json.karyawan||[]);
-          // Normalize shape to {uid,nama}
-          this.karyawanList = arr.map(x=>({ uid: String(x.uid||''), nama: x.nama||String(x.name||'') })).filter(x=>x.uid && x.nama);
+          const arr = Array.isArray(json) ? json : (json.results||[]);
+          // Normalize shape to {uid,nama}; keep the selected employee listed while searching
+          const list = arr.map(x=>({ uid: String(x.uid||''), nama: x.nama||String(x.name||'') })).filter(x=>x.uid && x.nama);
+          const selected = this.karyawanList.find(x=>x.uid===this.filters.karyawan_uid);
+          if (selected && !list.some(x=>x.uid===selected.uid)) list.unshift(selected);
+          this.karyawanList = list;
         }catch(e){ this.karyawanList = []; }
       },
+      searchKaryawanSoon(){
+        clearTimeout(this._karyawanTimer);
+        this._karyawanTimer = setTimeout(()=>this.fetchKaryawanList(), 200);
+      },
       async fetchData(){
         const params = new URLSearchParams({
           month_from:this.filters.start_month||'',
@@ -611,6 +624,7 @@
               </select>
             </div>
             <div><label class="text-sm font-medium block">Karyawan</label>
+              <input type="search" v-model="karyawanQuery" placeholder="Cari nama / UID..." class="border rounded px-2 py-1 mr-1 w-40" />
               <select v-model="filters.karyawan_uid" class="border rounded px-2 py-1 min-w-[220px]">
                 <option value="">Semua Karyawan</option>
                 <option v-for="p in karyawanList" :key="p.uid" :value="p.uid">{{ p.nama }}</option>
@@ -2,39 +2,102 @@
 from django.shortcuts import render
 from django.http import HttpResponse
 import pandas as pd
-from core.queries import load_checkups, get_employee_by_uid
+from core import data_version
+from core.queries import get_checkups_for_uid, get_checkup_version_for_uid, get_employee_by_uid
 from core.helpers import compute_status
+from utils.cache_utils import BoundedCache
+from utils.validators import validate_month, validate_uid
 from datetime import datetime
-import plotly.graph_objects as go
-import plotly.io as pio
+
+# -------------------------
+# Landing page cache
+# -------------------------
+# One entry per uid, for the default grafik month range (what a QR scan opens); the stored version
+# is compared on every hit so a new/deleted/edited checkup or a master data change rebuilds the
+# payload. The page is public, so it has its own bounded store: scans of random uids or month
+# ranges cannot evict the shared utils.cache_utils entries (employee search index, menus).
+LANDING_CACHE_TTL = 300
+# Unknown uids (bad/old QR codes) are remembered briefly so repeated scans skip the DB.
+LANDING_MISSING_TTL = 60
+LANDING_CACHE_MAX_ENTRIES = 256
+_landing_cache = BoundedCache(LANDING_CACHE_MAX_ENTRIES)
+
+
+def _month_str(dt):
+    return f"{dt.year}-{dt.month:02d}"
 
 
 def karyawan_landing(request):
     uid = request.GET.get("uid")
     if not uid:
         return HttpResponse("❌ UID tidak ditemukan di URL. Silakan scan QR code yang benar.", status=400)
+    if not validate_uid(uid):
+        return HttpResponse("❌ UID tidak valid. Silakan scan QR code yang benar.", status=400)
+
+    # Grafik tab month range (default: last 6 months)
+    today = datetime.today()
+    default_range = (_month_str(today - pd.DateOffset(months=5)), _month_str(today))
+    grafik_start_month = request.GET.get('start_month') or default_range[0]
+    grafik_end_month = request.GET.get('end_month') or default_range[1]
+    if not (validate_month(grafik_start_month) and validate_month(grafik_end_month)):
+        return HttpResponse("❌ Format bulan tidak valid (YYYY-MM).", status=400)
+
+    missing_key = f"karyawan_landing:missing:{uid}"
+    if _landing_cache.get(missing_key):
+        return HttpResponse("❌ Data karyawan tidak ditemukan.", status=404)
 
     # Fetch employee
     try:
         emp_raw = get_employee_by_uid(uid)
         if not emp_raw:
+            _landing_cache.set(missing_key, True, ttl=LANDING_MISSING_TTL)
             return HttpResponse("❌ Data karyawan tidak ditemukan.", status=404)
         emp = emp_raw.to_dict() if hasattr(emp_raw, "to_dict") else emp_raw
     except Exception as e:
         return HttpResponse(f"❌ Gagal mengambil data karyawan: {e}", status=500)
 
-    # Fetch checkups
+    # Version = checkups data version (catches in-place edits) + this uid's checkup fingerprint
+    # + master data + day (expiry estimate is relative to today)
     try:
-        df_checkups = load_checkups()
-        if df_checkups.empty:
-            df_user = pd.DataFrame()
-        else:
-            df_user = df_checkups[df_checkups["uid"].astype(str) == str(uid)]
-            if not df_user.empty:
-                df_user["tanggal_checkup"] = pd.to_datetime(df_user["tanggal_checkup"], errors="coerce")
+        version = (
+            data_version.current(data_version.CHECKUPS),
+            get_checkup_version_for_uid(uid),
+            repr(sorted(emp.items())),
+            today.date().isoformat(),
+        )
     except Exception as e:
         return HttpResponse(f"❌ Gagal mengambil data checkup: {e}", status=500)
 
+    # Other month ranges are built per request
+    cacheable = (grafik_start_month, grafik_end_month) == default_range
+    cache_key = f"karyawan_landing:{uid}"
+    cached = _landing_cache.get(cache_key) if cacheable else None
+    if cached and cached.get("version") == version:
+        payload = cached["payload"]
+    else:
+        # Fetch checkups
+        try:
+            df_user = get_checkups_for_uid(uid)
+            if not df_user.empty:
+                df_user["tanggal_checkup"] = pd.to_datetime(df_user["tanggal_checkup"], errors="coerce")
+        except Exception as e:
+            return HttpResponse(f"❌ Gagal mengambil data checkup: {e}", status=500)
+        payload = _build_landing_payload(uid, emp, df_user, grafik_start_month, grafik_end_month)
+        if cacheable:
+            _landing_cache.set(cache_key, {"version": version, "payload": payload}, ttl=LANDING_CACHE_TTL)
+
+    context = dict(payload)
+    context.update({
+        "active_submenu": request.GET.get("submenu", "data_karyawan"),
+        "active_subtab": request.GET.get("subtab", "profile"),
+        "view_only": True,
+    })
+
+    return render(request, "manager/edit_karyawan.html", context)
+
+
+def _build_landing_payload(uid, emp, df_user, grafik_start_month, grafik_end_month):
+    """Build the request-independent part of the landing context (history, expiry, grafik)."""
     # Build latest and history in the same shape manager uses
     latest_checkup = None
     history_checkups = []
@@ -231,17 +294,7 @@ def karyawan_landing(request):
 
     # Grafik tab (month range filter for single karyawan)
     grafik_chart_html = None
-    grafik_start_month = request.GET.get('start_month')
-    grafik_end_month = request.GET.get('end_month')
     try:
-        today = datetime.today()
-        def _month_str(dt):
-            return f"{dt.year}-{dt.month:02d}"
-        if not grafik_end_month:
-            grafik_end_month = _month_str(today)
-        if not grafik_start_month:
-            grafik_start_month = _month_str(today - pd.DateOffset(months=5))
-
         df_ts = df_user.copy() if df_user is not None else pd.DataFrame()
         if df_ts is not None and not df_ts.empty:
             df_ts['tanggal_checkup'] = pd.to_datetime(df_ts['tanggal_checkup'], errors='coerce')
@@ -270,6 +323,8 @@ def karyawan_landing(request):
                     return pd.NA
             td_systolic = df_ts['tekanan_darah'].apply(_parse_systolic) if 'tekanan_darah' in df_ts.columns else pd.Series([], dtype='float64')
 
+            import plotly.graph_objects as go
+            import plotly.io as pio
             fig = go.Figure()
             if not x_vals.empty:
                 if gdp is not None and not gdp.empty:
@@ -297,18 +352,13 @@ def karyawan_landing(request):
     except Exception:
         grafik_chart_html = None
 
-    context = {
+    return {
         "employee": emp,
         "latest_checkup": latest_checkup,
         "history_checkups": history_checkups,
         "history_dashboard": history_dashboard,
-        "active_submenu": request.GET.get("submenu", "data_karyawan"),
-        "active_subtab": request.GET.get("subtab", "profile"),
-        "view_only": True,
         "mcu_expiry_estimate": mcu_expiry_estimate,
         "grafik_chart_html": grafik_chart_html,
         "grafik_start_month": grafik_start_month,
         "grafik_end_month": grafik_end_month,
     }
-
-    return render(request, "manager/edit_karyawan.html", context)
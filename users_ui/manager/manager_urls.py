@@ -18,6 +18,8 @@ urlpatterns = [
     path("grafik/lokasi-list/", manager_views.lokasi_list_json, name="lokasi_list_json"),
     # JSON API for Grafik → Karyawan list (used by filters)
     path("grafik/karyawan-list/", manager_views.karyawan_list_json, name="karyawan_list_json"),
+    # JSON API for the employee pickers → typeahead search (core.employee_search)
+    path("grafik/karyawan-search/", manager_views.karyawan_search_json, name="karyawan_search_json"),
     # Diagnostic endpoint to capture frontend logs before potential freeze
     path("grafik/diagnostic-log/", manager_views.grafik_diagnostic_log, name="grafik_diagnostic_log"),
 
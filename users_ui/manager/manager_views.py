@@ -16,6 +16,7 @@ from users_ui.qr.qr_utils import generate_qr_bytes
 import uuid
 import os
 from utils.validators import safe_date, validate_lokasi, normalize_string, safe_float
+from core.db_router import replica_reads
 
 from core.queries import (
     get_users,
@@ -33,9 +34,10 @@ from core.queries import (
     reset_user_password as core_reset_user_password,
     get_user_by_username,
     change_username as core_change_username,
-    write_checkup_upload_log,
     get_checkup_upload_history,
     load_checkups,
+    iter_checkups,
+    get_latest_checkups_in_range,
     get_manual_input_logs,
     write_manual_input_log,
 )
@@ -45,13 +47,13 @@ from core.helpers import (
     sanitize_df_for_display,
     get_dashboard_checkup_data,
     get_active_menu_for_view,
+    get_default_employee_uid,
+    get_menu_items,
     compute_status,
 )
 
-import plotly.graph_objects as go
-import plotly.io as pio
 from core import excel_parser, checkup_uploader
-from utils.export_utils import generate_karyawan_template_excel, export_checkup_data_excel as build_checkup_excel, export_checkup_data_pdf as build_checkup_pdf
+from utils.export_utils import generate_karyawan_template_excel, export_checkup_data_excel as build_checkup_excel, export_checkup_data_pdf as build_checkup_pdf, export_checkup_frames_excel
 from users_ui.qr.qr_views import qr_detail_view, qr_bulk_download_view
 
 # -------------------------
@@ -79,17 +81,6 @@ def dashboard(request):
         active_submenu = 'grafik'
         forced_subtab = 'well_unwell'
 
-    # [DEBUG] STEP 3 — Backend parameter trace
-    try:
-        print("[DEBUG] Incoming GET params:", request.GET)
-    except Exception:
-        pass
-    try:
-        lokasi_filter = request.GET.get("lokasi", "").strip()
-        print("[DEBUG] lokasi_filter value:", lokasi_filter)
-    except Exception:
-        pass
-    
     # Grafik JSON API: return processed data for chart overhaul
     if active_submenu == 'grafik' and request.GET.get('grafik_json') == '1':
         # Build JSON payload based on month range and UID filters
@@ -320,7 +311,8 @@ def dashboard(request):
     
     # Apply filters
     if filters['nama']:
-        df = df[df['nama'].astype(str).str.contains(filters['nama'], case=False, na=False)]
+        from core import employee_search
+        df = employee_search.filter_by_nama(df, filters['nama'])
     if filters['jabatan']:
         # Normalize filter to match jabatan_key
         filt_clean = ' '.join(filters['jabatan'].split()).strip().lower()
@@ -426,13 +418,15 @@ def dashboard(request):
             filename = latest.get('filename', '')
             inserted = int(latest.get('inserted', 0))
             skipped = int(latest.get('skipped_count', 0))
+            updated = int(latest.get('updated', 0) or 0)
+            counts = f"Inserted: {inserted} • Skipped: {skipped}" + (f" • Updated: {updated}" if updated else "")
             if start_month and end_month:
                 # Show selected range
-                latest_checkup_display = f"Range {start_month} s/d {end_month} • {filename} • Inserted: {inserted} • Skipped: {skipped}"
+                latest_checkup_display = f"Range {start_month} s/d {end_month} • {filename} • {counts}"
             elif latest_check_date_disp:
-                latest_checkup_display = f"{latest_check_date_disp} • {filename} • Inserted: {inserted} • Skipped: {skipped}"
+                latest_checkup_display = f"{latest_check_date_disp} • {filename} • {counts}"
             else:
-                latest_checkup_display = f"{ts_disp} • {filename} • Inserted: {inserted} • Skipped: {skipped}"
+                latest_checkup_display = f"{ts_disp} • {filename} • {counts}"
         else:
             latest_checkup_display = latest_check_date_disp
     except Exception:
@@ -834,266 +828,97 @@ def download_checkup_template(request):
 
 
 
-def upload_master_karyawan_xls(request):
-    # Get first employee UID for Edit Karyawan menu
-    employees_df = get_employees()
-    default_uid = str(employees_df.iloc[0]['uid']) if not employees_df.empty else None
-
-    menu_items = [
-        {"key": "dashboard", "name": "Dashboard", "url": reverse("manager:dashboard"), "icon": "chart-line"},
-        {"key": "user", "name": "User Management", "url": reverse("manager:user_management"), "icon": "users"},
-        {"key": "qr", "name": "QR Codes", "url": reverse("manager:qr_codes"), "icon": "qrcode"},
-        {"key": "data", "name": "Upload & Export", "url": reverse("manager:upload_export"), "icon": "upload"},
-        {"key": "hapus_data_karyawan", "name": "Hapus Data Karyawan", "url": reverse("manager:hapus_data_karyawan"), "icon": "database"},
-        {"key": "edit_karyawan", "name": "Edit Master Data", "url": reverse("manager:edit_karyawan", kwargs={'uid': default_uid}) if default_uid else '#', "icon": "edit"},
-    ]
-    
-    if request.method == "POST" and request.FILES.get("file"):
-        try:
-            # Parse and save master karyawan data using core.excel_parser
-            result = excel_parser.parse_master_karyawan(request.FILES["file"])
-            # Build preview DataFrame without changing logic or computing BMI/umur
-            preview_df = excel_parser.parse_master_preview(request.FILES["file"]) 
-
-            preview_df = sanitize_df_for_display(preview_df)
-            preview_cols = list(preview_df.columns)
-            # Build a matrix for template rendering without custom filters
-            preview_rows = [[str(row.get(col, "")) for col in preview_cols] for _, row in preview_df.iterrows()]
-            request.session['success_message'] = f"{result['inserted']} karyawan berhasil diupload, {result['skipped']} dilewati."
-            return render(request, "manager/upload_export.html", {
-                "active_menu": "data",
-                "menu_items": menu_items,
-                "preview_cols": preview_cols,
-                "preview_rows": preview_rows,
-            })
-        except Exception as e:
-            request.session['error_message'] = f"Upload failed: {e}"
-            return render(request, "manager/upload_export.html", {
-                "active_menu": "data",
-                "menu_items": menu_items,
-            })
-    
-    return render(request, "manager/upload_export.html", {
-        "active_menu": "data",
-        "menu_items": menu_items
-    })
-
-def upload_medical_checkup_xls(request):
-    """Upload medical checkup data from Excel."""
-    if not request.session.get("authenticated") or request.session.get("user_role") != "Manager":
-        return redirect("accounts:login")
-
-    # Get first employee UID for Edit Karyawan menu
-    employees_df = get_employees()
-    default_uid = str(employees_df.iloc[0]['uid']) if not employees_df.empty else None
-
-    menu_items = [
-        {"key": "dashboard", "name": "Dashboard", "url": reverse("manager:dashboard"), "icon": "chart-line"},
-        {"key": "user", "name": "User Management", "url": reverse("manager:user_management"), "icon": "users"},
-        {"key": "qr", "name": "QR Codes", "url": reverse("manager:qr_codes"), "icon": "qrcode"},
-        {"key": "data", "name": "Upload & Export", "url": reverse("manager:upload_export"), "icon": "upload"},
-        {"key": "hapus_data_karyawan", "name": "Hapus Data Karyawan", "url": reverse("manager:hapus_data_karyawan"), "icon": "database"},
-        {"key": "edit_karyawan", "name": "Edit Master Data", "url": reverse("manager:edit_karyawan", kwargs={'uid': default_uid}) if default_uid else '#', "icon": "edit"},
-    ]
-    
-    if request.method == "POST" and request.FILES.get("file"):
-        try:
-            uploaded_file = request.FILES["file"]
-            os.makedirs(settings.UPLOAD_CHECKUPS_DIR, exist_ok=True)
-            ts = datetime.now().strftime("%Y%m%d-%H%M%S")
-            original_name = os.path.basename(uploaded_file.name)
-            save_path = os.path.join(settings.UPLOAD_CHECKUPS_DIR, f"{ts}-{original_name}")
-            with open(save_path, "wb+") as dest:
-                for chunk in uploaded_file.chunks():
-                    dest.write(chunk)
-
-            # Parse medical checkup XLS (anthropometrics excluded; handled in master)
-            result = checkup_uploader.parse_checkup_xls(save_path)
-            # Write log entry for this upload
-            write_checkup_upload_log(original_name, result)
-            inserted = int(result.get('inserted', 0)) if isinstance(result, dict) else 0
-            skipped = len(result.get('skipped', [])) if isinstance(result, dict) else 0
-            request.session['success_message'] = f"Excel berhasil di upload! {inserted} checkup disimpan, {skipped} baris dilewati."
-        except Exception as e:
-            request.session['error_message'] = f"Upload failed: {e}"
-        return redirect(reverse("manager:dashboard"))
-    
-    return render(request, "manager/upload_export.html", {
-        "active_menu": "data",
-        "menu_items": menu_items
-    })
-
 # -------------------------
 # Upload Log Management
 # -------------------------
 @require_http_methods(["POST"]) 
 def delete_upload_log(request):
-    """Delete a single upload log JSON file and associated checkup records."""
+    """Roll back a single upload batch: delete its inserted checkups, restore the ones it updated, drop its ledger entry."""
     if not request.session.get("authenticated") or request.session.get("user_role") != "Manager":
         return redirect("accounts:login")
 
-    log_file = request.POST.get("log_file", "").strip()
+    batch_id = request.POST.get("batch_id", "").strip()
     redirect_url = reverse("manager:hapus_data_karyawan") + "?subtab=upload_history"
 
-    if not log_file:
-        request.session["error_message"] = "Tidak ada file log untuk dihapus."
-        return redirect(redirect_url)
-
-    safe_name = os.path.basename(log_file)
-    if safe_name != log_file:
-        request.session["error_message"] = "Nama file log tidak valid."
-        return redirect(redirect_url)
-
-    log_dir = getattr(settings, "UPLOAD_LOG_DIR", None)
-    if not log_dir:
-        request.session["error_message"] = "Direktori log tidak ditemukan."
+    if not batch_id:
+        request.session["error_message"] = "Tidak ada log untuk dihapus."
         return redirect(redirect_url)
 
-    base_dir = os.path.abspath(log_dir)
-    target_path = os.path.abspath(os.path.join(base_dir, safe_name))
-    if not target_path.startswith(base_dir + os.sep):
-        request.session["error_message"] = "Akses direktori log tidak valid."
-        return redirect(redirect_url)
-
-    if os.path.isfile(target_path):
-        deleted_checkups = 0
-        try:
-            # Read log to get inserted checkup IDs
-            from core.queries import delete_checkup
-            import json as _json
-            with open(target_path, "r", encoding="utf-8") as f:
-                data = _json.load(f)
-                ids = data.get("inserted_ids", [])
-                for cid in set(str(x) for x in ids if x):
-                    try:
-                        delete_checkup(cid)
-                        deleted_checkups += 1
-                    except Exception:
-                        pass
-            # Remove the log file itself
-            os.remove(target_path)
-            if deleted_checkups > 0:
-                request.session["success_message"] = f"Log upload dihapus. {deleted_checkups} data checkup terkait turut dihapus."
-            else:
-                request.session["success_message"] = "Log upload berhasil dihapus. Tidak ada data checkup terkait."
-        except Exception as e:
-            request.session["error_message"] = f"Gagal menghapus log/checkup: {e}"
-    else:
-        request.session["error_message"] = "File log tidak ditemukan."
+    try:
+        from core import upload_ledger
+        from core.query_budget import query_budget
+
+        # One DELETE for all of the batch's checkups and one UPDATE for the rows it changed, whatever its size
+        with query_budget(14, name="delete_upload_log"):
+            result = upload_ledger.rollback([batch_id])
+        if not result["batches"]:
+            request.session["error_message"] = "Log upload tidak ditemukan."
+        elif result["checkups"] > 0 or result["restored"] > 0:
+            request.session["success_message"] = (
+                f"Log upload dihapus. {result['checkups']} data checkup terkait turut dihapus, "
+                f"{result['restored']} data checkup dipulihkan."
+            )
+        else:
+            request.session["success_message"] = "Log upload berhasil dihapus. Tidak ada data checkup terkait."
+    except upload_ledger.RollbackConflict as e:
+        request.session["error_message"] = str(e)
+    except Exception as e:
+        request.session["error_message"] = f"Gagal menghapus log/checkup: {e}"
 
     return redirect(redirect_url)
 
 @require_http_methods(["POST"]) 
 def delete_upload_logs_bulk(request):
-    """Delete multiple selected upload log JSON files and associated checkup records."""
+    """Roll back the selected upload batches: delete their inserted checkups and restore the ones they updated."""
     if not request.session.get("authenticated") or request.session.get("user_role") != "Manager":
         return redirect("accounts:login")
 
     redirect_url = reverse("manager:hapus_data_karyawan") + "?subtab=upload_history"
-    selected = request.POST.getlist("selected_logs")
+    selected = [b.strip() for b in request.POST.getlist("selected_batches") if b and b.strip()]
 
     if not selected:
         request.session["error_message"] = "Tidak ada log yang dipilih."
         return redirect(redirect_url)
 
-    log_dir = getattr(settings, "UPLOAD_LOG_DIR", None)
-    if not log_dir:
-        request.session["error_message"] = "Direktori log tidak ditemukan."
-        return redirect(redirect_url)
-
-    base_dir = os.path.abspath(log_dir)
-    deleted_logs = 0
-    deleted_checkups = 0
-    skipped_count = 0
-
-    for name in selected:
-        if not name:
-            skipped_count += 1
-            continue
-        safe_name = os.path.basename(name.strip())
-        if safe_name != name.strip():
-            skipped_count += 1
-            continue
-        # Only allow JSON files
-        if not safe_name.lower().endswith(".json"):
-            skipped_count += 1
-            continue
-        target_path = os.path.abspath(os.path.join(base_dir, safe_name))
-        if not target_path.startswith(base_dir + os.sep):
-            skipped_count += 1
-            continue
-        if os.path.isfile(target_path):
-            try:
-                # Read log and delete related checkups
-                from core.queries import delete_checkup
-                import json as _json
-                with open(target_path, "r", encoding="utf-8") as f:
-                    data = _json.load(f)
-                    ids = data.get("inserted_ids", [])
-                    for cid in set(str(x) for x in ids if x):
-                        try:
-                            delete_checkup(cid)
-                            deleted_checkups += 1
-                        except Exception:
-                            pass
-                # Delete the log file
-                os.remove(target_path)
-                deleted_logs += 1
-            except Exception:
-                skipped_count += 1
+    try:
+        from core import upload_ledger
+        from core.query_budget import query_budget
+
+        with query_budget(14, name="delete_upload_logs_bulk"):
+            result = upload_ledger.rollback(selected)
+        if result["batches"] > 0:
+            msg = (
+                f"{result['batches']} log dihapus. {result['checkups']} data checkup terkait turut dihapus, "
+                f"{result['restored']} data checkup dipulihkan."
+            )
+            skipped_count = len(set(selected)) - result["batches"]
+            if skipped_count > 0:
+                msg += f" {skipped_count} dilewati."
+            request.session["success_message"] = msg
         else:
-            skipped_count += 1
-
-    if deleted_logs > 0:
-        msg = f"{deleted_logs} log dihapus. {deleted_checkups} data checkup terkait turut dihapus."
-        if skipped_count > 0:
-            msg += f" {skipped_count} dilewati."
-        request.session["success_message"] = msg
-    else:
-        request.session["error_message"] = "Tidak ada log yang dihapus."
+            request.session["error_message"] = "Tidak ada log yang dihapus."
+    except upload_ledger.RollbackConflict as e:
+        request.session["error_message"] = str(e)
+    except Exception as e:
+        request.session["error_message"] = f"Gagal menghapus log/checkup: {e}"
 
     return redirect(redirect_url)
 
 @require_http_methods(["POST"]) 
 def purge_upload_logs(request):
-    """Delete ALL upload log JSON files and their associated checkup records in the log directory."""
+    """Roll back ALL checkup upload batches: delete their inserted checkups and restore the ones they updated."""
     if not request.session.get("authenticated") or request.session.get("user_role") != "Manager":
         return redirect("accounts:login")
 
     redirect_url = reverse("manager:hapus_data_karyawan") + "?subtab=upload_history"
-    log_dir = getattr(settings, "UPLOAD_LOG_DIR", None)
-    if not log_dir:
-        request.session["error_message"] = "Direktori log tidak ditemukan."
-        return redirect(redirect_url)
-
-    base_dir = os.path.abspath(log_dir)
-    deleted_logs = 0
-    deleted_checkups = 0
     try:
-        for fname in os.listdir(base_dir):
-            if fname.lower().endswith(".json") and fname.startswith("checkups-"):
-                fpath = os.path.abspath(os.path.join(base_dir, fname))
-                if fpath.startswith(base_dir + os.sep) and os.path.isfile(fpath):
-                    try:
-                        # Read log and delete associated checkups
-                        from core.queries import delete_checkup
-                        import json as _json
-                        with open(fpath, "r", encoding="utf-8") as f:
-                            data = _json.load(f)
-                            ids = data.get("inserted_ids", [])
-                            for cid in set(str(x) for x in ids if x):
-                                try:
-                                    delete_checkup(cid)
-                                    deleted_checkups += 1
-                                except Exception:
-                                    pass
-                        # Delete the log file
-                        os.remove(fpath)
-                        deleted_logs += 1
-                    except Exception:
-                        pass
-        if deleted_logs > 0:
-            request.session["success_message"] = f"Berhasil menghapus {deleted_logs} log upload dan {deleted_checkups} data checkup terkait."
+        from core import upload_ledger
+        from core.query_budget import query_budget
+
+        with query_budget(14, name="purge_upload_logs"):
+            result = upload_ledger.rollback(kind=upload_ledger.CHECKUPS)
+        if result["batches"] > 0:
+            request.session["success_message"] = f"Berhasil menghapus {result['batches']} log upload dan {result['checkups']} data checkup terkait."
         else:
             request.session["error_message"] = "Tidak ada log untuk dihapus."
     except Exception as e:
@@ -1120,9 +945,10 @@ def manage_karyawan_uid(request):
         'nama': request.GET.get('nama', '').strip(),
     }
 
-    # Apply filter by nama (case-insensitive contains)
+    # Apply filter by nama (case-insensitive contains, via the employee search index)
     if hasattr(df, 'empty') and not df.empty and filters['nama']:
-        df = df[df['nama'].str.contains(filters['nama'], case=False, na=False)]
+        from core import employee_search
+        df = employee_search.filter_by_nama(df, filters['nama'])
 
     # Ensure required columns exist
     if hasattr(df, 'empty') and not df.empty:
@@ -1148,15 +974,17 @@ def manage_karyawan_uid(request):
     df_page = df.iloc[start_index:end_index]
     employees = df_page[['uid', 'nama', 'jabatan', 'lokasi']].to_dict('records')
 
-    # Build name options for selector (uid + "nama — jabatan") from full filtered dataset
+    # Selector renders only the applied nama; other names come from the typeahead endpoint
     name_options = []
-    if hasattr(df, 'empty') and not df.empty:
+    if filters['nama'] and hasattr(df, 'empty') and not df.empty:
         try:
-            opts_df = df[['uid', 'nama', 'jabatan']].drop_duplicates(subset=['uid'])
-            name_options = [
-                {'uid': row['uid'], 'nama': row['nama'], 'label': f"{row['nama']} — {row['jabatan']}"}
-                for _, row in opts_df.iterrows()
-            ]
+            # data-uid drives "Hapus Data Karyawan", so only an exact nama match carries one
+            exact = df[df['nama'].astype(str).str.lower() == filters['nama'].lower()]
+            if not exact.empty:
+                row = exact.iloc[0]
+                name_options = [{'uid': row['uid'], 'nama': filters['nama'], 'label': f"{row['nama']} — {row['jabatan']}"}]
+            else:
+                name_options = [{'uid': '', 'nama': filters['nama'], 'label': filters['nama']}]
         except Exception:
             name_options = []
 
@@ -1167,7 +995,7 @@ def manage_karyawan_uid(request):
     except Exception:
         upload_history = []
 
-    # Normalize timestamp and inserted_ids for template usage (limit IDs preview to 5)
+    # Normalize timestamp and id ranges for template usage (limit preview to 5 ranges)
     try:
         for row in upload_history:
             ts = row.get("timestamp")
@@ -1176,12 +1004,10 @@ def manage_karyawan_uid(request):
                     row["timestamp"] = datetime.fromisoformat(ts.replace("Z", "+00:00"))
                 except Exception:
                     pass
-            ids = row.get("inserted_ids")
-            if isinstance(ids, list):
-                str_ids = [str(x) for x in ids]
-                row["inserted_ids"] = str_ids
-                row["inserted_ids_preview"] = str_ids[:5]
-                row["inserted_ids_more_count"] = max(0, len(str_ids) - 5)
+            ranges = row.get("id_ranges")
+            if isinstance(ranges, list):
+                row["id_ranges_preview"] = ranges[:5]
+                row["id_ranges_more_count"] = max(0, len(ranges) - 5)
     except Exception:
         pass
 
@@ -1354,7 +1180,7 @@ def employee_profile(request, uid):
         target_id = (request.POST.get("checkup_id") or "").strip()
         if action == "edit_row" and target_id:
             try:
-                from core.core_models import Checkup
+                from core.queries import update_checkup
                 # Parse incoming fields; update only provided ones
                 def _to_float(v):
                     try:
@@ -1396,7 +1222,7 @@ def employee_profile(request, uid):
                     if val is not None:
                         update_fields[key] = val
                 if update_fields:
-                    Checkup.objects.filter(checkup_id=target_id).update(**update_fields)
+                    update_checkup(target_id, **update_fields)
                     request.session['success_message'] = "Baris riwayat checkup berhasil diperbarui."
                     # Log manual edit to checkup
                     actor = request.session.get("username") or getattr(request.user, "username", None)
@@ -1411,8 +1237,8 @@ def employee_profile(request, uid):
                 request.session['error_message'] = f"Gagal menyimpan perubahan: {e}"
         elif action == "delete_all_checkups":
             try:
-                from core.core_models import Checkup
-                deleted_count, _ = Checkup.objects.filter(uid_id=uid).delete()
+                from core.queries import delete_checkups
+                deleted_count = delete_checkups(uid=uid)
                 request.session['success_message'] = f"Berhasil menghapus semua data checkup untuk karyawan ini ({deleted_count} baris)."
             except Exception as e:
                 request.session['error_message'] = f"Gagal menghapus semua data checkup: {e}"
@@ -1503,12 +1329,10 @@ def employee_profile(request, uid):
             request.session['error_message'] = f"Gagal menyimpan perubahan: {e}"
         return redirect(reverse("manager:edit_karyawan", kwargs={'uid': uid}) + "?submenu=data_karyawan&subtab=edit_data")
 
-    # Load employees list for selector
+    # Selector renders only the current employee; the rest comes from the typeahead endpoint
+    from core import employee_search
     employees_df = get_employees()
-    if employees_df is None or employees_df.empty:
-        employees = []
-    else:
-        employees = employees_df[["uid", "nama"]].to_dict("records")
+    employees = [e for e in [employee_search.get_employee(uid)] if e]
 
     # Get selected employee details (sanitized)
     employee_raw = get_employee_by_uid(uid)
@@ -1821,6 +1645,8 @@ def employee_profile(request, uid):
                     return pd.NA
             td_systolic = df_ts['tekanan_darah'].apply(_parse_systolic) if 'tekanan_darah' in df_ts.columns else pd.Series([], dtype='float64')
 
+            import plotly.graph_objects as go
+            import plotly.io as pio
             fig = go.Figure()
             if not x_vals.empty:
                 if gdp is not None and not gdp.empty:
@@ -1906,8 +1732,7 @@ def add_karyawan(request):
 
     if not nama or not jabatan or not validate_lokasi(lokasi):
         request.session['error_message'] = "Mohon isi Nama, Jabatan, dan Lokasi dengan benar."
-        employees_df = get_employees()
-        default_uid = str(employees_df.iloc[0]['uid']) if employees_df is not None and not employees_df.empty else None
+        default_uid = get_default_employee_uid()
         if default_uid:
             return redirect(reverse("manager:edit_karyawan", kwargs={'uid': default_uid}) + "?submenu=data_karyawan&subtab=tambah")
         return redirect(reverse("manager:dashboard"))
@@ -1927,12 +1752,13 @@ def add_karyawan(request):
             lokasi=lokasi,
             tanggal_lahir=tanggal_lahir,
         )
+        from core import data_version
+        data_version.bump(data_version.KARYAWAN)
         request.session['success_message'] = f"Karyawan '{nama}' berhasil ditambahkan. UID: {uid}"
         return redirect(reverse("manager:edit_karyawan", kwargs={'uid': uid}) + "?submenu=data_karyawan&subtab=profile")
     except Exception as e:
         request.session['error_message'] = f"Gagal menambahkan karyawan: {e}"
-        employees_df = get_employees()
-        default_uid = str(employees_df.iloc[0]['uid']) if employees_df is not None and not employees_df.empty else None
+        default_uid = get_default_employee_uid()
         if default_uid:
             return redirect(reverse("manager:edit_karyawan", kwargs={'uid': default_uid}) + "?submenu=data_karyawan&subtab=tambah")
         return redirect(reverse("manager:dashboard"))
@@ -2035,6 +1861,7 @@ def save_medical_checkup(request, uid):
     return redirect(reverse("manager:edit_karyawan", kwargs={"uid": uid}) + "?submenu=data_karyawan&subtab=profile")
 
 @require_http_methods(["GET"]) 
+@replica_reads
 def export_checkup_data_excel(request):
     # Auth guard for Manager
     if not request.session.get("authenticated") or request.session.get("user_role") != "Manager":
@@ -2054,41 +1881,29 @@ def export_checkup_data_excel(request):
         if start_month and end_month:
             try:
                 import pandas as _pd
-                hist = load_checkups()
-                if hist is not None and hasattr(hist, 'empty') and not hist.empty:
-                    # Parse and filter
-                    if 'tanggal_checkup' in hist.columns:
-                        hist['tanggal_checkup'] = _pd.to_datetime(hist['tanggal_checkup'], errors='coerce', dayfirst=True)
+                start_dt = _pd.to_datetime(start_month + '-01', errors='coerce')
+                end_dt = _pd.to_datetime(end_month + '-01', errors='coerce')
+                end_dt_end = (end_dt + _pd.offsets.MonthBegin(1)) - _pd.Timedelta(days=1) if _pd.notnull(end_dt) else end_dt
+                # Streamed in chunks: only the latest in-range row per employee is kept in memory
+                latest_in_range = get_latest_checkups_in_range(
+                    start_dt.date() if _pd.notnull(start_dt) else None,
+                    end_dt_end.date() if _pd.notnull(end_dt_end) else None,
+                )
+                if not latest_in_range.empty:
+                    latest_in_range['tanggal_checkup'] = _pd.to_datetime(latest_in_range['tanggal_checkup'], errors='coerce')
                     try:
-                        if 'status' not in hist.columns or hist['status'].isna().any():
-                            hist['status'] = hist.apply(compute_status, axis=1)
+                        latest_in_range['status'] = latest_in_range.apply(compute_status, axis=1)
                     except Exception:
-                        hist['status'] = hist.get('status', '')
-                    start_dt = _pd.to_datetime(start_month + '-01', errors='coerce')
-                    end_dt = _pd.to_datetime(end_month + '-01', errors='coerce')
-                    end_dt_end = (end_dt + _pd.offsets.MonthBegin(1)) - _pd.Timedelta(days=1) if _pd.notnull(end_dt) else end_dt
-                    if _pd.notnull(start_dt):
-                        hist = hist[hist['tanggal_checkup'] >= start_dt]
-                    if _pd.notnull(end_dt_end):
-                        hist = hist[hist['tanggal_checkup'] <= end_dt_end]
-                    if not hist.empty and 'uid' in hist.columns:
-                        hist = hist.sort_values(by=['uid','tanggal_checkup'])
-                        latest_in_range = hist.groupby('uid').tail(1).set_index('uid')
-                        check_cols = [
-                            'tanggal_checkup','tinggi','berat','lingkar_perut','bmi','umur',
-                            'gula_darah_puasa','gula_darah_sewaktu','cholesterol','asam_urat',
-                            'tekanan_darah','derajat_kesehatan','status','tanggal_MCU','expired_MCU','bmi_category'
-                        ]
-                        for col in check_cols:
-                            if col not in df.columns:
-                                df[col] = None
-                        df[check_cols] = None
-                        for uid, row in latest_in_range.iterrows():
-                            idxs = df.index[df['uid'].astype(str) == str(uid)].tolist()
-                            for idx in idxs:
-                                for col in check_cols:
-                                    if col in latest_in_range.columns:
-                                        df.at[idx, col] = row.get(col, None)
+                        latest_in_range['status'] = ''
+                    latest_in_range = latest_in_range.set_index(latest_in_range['uid'].astype(str))
+                    check_cols = [
+                        'tanggal_checkup','tinggi','berat','lingkar_perut','bmi','umur',
+                        'gula_darah_puasa','gula_darah_sewaktu','cholesterol','asam_urat',
+                        'tekanan_darah','derajat_kesehatan','status','tanggal_MCU','expired_MCU','bmi_category'
+                    ]
+                    uids = df['uid'].astype(str)
+                    for col in check_cols:
+                        df[col] = uids.map(latest_in_range[col]) if col in latest_in_range.columns else None
             except Exception:
                 # If filter fails, fallback to latest
                 df = df_latest.copy()
@@ -2106,6 +1921,7 @@ def export_checkup_data_excel(request):
         return redirect(reverse("manager:upload_export") + "?submenu=export_data")
 
 @require_http_methods(["GET"]) 
+@replica_reads
 def export_master_karyawan_excel(request):
     """Export master karyawan data to Excel (schema matches uploaded master XLS)."""
     # Auth guard for Manager
@@ -2154,6 +1970,7 @@ def export_master_karyawan_excel(request):
         return redirect(reverse("manager:upload_export") + "?submenu=export_data")
 
 @require_http_methods(["GET"])
+@replica_reads
 def export_checkup_history_by_uid(request, uid):
     """Export the CURRENT displayed history medical checkup DataFrame (no new computation) for the specified UID."""
     if not request.session.get("authenticated") or request.session.get("user_role") != "Manager":
@@ -2164,9 +1981,8 @@ def export_checkup_history_by_uid(request, uid):
             request.session['error_message'] = f"UID {uid} tidak ditemukan."
             return redirect(reverse("manager:edit_karyawan", kwargs={"uid": uid}) + "?submenu=history")
 
-        # Load raw checkups for UID
-        checkups = get_medical_checkups_by_uid(uid)
-        if checkups is None or checkups.empty:
+        from core.core_models import Checkup
+        if not Checkup.objects.filter(uid_id=str(uid)).exists():
             request.session['warning_message'] = "Tidak ada data checkup untuk UID ini."
             return redirect(reverse("manager:edit_karyawan", kwargs={"uid": uid}) + "?submenu=history")
 
@@ -2181,13 +1997,6 @@ def export_checkup_history_by_uid(request, uid):
             except Exception:
                 pass
 
-        df_hist2 = checkups.copy()
-        if "uid_id" in df_hist2.columns and "uid" not in df_hist2.columns:
-            df_hist2 = df_hist2.rename(columns={"uid_id": "uid"})
-        if "tanggal_checkup" in df_hist2.columns:
-            df_hist2["tanggal_checkup"] = pd.to_datetime(df_hist2["tanggal_checkup"], errors="coerce")
-        df_hist2 = df_hist2.sort_values("tanggal_checkup", ascending=False)
-
         emp_nama = (employee_clean or {}).get('nama')
         emp_jabatan = (employee_clean or {}).get('jabatan')
         emp_lokasi = (employee_clean or {}).get('lokasi')
@@ -2222,81 +2031,85 @@ def export_checkup_history_by_uid(request, uid):
         except Exception:
             emp_bmi = None
 
-        rows = []
-        for _, row in df_hist2.iterrows():
-            tinggi_n = pd.to_numeric(row.get('tinggi', None), errors='coerce')
-            berat_n = pd.to_numeric(row.get('berat', None), errors='coerce')
-            bmi_n = pd.to_numeric(row.get('bmi', None), errors='coerce')
-            # BMI fallback: no autocalc; use employee BMI if row BMI missing/zero
-            try:
-                if ((bmi_n is None) or (isinstance(bmi_n, float) and pd.isna(bmi_n)) or (float(bmi_n) == 0.0)) and pd.notna(emp_bmi):
-                    bmi_n = float(emp_bmi)
-            except Exception:
-                pass
-            lp_n = pd.to_numeric(row.get('lingkar_perut', None), errors='coerce')
-            gdp_n = pd.to_numeric(row.get('gula_darah_puasa', None), errors='coerce')
-            gds_n = pd.to_numeric(row.get('gula_darah_sewaktu', None), errors='coerce')
-            chol_n = pd.to_numeric(row.get('cholesterol', None), errors='coerce')
-            asam_n = pd.to_numeric(row.get('asam_urat', None), errors='coerce')
-            tc_dt = pd.to_datetime(row.get('tanggal_checkup'), errors='coerce')
-            tanggal_str = tc_dt.strftime('%d/%m/%y') if pd.notna(tc_dt) else None
-
-            # Status (match UI)
-            status_val = compute_status({
-                'gula_darah_puasa': gdp_n if pd.notna(gdp_n) else 0,
-                'gula_darah_sewaktu': gds_n if pd.notna(gds_n) else 0,
-                'cholesterol': chol_n if pd.notna(chol_n) else 0,
-                'asam_urat': asam_n if pd.notna(asam_n) else 0,
-                'bmi': bmi_n if pd.notna(bmi_n) else 0,
-            })
+        columns_order = [
+            'UID','Nama','Jabatan','Lokasi','Tanggal Lahir','Umur','BMI','BMI Category','Tanggal Checkup','Lingkar Perut','Gula Darah Puasa','Gula Darah Sewaktu','Cholesterol','Asam Urat','Tekanan Darah','Derajat Kesehatan','Tanggal MCU','Expired MCU','Status'
+        ]
 
-            # Derajat Kesehatan with fallback
-            dk_val = row.get('derajat_kesehatan', None)
-            try:
-                if dk_val is None or (isinstance(dk_val, float) and pd.isna(dk_val)) or (isinstance(dk_val, str) and not dk_val.strip()):
-                    dk_val = (employee_clean or {}).get('derajat_kesehatan')
-            except Exception:
-                pass
+        # Rows are built and written one chunk at a time (server-side cursor on PostgreSQL)
+        def _export_rows(chunk):
+            rows = []
+            for _, row in chunk.iterrows():
+                tinggi_n = pd.to_numeric(row.get('tinggi', None), errors='coerce')
+                berat_n = pd.to_numeric(row.get('berat', None), errors='coerce')
+                bmi_n = pd.to_numeric(row.get('bmi', None), errors='coerce')
+                # BMI fallback: no autocalc; use employee BMI if row BMI missing/zero
+                try:
+                    if ((bmi_n is None) or (isinstance(bmi_n, float) and pd.isna(bmi_n)) or (float(bmi_n) == 0.0)) and pd.notna(emp_bmi):
+                        bmi_n = float(emp_bmi)
+                except Exception:
+                    pass
+                lp_n = pd.to_numeric(row.get('lingkar_perut', None), errors='coerce')
+                gdp_n = pd.to_numeric(row.get('gula_darah_puasa', None), errors='coerce')
+                gds_n = pd.to_numeric(row.get('gula_darah_sewaktu', None), errors='coerce')
+                chol_n = pd.to_numeric(row.get('cholesterol', None), errors='coerce')
+                asam_n = pd.to_numeric(row.get('asam_urat', None), errors='coerce')
+                tc_dt = pd.to_datetime(row.get('tanggal_checkup'), errors='coerce')
+                tanggal_str = tc_dt.strftime('%d/%m/%y') if pd.notna(tc_dt) else None
 
-            # BMI Category: prefer row, fallback to employee, else compute from BMI
-            bmi_cat_val = row.get('bmi_category', None)
-            def _is_blank(x):
-                return (x is None) or (isinstance(x, float) and pd.isna(x)) or (isinstance(x, str) and not str(x).strip())
-            if _is_blank(bmi_cat_val):
-                bmi_cat_val = (employee_clean or {}).get('bmi_category', None)
-            if _is_blank(bmi_cat_val):
-                bmi_source = bmi_n if pd.notna(bmi_n) else (emp_bmi if pd.notna(emp_bmi) else None)
-                bmi_cat_val = compute_bmi_category(bmi_source)
+                # Status (match UI)
+                status_val = compute_status({
+                    'gula_darah_puasa': gdp_n if pd.notna(gdp_n) else 0,
+                    'gula_darah_sewaktu': gds_n if pd.notna(gds_n) else 0,
+                    'cholesterol': chol_n if pd.notna(chol_n) else 0,
+                    'asam_urat': asam_n if pd.notna(asam_n) else 0,
+                    'bmi': bmi_n if pd.notna(bmi_n) else 0,
+                })
 
-            rows.append({
-                'UID': str(row.get('uid', uid)),
-                'Nama': emp_nama,
-                'Jabatan': emp_jabatan,
-                'Lokasi': emp_lokasi,
-                'Tanggal Lahir': emp_tanggal_lahir,
-                'Umur': int(umur_val) if pd.notna(pd.to_numeric(umur_val, errors='coerce')) else None,
-                'BMI': float(bmi_n) if pd.notna(bmi_n) and float(bmi_n) != 0.0 else None,
-                'BMI Category': str(bmi_cat_val) if bmi_cat_val is not None else None,
-                'Tanggal Checkup': tanggal_str,
-                'Lingkar Perut': float(lp_n) if pd.notna(lp_n) else None,
-                'Gula Darah Puasa': float(gdp_n) if pd.notna(gdp_n) else None,
-                'Gula Darah Sewaktu': float(gds_n) if pd.notna(gds_n) else None,
-                'Cholesterol': float(chol_n) if pd.notna(chol_n) else None,
-                'Asam Urat': float(asam_n) if pd.notna(asam_n) else None,
-                'Tekanan Darah': row.get('tekanan_darah', None),
-                'Derajat Kesehatan': str(dk_val) if dk_val is not None else None,
-                'Tanggal MCU': emp_tanggal_mcu,
-                'Expired MCU': emp_expired_mcu,
-                'Status': status_val,
-            })
+                # Derajat Kesehatan with fallback
+                dk_val = row.get('derajat_kesehatan', None)
+                try:
+                    if dk_val is None or (isinstance(dk_val, float) and pd.isna(dk_val)) or (isinstance(dk_val, str) and not dk_val.strip()):
+                        dk_val = (employee_clean or {}).get('derajat_kesehatan')
+                except Exception:
+                    pass
 
-        import pandas as _pd
-        df_export = _pd.DataFrame(rows)
-        columns_order = [
-            'UID','Nama','Jabatan','Lokasi','Tanggal Lahir','Umur','BMI','BMI Category','Tanggal Checkup','Lingkar Perut','Gula Darah Puasa','Gula Darah Sewaktu','Cholesterol','Asam Urat','Tekanan Darah','Derajat Kesehatan','Tanggal MCU','Expired MCU','Status'
-        ]
+                # BMI Category: prefer row, fallback to employee, else compute from BMI
+                bmi_cat_val = row.get('bmi_category', None)
+                def _is_blank(x):
+                    return (x is None) or (isinstance(x, float) and pd.isna(x)) or (isinstance(x, str) and not str(x).strip())
+                if _is_blank(bmi_cat_val):
+                    bmi_cat_val = (employee_clean or {}).get('bmi_category', None)
+                if _is_blank(bmi_cat_val):
+                    bmi_source = bmi_n if pd.notna(bmi_n) else (emp_bmi if pd.notna(emp_bmi) else None)
+                    bmi_cat_val = compute_bmi_category(bmi_source)
+
+                rows.append({
+                    'UID': str(row.get('uid', uid)),
+                    'Nama': emp_nama,
+                    'Jabatan': emp_jabatan,
+                    'Lokasi': emp_lokasi,
+                    'Tanggal Lahir': emp_tanggal_lahir,
+                    'Umur': int(umur_val) if pd.notna(pd.to_numeric(umur_val, errors='coerce')) else None,
+                    'BMI': float(bmi_n) if pd.notna(bmi_n) and float(bmi_n) != 0.0 else None,
+                    'BMI Category': str(bmi_cat_val) if bmi_cat_val is not None else None,
+                    'Tanggal Checkup': tanggal_str,
+                    'Lingkar Perut': float(lp_n) if pd.notna(lp_n) else None,
+                    'Gula Darah Puasa': float(gdp_n) if pd.notna(gdp_n) else None,
+                    'Gula Darah Sewaktu': float(gds_n) if pd.notna(gds_n) else None,
+                    'Cholesterol': float(chol_n) if pd.notna(chol_n) else None,
+                    'Asam Urat': float(asam_n) if pd.notna(asam_n) else None,
+                    'Tekanan Darah': row.get('tekanan_darah', None),
+                    'Derajat Kesehatan': str(dk_val) if dk_val is not None else None,
+                    'Tanggal MCU': emp_tanggal_mcu,
+                    'Expired MCU': emp_expired_mcu,
+                    'Status': status_val,
+                })
+            return pd.DataFrame(rows, columns=columns_order)
 
-        excel_bytes = build_checkup_excel(df_export, enrich=False, columns=columns_order)
+        excel_bytes = export_checkup_frames_excel(
+            (_export_rows(chunk) for chunk in iter_checkups(uid=uid)),
+            columns=columns_order,
+        )
         filename = f"checkup_history_{uid}.xlsx"
         response = HttpResponse(excel_bytes, content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
         response["Content-Disposition"] = f"attachment; filename={filename}"
@@ -2306,6 +2119,7 @@ def export_checkup_history_by_uid(request, uid):
         return redirect(reverse("manager:edit_karyawan", kwargs={"uid": uid}) + "?submenu=history")
 
 @require_http_methods(["GET"])
+@replica_reads
 def export_checkup_row(request, uid, checkup_id):
     """Export a single medical checkup row for the specified UID, restricting to visible columns (no gestational_diabetes)."""
     if not request.session.get("authenticated") or request.session.get("user_role") != "Manager":
@@ -2421,6 +2235,7 @@ def export_checkup_row(request, uid, checkup_id):
         return redirect(reverse("manager:edit_karyawan", kwargs={"uid": uid}) + "?submenu=history")
 
 @require_http_methods(["GET"])
+@replica_reads
 def export_checkup_history_by_uid_pdf(request, uid):
     """Export the CURRENT displayed history medical checkup DataFrame for the specified UID as PDF, with vertical/portrait layout."""
     if not request.session.get("authenticated") or request.session.get("user_role") != "Manager":
@@ -2431,8 +2246,8 @@ def export_checkup_history_by_uid_pdf(request, uid):
             request.session['error_message'] = f"UID {uid} tidak ditemukan."
             return redirect(reverse("manager:edit_karyawan", kwargs={"uid": uid}) + "?submenu=history")
 
-        checkups = get_medical_checkups_by_uid(uid)
-        if checkups is None or checkups.empty:
+        from core.core_models import Checkup
+        if not Checkup.objects.filter(uid_id=str(uid)).exists():
             request.session['warning_message'] = "Tidak ada data checkup untuk UID ini."
             return redirect(reverse("manager:edit_karyawan", kwargs={"uid": uid}) + "?submenu=history")
 
@@ -2446,13 +2261,6 @@ def export_checkup_history_by_uid_pdf(request, uid):
             except Exception:
                 pass
 
-        df_hist2 = checkups.copy()
-        if "uid_id" in df_hist2.columns and "uid" not in df_hist2.columns:
-            df_hist2 = df_hist2.rename(columns={"uid_id": "uid"})
-        if "tanggal_checkup" in df_hist2.columns:
-            df_hist2["tanggal_checkup"] = pd.to_datetime(df_hist2["tanggal_checkup"], errors="coerce")
-        df_hist2 = df_hist2.sort_values("tanggal_checkup", ascending=False)
-
         emp_nama = (employee_clean or {}).get('nama')
         emp_jabatan = (employee_clean or {}).get('jabatan')
         emp_lokasi = (employee_clean or {}).get('lokasi')
@@ -2484,61 +2292,63 @@ def export_checkup_history_by_uid_pdf(request, uid):
         except Exception:
             emp_bmi = None
 
+        # Raw checkups are read in chunks; only the formatted export rows are kept for the PDF
         rows = []
-        for _, row in df_hist2.iterrows():
-            bmi_n = pd.to_numeric(row.get('bmi', None), errors='coerce')
-            # BMI fallback: no autocalc; use employee BMI if row BMI missing/zero
-            try:
-                if ((bmi_n is None) or (isinstance(bmi_n, float) and pd.isna(bmi_n)) or (float(bmi_n) == 0.0)) and pd.notna(emp_bmi):
-                    bmi_n = float(emp_bmi)
-            except Exception:
-                pass
-            lp_n = pd.to_numeric(row.get('lingkar_perut', None), errors='coerce')
-            gdp_n = pd.to_numeric(row.get('gula_darah_puasa', None), errors='coerce')
-            gds_n = pd.to_numeric(row.get('gula_darah_sewaktu', None), errors='coerce')
-            chol_n = pd.to_numeric(row.get('cholesterol', None), errors='coerce')
-            asam_n = pd.to_numeric(row.get('asam_urat', None), errors='coerce')
-            tc_dt = pd.to_datetime(row.get('tanggal_checkup'), errors='coerce')
-            tanggal_str = tc_dt.strftime('%d/%m/%y') if pd.notna(tc_dt) else None
-
-            status_val = compute_status({
-                'gula_darah_puasa': gdp_n if pd.notna(gdp_n) else 0,
-                'gula_darah_sewaktu': gds_n if pd.notna(gds_n) else 0,
-                'cholesterol': chol_n if pd.notna(chol_n) else 0,
-                'asam_urat': asam_n if pd.notna(asam_n) else 0,
-                'bmi': bmi_n if pd.notna(bmi_n) else 0,
-            })
+        for chunk in iter_checkups(uid=uid):
+            for _, row in chunk.iterrows():
+                bmi_n = pd.to_numeric(row.get('bmi', None), errors='coerce')
+                # BMI fallback: no autocalc; use employee BMI if row BMI missing/zero
+                try:
+                    if ((bmi_n is None) or (isinstance(bmi_n, float) and pd.isna(bmi_n)) or (float(bmi_n) == 0.0)) and pd.notna(emp_bmi):
+                        bmi_n = float(emp_bmi)
+                except Exception:
+                    pass
+                lp_n = pd.to_numeric(row.get('lingkar_perut', None), errors='coerce')
+                gdp_n = pd.to_numeric(row.get('gula_darah_puasa', None), errors='coerce')
+                gds_n = pd.to_numeric(row.get('gula_darah_sewaktu', None), errors='coerce')
+                chol_n = pd.to_numeric(row.get('cholesterol', None), errors='coerce')
+                asam_n = pd.to_numeric(row.get('asam_urat', None), errors='coerce')
+                tc_dt = pd.to_datetime(row.get('tanggal_checkup'), errors='coerce')
+                tanggal_str = tc_dt.strftime('%d/%m/%y') if pd.notna(tc_dt) else None
 
-            bmi_cat_val = row.get('bmi_category', None)
-            def _is_blank(x):
-                return (x is None) or (isinstance(x, float) and pd.isna(x)) or (isinstance(x, str) and not str(x).strip())
-            if _is_blank(bmi_cat_val):
-                bmi_cat_val = (employee_clean or {}).get('bmi_category', None)
-            if _is_blank(bmi_cat_val):
-                bmi_source = bmi_n if pd.notna(bmi_n) else (emp_bmi if pd.notna(emp_bmi) else None)
-                bmi_cat_val = compute_bmi_category(bmi_source)
+                status_val = compute_status({
+                    'gula_darah_puasa': gdp_n if pd.notna(gdp_n) else 0,
+                    'gula_darah_sewaktu': gds_n if pd.notna(gds_n) else 0,
+                    'cholesterol': chol_n if pd.notna(chol_n) else 0,
+                    'asam_urat': asam_n if pd.notna(asam_n) else 0,
+                    'bmi': bmi_n if pd.notna(bmi_n) else 0,
+                })
 
-            rows.append({
-                'UID': str(row.get('uid', uid)),
-                'Nama': emp_nama,
-                'Jabatan': emp_jabatan,
-                'Lokasi': emp_lokasi,
-                'Tanggal Lahir': emp_tanggal_lahir,
-                'Umur': int(umur_val) if pd.notna(pd.to_numeric(umur_val, errors='coerce')) else None,
-                'BMI': float(bmi_n) if pd.notna(bmi_n) and float(bmi_n) != 0.0 else None,
-                'BMI Category': str(bmi_cat_val) if bmi_cat_val is not None else None,
-                'Tanggal Checkup': tanggal_str,
-                'Lingkar Perut': float(lp_n) if pd.notna(lp_n) else None,
-                'Gula Darah Puasa': float(gdp_n) if pd.notna(gdp_n) else None,
-                'Gula Darah Sewaktu': float(gds_n) if pd.notna(gds_n) else None,
-                'Cholesterol': float(chol_n) if pd.notna(chol_n) else None,
-                'Asam Urat': float(asam_n) if pd.notna(asam_n) else None,
-                'Tekanan Darah': row.get('tekanan_darah', None),
-                'Derajat Kesehatan': row.get('derajat_kesehatan', None) or (employee_clean or {}).get('derajat_kesehatan', None),
-                'Tanggal MCU': emp_tanggal_mcu,
-                'Expired MCU': emp_expired_mcu,
-                'Status': status_val,
-            })
+                bmi_cat_val = row.get('bmi_category', None)
+                def _is_blank(x):
+                    return (x is None) or (isinstance(x, float) and pd.isna(x)) or (isinstance(x, str) and not str(x).strip())
+                if _is_blank(bmi_cat_val):
+                    bmi_cat_val = (employee_clean or {}).get('bmi_category', None)
+                if _is_blank(bmi_cat_val):
+                    bmi_source = bmi_n if pd.notna(bmi_n) else (emp_bmi if pd.notna(emp_bmi) else None)
+                    bmi_cat_val = compute_bmi_category(bmi_source)
+
+                rows.append({
+                    'UID': str(row.get('uid', uid)),
+                    'Nama': emp_nama,
+                    'Jabatan': emp_jabatan,
+                    'Lokasi': emp_lokasi,
+                    'Tanggal Lahir': emp_tanggal_lahir,
+                    'Umur': int(umur_val) if pd.notna(pd.to_numeric(umur_val, errors='coerce')) else None,
+                    'BMI': float(bmi_n) if pd.notna(bmi_n) and float(bmi_n) != 0.0 else None,
+                    'BMI Category': str(bmi_cat_val) if bmi_cat_val is not None else None,
+                    'Tanggal Checkup': tanggal_str,
+                    'Lingkar Perut': float(lp_n) if pd.notna(lp_n) else None,
+                    'Gula Darah Puasa': float(gdp_n) if pd.notna(gdp_n) else None,
+                    'Gula Darah Sewaktu': float(gds_n) if pd.notna(gds_n) else None,
+                    'Cholesterol': float(chol_n) if pd.notna(chol_n) else None,
+                    'Asam Urat': float(asam_n) if pd.notna(asam_n) else None,
+                    'Tekanan Darah': row.get('tekanan_darah', None),
+                    'Derajat Kesehatan': row.get('derajat_kesehatan', None) or (employee_clean or {}).get('derajat_kesehatan', None),
+                    'Tanggal MCU': emp_tanggal_mcu,
+                    'Expired MCU': emp_expired_mcu,
+                    'Status': status_val,
+                })
 
         import pandas as _pd
         df_export = _pd.DataFrame(rows)
@@ -2564,6 +2374,7 @@ def export_checkup_history_by_uid_pdf(request, uid):
         return redirect(reverse("manager:edit_karyawan", kwargs={"uid": uid}) + "?submenu=history")
 
 @require_http_methods(["GET"])
+@replica_reads
 def export_checkup_row_pdf(request, uid, checkup_id):
     """Export a single medical checkup row for the specified UID as PDF, restricting to visible columns (no gestational_diabetes)."""
     if not request.session.get("authenticated") or request.session.get("user_role") != "Manager":
@@ -2711,7 +2522,6 @@ from core.queries import (
     reset_user_password as core_reset_user_password,
     get_user_by_username,
     change_username as core_change_username,
-    write_checkup_upload_log,
     get_checkup_upload_history,
 )
 
@@ -2720,6 +2530,8 @@ from core.helpers import (
     sanitize_df_for_display,
     get_dashboard_checkup_data,
     get_active_menu_for_view,
+    get_default_employee_uid,
+    get_menu_items,
     compute_bmi_category,
 )
 from core import excel_parser, checkup_uploader
@@ -2965,24 +2777,15 @@ def dashboard(request):
     }
 
     # Apply filters
-    # [DEBUG] Data count before applying filters (including lokasi)
-    try:
-        print("[DEBUG] Data count before filter:", len(df))
-    except Exception:
-        pass
     if filters['nama']:
-        df = df[df['nama'].astype(str).str.contains(filters['nama'], case=False, na=False)]
+        from core import employee_search
+        df = employee_search.filter_by_nama(df, filters['nama'])
     if filters['jabatan']:
         # Normalize filter to match jabatan_key
         filt_clean = ' '.join(filters['jabatan'].split()).strip().lower()
         df = df[df['jabatan_key'] == filt_clean]
     if filters['lokasi']:  # Filter by selected location
         df = df[df['lokasi'] == filters['lokasi']]
-    # [DEBUG] Data count after lokasi filter (or same as before when lokasi not provided)
-    try:
-        print("[DEBUG] Data count after lokasi filter:", len(df))
-    except Exception:
-        pass
     if filters['status']:  # Filter by Well/Unwell status
         df = df[df['status'] == filters['status']]
     # Date range filter removed: always showing latest checkup data
@@ -3056,22 +2859,9 @@ def dashboard(request):
     pending_reviews = 0  # Will be updated when checkup data is uploaded
 
     # Grafik filter defaults and UID options for new Grafik tab
-    # Always show all employees (not just those with checkup data) with names
-    available_employees = []
-    try:
-        # Get all employees from master data
-        df_emps = get_employees()
-        if hasattr(df_emps, 'empty') and not df_emps.empty and 'uid' in df_emps.columns and 'nama' in df_emps.columns:
-            for _, row in df_emps.iterrows():
-                uid = str(row['uid']) if pd.notna(row['uid']) else ''
-                nama = str(row['nama']) if pd.notna(row['nama']) else f'UID {uid}'
-                if uid:
-                    available_employees.append({'uid': uid, 'nama': nama})
-    except Exception:
-        pass
-    
-    # Sort by name for better UX
-    available_employees = sorted(available_employees, key=lambda x: x['nama'].lower())
+    # Only the selected employee is rendered; the select searches the rest (karyawan_search_json)
+    from core import employee_search
+    available_employees = employee_search.picker_options(request.GET.get('uid', ''))
     now2 = pd.Timestamp.now()
     default_end_month = now2.strftime('%Y-%m')
     default_start_month = (now2 - pd.offsets.DateOffset(months=5)).strftime('%Y-%m')
@@ -3104,10 +2894,12 @@ def dashboard(request):
             filename = latest.get('filename', '')
             inserted = int(latest.get('inserted', 0))
             skipped = int(latest.get('skipped_count', 0))
+            updated = int(latest.get('updated', 0) or 0)
+            counts = f"Inserted: {inserted} • Skipped: {skipped}" + (f" • Updated: {updated}" if updated else "")
             if latest_check_date_disp:
-                latest_checkup_display = f"{latest_check_date_disp} • {filename} • Inserted: {inserted} • Skipped: {skipped}"
+                latest_checkup_display = f"{latest_check_date_disp} • {filename} • {counts}"
             else:
-                latest_checkup_display = f"{ts_disp} • {filename} • Inserted: {inserted} • Skipped: {skipped}"
+                latest_checkup_display = f"{ts_disp} • {filename} • {counts}"
         else:
             latest_checkup_display = latest_check_date_disp
     except Exception:
@@ -3352,23 +3144,26 @@ def download_checkup_template(request):
 
 
 def upload_master_karyawan_xls(request):
-    # Get first employee UID for Edit Karyawan menu
-    employees_df = get_employees()
-    default_uid = str(employees_df.iloc[0]['uid']) if not employees_df.empty else None
-
-    menu_items = [
-        {"key": "dashboard", "name": "Dashboard", "url": reverse("manager:dashboard"), "icon": "chart-line"},
-        {"key": "user", "name": "User Management", "url": reverse("manager:user_management"), "icon": "users"},
-        {"key": "qr", "name": "QR Codes", "url": reverse("manager:qr_codes"), "icon": "qrcode"},
-        {"key": "data", "name": "Upload & Export", "url": reverse("manager:upload_export"), "icon": "upload"},
-        {"key": "hapus_data_karyawan", "name": "Hapus Data Karyawan", "url": reverse("manager:hapus_data_karyawan"), "icon": "database"},
-        {"key": "edit_karyawan", "name": "Edit Master Data", "url": reverse("manager:edit_karyawan", kwargs={'uid': default_uid}) if default_uid else '#', "icon": "edit"},
-    ]
+    menu_items = get_menu_items("manager")
     
     if request.method == "POST" and request.FILES.get("file"):
         try:
+            from core import data_version, upload_ledger, upload_store
+
+            # Same content against an unchanged master would only rewrite identical rows
+            uploaded_file = request.FILES["file"]
+            digest = upload_store.hash_upload(uploaded_file)
+            duplicate = upload_store.find_duplicate(upload_ledger.MASTER, digest, version=data_version.current(data_version.KARYAWAN))
+            if duplicate:
+                request.session['success_message'] = upload_store.duplicate_message(duplicate)
+                return redirect(reverse("manager:dashboard"))
             # Parse and save master karyawan data using core.excel_parser
-            result = excel_parser.parse_master_karyawan(request.FILES["file"])
+            result = excel_parser.parse_master_karyawan(uploaded_file)
+            upload_ledger.record(
+                upload_ledger.MASTER, uploaded_file.name, result,
+                sha256=digest if result.get('inserted') else None,
+                version=data_version.current(data_version.KARYAWAN),
+            )
             request.session['success_message'] = f"{result['inserted']} karyawan berhasil diupload, {result['skipped']} dilewati."
         except Exception as e:
             request.session['error_message'] = f"Upload failed: {e}"
@@ -3384,50 +3179,28 @@ def upload_medical_checkup_xls(request):
     if not request.session.get("authenticated") or request.session.get("user_role") != "Manager":
         return redirect("accounts:login")
 
-    # Get first employee UID for Edit Karyawan menu
-    employees_df = get_employees()
-    default_uid = str(employees_df.iloc[0]['uid']) if not employees_df.empty else None
-
-    menu_items = [
-        {"key": "dashboard", "name": "Dashboard", "url": reverse("manager:dashboard"), "icon": "chart-line"},
-        {"key": "user", "name": "User Management", "url": reverse("manager:user_management"), "icon": "users"},
-        {"key": "qr", "name": "QR Codes", "url": reverse("manager:qr_codes"), "icon": "qrcode"},
-        {"key": "data", "name": "Upload & Export", "url": reverse("manager:upload_export"), "icon": "upload"},
-        {"key": "hapus_data_karyawan", "name": "Hapus Data Karyawan", "url": reverse("manager:hapus_data_karyawan"), "icon": "database"},
-        {"key": "edit_karyawan", "name": "Edit Master Data", "url": reverse("manager:edit_karyawan", kwargs={'uid': default_uid}) if default_uid else '#', "icon": "edit"},
-    ]
+    menu_items = get_menu_items("manager")
     
     if request.method == "POST" and request.FILES.get("file"):
         try:
-            uploaded_file = request.FILES["file"]
-            os.makedirs(settings.UPLOAD_CHECKUPS_DIR, exist_ok=True)
-            ts = datetime.now().strftime("%Y%m%d-%H%M%S")
-            original_name = os.path.basename(uploaded_file.name)
-            save_path = os.path.join(settings.UPLOAD_CHECKUPS_DIR, f"{ts}-{original_name}")
-            with open(save_path, "wb+") as dest:
-                for chunk in uploaded_file.chunks():
-                    dest.write(chunk)
-
-            # Decide parser based on anthropometric columns presence (check aliases across all sheets)
-            all_sheets = pd.read_excel(save_path, sheet_name=None, dtype=str)
-            union_cols = set()
-            for _df in (all_sheets.values() if all_sheets else []):
-                try:
-                    _norm = {str(c).strip().lower().replace(' ', '_') for c in getattr(_df, 'columns', [])}
-                    union_cols |= _norm
-                except Exception:
-                    continue
-            keys = ['tinggi', 'berat', 'bmi', 'height', 'weight', 'imt']
-            has_anthro = any(any(k in col for k in keys) for col in union_cols)
-            if has_anthro:
-                result = excel_parser.parse_checkup_anthropometric(save_path)
-            else:
-                result = checkup_uploader.parse_checkup_xls(save_path)
-            # Write log entry for this upload
-            write_checkup_upload_log(original_name, result)
+            from core import upload_store
+
+            def _parse(save_path):
+                # Workbook or CSV/TSV/NDJSON; the anthropometric parser when the headers have tinggi/berat/bmi
+                return checkup_uploader.parse_checkup_file(save_path, anthropometric=None)
+
+            # Stored + hashed in one pass; an identical file is not parsed or logged again
+            result, duplicate = upload_store.ingest_checkups(request.FILES["file"], _parse)
+            if duplicate:
+                request.session['success_message'] = upload_store.duplicate_message(duplicate)
+                return redirect(reverse("manager:dashboard"))
             inserted = int(result.get('inserted', 0)) if isinstance(result, dict) else 0
+            updated = int(result.get('updated', 0)) if isinstance(result, dict) else 0
             skipped = len(result.get('skipped', [])) if isinstance(result, dict) else 0
-            request.session['success_message'] = f"Excel berhasil di upload! {inserted} checkup disimpan, {skipped} baris dilewati."
+            request.session['success_message'] = (
+                f"File berhasil di upload! {inserted} checkup disimpan, {updated} diperbarui, {skipped} baris dilewati."
+                + upload_store.chunk_note(result)
+            )
         except Exception as e:
             request.session['error_message'] = f"Upload failed: {e}"
         return redirect(reverse("manager:dashboard"))
@@ -3457,9 +3230,10 @@ def manage_karyawan_uid(request):
         'nama': request.GET.get('nama', '').strip(),
     }
 
-    # Apply filter by nama (case-insensitive contains)
+    # Apply filter by nama (case-insensitive contains, via the employee search index)
     if hasattr(df, 'empty') and not df.empty and filters['nama']:
-        df = df[df['nama'].str.contains(filters['nama'], case=False, na=False)]
+        from core import employee_search
+        df = employee_search.filter_by_nama(df, filters['nama'])
 
     # Ensure required columns exist
     if hasattr(df, 'empty') and not df.empty:
@@ -3485,15 +3259,17 @@ def manage_karyawan_uid(request):
     df_page = df.iloc[start_index:end_index]
     employees = df_page[['uid', 'nama', 'jabatan', 'lokasi']].to_dict('records')
 
-    # Build name options for selector (uid + "nama — jabatan") from full filtered dataset
+    # Selector renders only the applied nama; other names come from the typeahead endpoint
     name_options = []
-    if hasattr(df, 'empty') and not df.empty:
+    if filters['nama'] and hasattr(df, 'empty') and not df.empty:
         try:
-            opts_df = df[['uid', 'nama', 'jabatan']].drop_duplicates(subset=['uid'])
-            name_options = [
-                {'uid': row['uid'], 'nama': row['nama'], 'label': f"{row['nama']} — {row['jabatan']}"}
-                for _, row in opts_df.iterrows()
-            ]
+            # data-uid drives "Hapus Data Karyawan", so only an exact nama match carries one
+            exact = df[df['nama'].astype(str).str.lower() == filters['nama'].lower()]
+            if not exact.empty:
+                row = exact.iloc[0]
+                name_options = [{'uid': row['uid'], 'nama': filters['nama'], 'label': f"{row['nama']} — {row['jabatan']}"}]
+            else:
+                name_options = [{'uid': '', 'nama': filters['nama'], 'label': filters['nama']}]
         except Exception:
             name_options = []
 
@@ -3528,7 +3304,7 @@ def manage_karyawan_uid(request):
     except Exception:
         upload_history = []
 
-    # Normalize timestamp and inserted_ids for template usage
+    # Normalize timestamp and id ranges for template usage
     try:
         for row in upload_history:
             ts = row.get("timestamp")
@@ -3540,12 +3316,10 @@ def manage_karyawan_uid(request):
                     row["timestamp"] = _dt.fromisoformat(ts)
                 except Exception:
                     pass
-            ids = row.get("inserted_ids")
-            if isinstance(ids, list):
-                str_ids = [str(x) for x in ids]
-                row["inserted_ids"] = str_ids
-                row["inserted_ids_preview"] = str_ids[:5]
-                row["inserted_ids_more_count"] = max(0, len(str_ids) - 5)
+            ranges = row.get("id_ranges")
+            if isinstance(ranges, list):
+                row["id_ranges_preview"] = ranges[:5]
+                row["id_ranges_more_count"] = max(0, len(ranges) - 5)
     except Exception:
         pass
 
@@ -3569,13 +3343,9 @@ def manage_karyawan_uid(request):
 
 # TODO: Vue fetch target → used in grafik_kesehatan (Phase 2)
 @require_http_methods(["GET"]) 
+@replica_reads
 def well_unwell_summary_json(request):
     """Return Well vs Unwell totals as JSON filtered by month range (YYYY-MM) and lokasi kerja."""
-    # STEP 3️⃣ — BACKEND PARAMETER DIAGNOSTIC
-    try:
-        print("[DEBUG] Incoming GET params:", dict(request.GET))
-    except Exception:
-        pass
     # Temporary debug info to surface diagnostics directly in JSON response for easier automated verification
     debug_info = {
         "incoming_params": dict(getattr(request, "GET", {})),
@@ -3613,7 +3383,6 @@ def well_unwell_summary_json(request):
             import pandas as _pd
             from datetime import datetime
             try:
-                print("[DEBUG] Initial rows:", len(df))
                 debug_info["initial_rows_printed"] = len(df)
             except Exception:
                 pass
@@ -3643,7 +3412,6 @@ def well_unwell_summary_json(request):
             # Apply lokasi filter with safe normalization (case/whitespace-insensitive)
             lokasi_filter = (request.GET.get("lokasi", "") or "").strip()
             try:
-                print("[DEBUG] Filter lokasi:", lokasi_filter)
                 debug_info["lokasi_filter"] = lokasi_filter
             except Exception:
                 pass
@@ -3661,19 +3429,16 @@ def well_unwell_summary_json(request):
                         lokasi_norm = lokasi_filter.lower()
                         # Optional debug: view unique normalized lokasi values
                         try:
-                            print("[DEBUG] Unique lokasi values:", df[col_name].dropna().unique().tolist())
                             debug_info["unique_lokasi_values"] = df[col_name].dropna().unique().tolist()
                         except Exception:
                             pass
                         # Strict filter: if no match, return empty dataset (no rows)
                         filtered_df = df[df[col_name] == lokasi_norm].copy()
                         try:
-                            print("[DEBUG] Data count after lokasi filter:", len(filtered_df))
                             debug_info["rows_after_lokasi_filter"] = len(filtered_df)
                         except Exception:
                             pass
                         if hasattr(filtered_df, "empty") and filtered_df.empty:
-                            print(f"[INFO] No data found for lokasi: {lokasi_norm}")
                             debug_info["lokasi_filter_match"] = False
                             df = df.head(0)
                         else:
@@ -3683,7 +3448,6 @@ def well_unwell_summary_json(request):
                         # Do not fallback to previous df; keep current df state
                         pass
                 else:
-                    print("[DEBUG] Missing column 'lokasi' or 'Lokasi Kerja' in DataFrame")
                     debug_info["lokasi_col_missing"] = True
 
             # Parse month range (robust): if only single month provided, bound to that month
@@ -3750,21 +3514,6 @@ def well_unwell_summary_json(request):
         # Temporary: include debug info for automated diagnostics. Will be removed after verification.
         "debug": debug_info
     }
-    # Diagnostic logging: params, record counts, JSON length, processing time
-    try:
-        import json, time as _t
-        _start = _t.time()
-        body = json.dumps(data, ensure_ascii=False)
-        duration = _t.time() - _start
-        # Structured JSON log per instructions
-        print(json.dumps({
-            "filters": dict(request.GET),
-            "dataLengths": { "well": len(well_counts), "unwell": len(unwell_counts) },
-            "jsonSize": len(body),
-            "time": round(duration, 3)
-        }))
-    except Exception:
-        pass
     return JsonResponse(data)
 
 # -------------------------
@@ -3820,10 +3569,38 @@ def karyawan_list_json(request):
         items = []
     return JsonResponse({"karyawan": items})
 
+# -------------------------
+# Karyawan typeahead search JSON
+# -------------------------
+@require_http_methods(["GET"])
+def karyawan_search_json(request):
+    """Top matches for the employee pickers (nama, jabatan or uid), from core.employee_search.
+
+    Query: ?q=<text>&lokasi=<nama lokasi>&limit=<n, max 100>
+    Response shape:
+    { "results": [ {"uid": "...", "nama": "...", "jabatan": "...", "lokasi": "..."}, ... ] }
+    """
+    role = request.session.get("user_role")
+    if not request.session.get("authenticated") or role not in ["Manager", "Tenaga Kesehatan"]:
+        return JsonResponse({"error": "unauthorized"}, status=401)
+
+    from core import employee_search
+    try:
+        limit = int(request.GET.get("limit") or employee_search.DEFAULT_LIMIT)
+    except ValueError:
+        limit = employee_search.DEFAULT_LIMIT
+    results = employee_search.search(
+        request.GET.get("q", ""),
+        lokasi=(request.GET.get("lokasi") or "").strip() or None,
+        limit=limit,
+    )
+    return JsonResponse({"results": results})
+
 # -------------------------
 # Grafik → Health Metrics summary JSON
 # -------------------------
 @require_http_methods(["GET"]) 
+@replica_reads
 def health_metrics_summary_json(request):
     """Return monthly averages for 5 health metrics filtered by month range (YYYY-MM) and lokasi kerja.
 
@@ -3848,13 +3625,6 @@ def health_metrics_summary_json(request):
     month_to = request.GET.get("month_to", "").strip()
     lokasi_filter = request.GET.get("lokasi", "").strip()
     uid_filter = (request.GET.get("uid", "") or "").strip()
-    # Diagnostics start time
-    try:
-        import time as _t
-        _diag_start_time = _t.time()
-    except Exception:
-        _diag_start_time = None
-
     # Load historical checkup data; fallback to dashboard latest if necessary
     try:
         df = load_checkups()
@@ -3978,29 +3748,7 @@ def health_metrics_summary_json(request):
         "Cholesterol": _clean(gb["chol_num"].tolist()),
         "Asam Urat": _clean(gb["asam_num"].tolist()),
     }
-    # Diagnostic logging for request and response payload characteristics
-    try:
-        import json, time as _t
-        payload = {"x_dates": x_dates, "series": series}
-        json_str = json.dumps(payload, ensure_ascii=False)
-        duration = (_t.time() - _diag_start_time) if _diag_start_time else 0.0
-        # Derive summary metrics record count (max series length or months)
-        try:
-            _series_lengths = [ len(v) for v in series.values() if isinstance(v, list) ]
-            summary_len = max(_series_lengths) if _series_lengths else len(x_dates)
-        except Exception:
-            summary_len = len(x_dates)
-        print(
-            json.dumps({
-                "filters": dict(request.GET),
-                "dataLengths": { "summaryMetrics": summary_len },
-                "jsonSize": len(json_str),
-                "time": round(duration, 3)
-            })
-        )
-        return JsonResponse(payload)
-    except Exception:
-        return JsonResponse({"x_dates": x_dates, "series": series})
+    return JsonResponse({"x_dates": x_dates, "series": series})
 
 # -------------------------
 # Tab 5b: Delete Single Employee (trailing duplicate removed)
@@ -4030,17 +3778,21 @@ def grafik_diagnostic_log(request):
 
     try:
         import json, time
+        from core.instrumentation import logger as perf_logger
         ts = time.strftime("%Y-%m-%d %H:%M:%S")
         raw_body = request.body.decode("utf-8")
         payload = json.loads(raw_body or "{}")
-        # Print concise diagnostic line
-        filters = payload.get("filters", {})
-        well_len = payload.get("wellDataLength")
-        unwell_len = payload.get("unwellDataLength")
-        x_len = payload.get("xDatesLength")
-        keys = payload.get("seriesKeys")
-        print(f"[Diagnostic] grafik-manager-client | ts={ts} | filters={filters} | well={well_len} | unwell={unwell_len} | x_dates={x_len} | series_keys={keys}")
+        # Structured diagnostic line on the perf logger (same sink as PerfInstrumentationMiddleware)
+        perf_logger.info(json.dumps({
+            "event": "grafik-manager-client",
+            "ts": ts,
+            "filters": payload.get("filters", {}),
+            "well": payload.get("wellDataLength"),
+            "unwell": payload.get("unwellDataLength"),
+            "x_dates": payload.get("xDatesLength"),
+            "series_keys": payload.get("seriesKeys"),
+        }, ensure_ascii=False))
         return JsonResponse({"ok": True})
     except Exception as e:
-        print(f"[Diagnostic] grafik-manager-client | error={str(e)}")
+        perf_logger.warning(json.dumps({"event": "grafik-manager-client", "error": str(e)}))
         return JsonResponse({"ok": False, "error": str(e)}, status=200)
@@ -11,6 +11,9 @@ urlpatterns = [
     # Master dashboard
     path("", master_views.master_index, name="dashboard"),
 
+    # Slow-query ranking
+    path("slow-queries/", master_views.slow_queries_view, name="slow_queries"),
+
     # Master logout
     path("logout/", master_views.master_logout, name="logout"),
 ]
@@ -94,10 +94,11 @@ def master_index(request):
             if action_reset_all_pw is not None:
                 default_pw = request.POST.get("default_pw_all")
                 if default_pw:
-                    users_df = queries.get_users()
-                    for uname in users_df["username"]:
-                        queries.reset_user_password(uname, default_pw)
-                    request.session["success_message"] = "Semua password berhasil direset."
+                    from core.query_budget import query_budget
+                    # SELECT + one bulk UPDATE (+ transaction) whatever the number of users
+                    with query_budget(5, name="master.reset_all_passwords"):
+                        total = queries.reset_all_passwords(default_pw)
+                    request.session["success_message"] = f"Semua password ({total} user) berhasil direset."
                 else:
                     request.session["error_message"] = "Password default wajib diisi."
                 return redirect("master:dashboard")
@@ -126,6 +127,54 @@ def master_index(request):
     return render(request, "master_templates/master_index.html", context)
 
 
+# -------------------------------------------------------------------
+# Prometheus metrics (/metrics)
+# -------------------------------------------------------------------
+def metrics_view(request):
+    """
+    Prometheus text exposition of core.metrics, merged across all workers.
+    Accessible with a Master session, or with METRICS_TOKEN as a bearer token / ?token= for scrapers.
+    """
+    import hmac
+    from core import metrics
+
+    is_master = request.session.get("authenticated") and request.session.get("user_role") == "Master"
+    token = getattr(settings, "METRICS_TOKEN", None)
+    supplied = request.headers.get("Authorization", "").removeprefix("Bearer ").strip() or request.GET.get("token", "")
+    if not is_master and not (token and supplied and hmac.compare_digest(supplied, token)):
+        return HttpResponse("Forbidden", status=403, content_type="text/plain")
+
+    return HttpResponse(metrics.render_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# -------------------------------------------------------------------
+# Slow-query ranking (core.slow_queries)
+# -------------------------------------------------------------------
+def slow_queries_view(request):
+    """
+    Top slow SQL statements grouped by normalized shape and call site. Master only.
+    """
+    if not request.session.get("authenticated") or request.session.get("user_role") != "Master":
+        return redirect("master:login")
+
+    from core import slow_queries
+
+    order_by = request.GET.get("order", "total_ms")
+    try:
+        limit = max(1, min(500, int(request.GET.get("limit", 50))))
+    except (TypeError, ValueError):
+        limit = 50
+
+    context = {
+        "offenders": slow_queries.top_offenders(limit=limit, order_by=order_by),
+        "order_by": order_by,
+        "limit": limit,
+        "threshold_ms": slow_queries.threshold_ms(),
+        "log_path": slow_queries.log_path(),
+    }
+    return render(request, "master_templates/slow_queries.html", context)
+
+
 # -------------------------------------------------------------------
 # Master logout
 # -------------------------------------------------------------------
@@ -1,8 +1,6 @@
 # users_ui/nurse/context_processors.py
 from django.urls import reverse
-from core.queries import get_employees
-import pandas as pd
-from core.helpers import get_mcu_expiry_alerts
+from core.helpers import get_mcu_expiry_summary, get_menu_items
 
 
 def nurse_menu(request):
@@ -10,36 +8,7 @@ def nurse_menu(request):
     if not request.path.startswith('/nurse/'):
         return {}
 
-    # Get first employee UID for Edit Karyawan / QR menu
-    employees_df = get_employees()
-    default_uid = str(employees_df.iloc[0]['uid']) if not employees_df.empty else None
-
-    menu_items = [
-        {
-            'name': 'Dashboard',
-            'url': reverse('nurse:dashboard'),
-            'icon': 'home',
-            'key': 'dashboard'
-        },
-        {
-            'name': 'QR Codes',
-            'url': reverse('nurse:qr_detail', kwargs={'uid': default_uid}) if default_uid else '#',
-            'icon': 'qrcode',
-            'key': 'qr'
-        },
-        {
-            'name': 'Upload / Export Data',
-            'url': reverse('nurse:upload_export'),
-            'icon': 'upload',
-            'key': 'upload_export'
-        },
-        {
-            'name': 'Edit Data Checkup',
-            'url': reverse('nurse:karyawan_detail', kwargs={'uid': default_uid}) if default_uid else '#',
-            'icon': 'edit',
-            'key': 'edit_karyawan'
-        },
-    ]
+    menu_items = get_menu_items("nurse")
 
     # Determine active menu based on current path
     current_path = request.path.rstrip('/')
@@ -97,48 +66,7 @@ def manager_menu(request):
     if not request.path.startswith('/manager/'):
         return {}
 
-    # Get first employee UID for Edit Karyawan menu
-    employees_df = get_employees()
-    default_uid = str(employees_df.iloc[0]['uid']) if not employees_df.empty else None
-
-    menu_items = [
-        {
-            'name': 'Dashboard',
-            'url': reverse('manager:dashboard'),
-            'icon': 'home',
-            'key': 'dashboard'
-        },
-        {
-            'name': 'User Management',
-            'url': reverse('manager:user_management'),
-            'icon': 'users',
-            'key': 'user'
-        },
-        {
-            'name': 'QR Codes',
-            'url': reverse('manager:qr_codes'),
-            'icon': 'qrcode',
-            'key': 'qr'
-        },
-        {
-            'name': 'Upload / Export Data',
-            'url': reverse('manager:upload_export'),
-            'icon': 'upload',
-            'key': 'data'
-        },
-        {
-            'name': 'Hapus Data Karyawan',
-            'url': reverse('manager:hapus_data_karyawan'),
-            'icon': 'database',
-            'key': 'hapus_data_karyawan'
-        },
-        {
-            'name': 'Edit Master Data',
-            'url': reverse('manager:edit_karyawan', kwargs={'uid': default_uid}) if default_uid else '#',
-            'icon': 'edit',
-            'key': 'edit_karyawan'
-        }
-    ]
+    menu_items = get_menu_items("manager")
 
     # Determine active menu based on current path
     current_path = request.path.rstrip('/')
@@ -178,52 +106,17 @@ def nurse_notifications(request):
     except Exception:
         return {}
 
-    # Aggregate counts (expired, due soon)
+    # Aggregate counts (expired, due soon) and the first 12 items, computed in SQL and cached
     try:
-        alerts = get_mcu_expiry_alerts(window_days=60)
+        summary = get_mcu_expiry_summary(window_days=60)
     except Exception:
-        alerts = {"expired": 0, "due_soon": 0, "total": 0}
+        summary = {"expired": 0, "due_soon": 0, "total": 0, "items": []}
+    alerts = {k: summary[k] for k in ("expired", "due_soon", "total")}
 
     items = []
-    try:
-        df = get_employees()
-        if df is not None and not df.empty and 'expired_MCU' in df.columns:
-            exp_series = pd.to_datetime(df['expired_MCU'], errors='coerce')
-            today = pd.Timestamp.today().normalize()
-            window_end = today + pd.Timedelta(days=60)
-
-            expired_rows = df[exp_series.notna() & (exp_series < today)].copy()
-            due_rows = df[exp_series.notna() & (exp_series >= today) & (exp_series <= window_end)].copy()
-
-            if not expired_rows.empty:
-                expired_rows = expired_rows.sort_values(by='expired_MCU')
-                for _, r in expired_rows.iterrows():
-                    items.append({
-                        "type": "expired",
-                        "title": f"{r.get('nama')} ({r.get('jabatan')})",
-                        "expired_at": r.get('expired_MCU') or "-",
-                        "days_left": None,
-                        "uid": str(r.get('uid')) if r.get('uid') else None,
-                        "url": reverse('nurse:karyawan_detail', kwargs={'uid': str(r.get('uid'))}) if r.get('uid') else None,
-                    })
-            if not due_rows.empty:
-                due_rows = due_rows.sort_values(by='expired_MCU')
-                for _, r in due_rows.iterrows():
-                    exp_dt = pd.to_datetime(r.get('expired_MCU'), errors='coerce')
-                    days_left = int((exp_dt.date() - today.date()).days) if pd.notna(exp_dt) else None
-                    items.append({
-                        "type": "due_soon",
-                        "title": f"{r.get('nama')} ({r.get('jabatan')})",
-                        "expired_at": r.get('expired_MCU') or "-",
-                        "days_left": days_left,
-                        "uid": str(r.get('uid')) if r.get('uid') else None,
-                        "url": reverse('nurse:karyawan_detail', kwargs={'uid': str(r.get('uid'))}) if r.get('uid') else None,
-                    })
-
-            if len(items) > 12:
-                items = items[:12]
-    except Exception:
-        pass
+    for item in summary["items"]:
+        uid = item["uid"]
+        items.append(dict(item, url=reverse('nurse:karyawan_detail', kwargs={'uid': uid}) if uid else None))
 
     return {
         "mcu_alerts": alerts,
@@ -18,6 +18,7 @@ urlpatterns = [
     path('grafik/health-metrics-summary/', manager_views.health_metrics_summary_json, name='grafik_health_metrics_summary_json'),
     path('grafik/lokasi-list/', manager_views.lokasi_list_json, name='grafik_lokasi_list_json'),
     path('grafik/karyawan-list/', manager_views.karyawan_list_json, name='grafik_karyawan_list_json'),
+    path('grafik/karyawan-search/', manager_views.karyawan_search_json, name='grafik_karyawan_search_json'),
     path('grafik/diagnostic-log/', manager_views.grafik_diagnostic_log, name='grafik_diagnostic_log'),
 
     # ---------------- Karyawan Detail / Edit ----------------
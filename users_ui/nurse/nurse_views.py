@@ -11,6 +11,7 @@ from datetime import datetime
 import base64
 from django.conf import settings
 import os
+from core.db_router import replica_reads
 
 from core.queries import (
     get_users,
@@ -23,6 +24,8 @@ from core.queries import (
     save_manual_karyawan_edits,
     get_latest_medical_checkup,
     load_checkups,
+    iter_checkups,
+    get_latest_checkups_in_range,
     get_checkup_upload_history,
 )
 from core.helpers import (
@@ -33,11 +36,9 @@ from core.helpers import (
 from core import checkup_uploader
 from users_ui.qr.qr_views import qr_detail_view, qr_bulk_download_view
 from users_ui.qr.qr_utils import generate_qr_bytes
-from utils.export_utils import generate_karyawan_template_excel, export_checkup_data_excel as build_checkup_excel, export_checkup_data_pdf as build_checkup_pdf
+from utils.export_utils import generate_karyawan_template_excel, export_checkup_data_excel as build_checkup_excel, export_checkup_data_pdf as build_checkup_pdf, export_checkup_frames_excel
 
 # Plotly for grafik replication
-import plotly.graph_objects as go
-import plotly.io as pio
 
 
 # -------------------------
@@ -68,26 +69,17 @@ def _build_nurse_filtered_df(request):
     end_month = request.GET.get('end_month')
     if start_month and end_month:
         try:
-            # Load historical checkups and filter by range
-            df_hist = load_checkups() or pd.DataFrame()
-            if df_hist is not None and not df_hist.empty:
-                df_hist['tanggal_checkup'] = pd.to_datetime(df_hist.get('tanggal_checkup'), errors='coerce')
-                start_dt = pd.to_datetime(f"{start_month}-01", errors='coerce')
-                end_dt = pd.to_datetime(f"{end_month}-01", errors='coerce')
-                # End-of-month inclusive: add 1 month then -1 day
-                if pd.notnull(end_dt):
-                    end_dt = (end_dt + pd.offsets.MonthBegin(1)) - pd.Timedelta(days=1)
-                # Filter within range
-                if pd.notnull(start_dt) and pd.notnull(end_dt):
-                    df_hist = df_hist[(df_hist['tanggal_checkup'] >= start_dt) & (df_hist['tanggal_checkup'] <= end_dt)]
-                # Pick latest checkup IN RANGE per employee
-                if not df_hist.empty and 'uid' in df_hist.columns:
-                    # Ensure uid is consistent type
-                    df_hist['uid'] = df_hist['uid'].astype(str)
-                    # Sort by date then take last per uid
-                    df_hist = df_hist.sort_values(['uid', 'tanggal_checkup'])
-                    latest_idx = df_hist.groupby('uid')['tanggal_checkup'].idxmax()
-                    df_latest_range = df_hist.loc[latest_idx].copy()
+            start_dt = pd.to_datetime(f"{start_month}-01", errors='coerce')
+            end_dt = pd.to_datetime(f"{end_month}-01", errors='coerce')
+            # End-of-month inclusive: add 1 month then -1 day
+            if pd.notnull(end_dt):
+                end_dt = (end_dt + pd.offsets.MonthBegin(1)) - pd.Timedelta(days=1)
+            if pd.notnull(start_dt) and pd.notnull(end_dt):
+                # Latest checkup IN RANGE per employee, streamed from the DB in chunks
+                df_latest_range = get_latest_checkups_in_range(start_dt.date(), end_dt.date())
+                if not df_latest_range.empty:
+                    df_latest_range['uid'] = df_latest_range['uid'].astype(str)
+                    df_latest_range['tanggal_checkup'] = pd.to_datetime(df_latest_range['tanggal_checkup'], errors='coerce')
                     # Recompute status for these rows if missing
                     try:
                         if 'status' not in df_latest_range.columns or df_latest_range['status'].isna().any():
@@ -162,7 +154,8 @@ def _build_nurse_filtered_df(request):
     jabatan = request.GET.get('jabatan', '')
     if nama:
         try:
-            df_base = df_base[df_base['nama'].astype(str).str.contains(nama, case=False, na=False)]
+            from core import employee_search
+            df_base = employee_search.filter_by_nama(df_base, nama)
         except Exception:
             pass
     if jabatan:
@@ -346,7 +339,8 @@ def nurse_index(request):
 
     # Apply text/jabatan normalized filters on top (already applied in builder but keep UI normalization keys)
     if filters["nama"] and "nama" in df.columns:
-        df = df[df["nama"].astype(str).str.contains(filters["nama"], case=False, na=False)]
+        from core import employee_search
+        df = employee_search.filter_by_nama(df, filters["nama"])
     if filters["jabatan"] and "jabatan_key" in df.columns:
         # Normalize filter to match jabatan_key
         filt_clean = " ".join(filters["jabatan"].split()).strip().lower()
@@ -424,22 +418,9 @@ def nurse_index(request):
             merged_chart_html = grafik_context.get("grafik_chart_html")
     # ----------------------------------------
 
-    # Available employees for UID dropdown in Grafik
-    available_employees = []
-    try:
-        emp_df = get_employees()
-    except Exception:
-        emp_df = pd.DataFrame()
-    if emp_df is not None and not emp_df.empty:
-        cols = [c for c in emp_df.columns]
-        uid_col = 'uid' if 'uid' in cols else ('UID' if 'UID' in cols else None)
-        name_col = 'nama' if 'nama' in cols else ('Nama' if 'Nama' in cols else None)
-        if uid_col:
-            emp_df = emp_df.dropna(subset=[uid_col])
-            for _, row in emp_df.iterrows():
-                u = str(row[uid_col])
-                n = str(row[name_col]) if name_col else f'UID {u}'
-                available_employees.append({'uid': u, 'nama': n})
+    # Available employees for UID dropdown in Grafik: only the selected one, the rest is searched
+    from core import employee_search
+    available_employees = employee_search.picker_options(request.GET.get('uid', ''))
 
     # Additional dashboard metrics similar to manager
     users_df = get_users()
@@ -512,6 +493,8 @@ def nurse_index(request):
 
         # Build Plotly figure (only for Well/Unwell subtab)
         if grafik_subtab == 'well_unwell' and not pivot.empty:
+            import plotly.graph_objects as go
+            import plotly.io as pio
             fig = go.Figure()
             fig.add_trace(go.Scatter(x=pivot.index, y=pivot['well'], mode='lines+markers', name='Well', line=dict(color='green')))
             fig.add_trace(go.Scatter(x=pivot.index, y=pivot['unwell'], mode='lines+markers', name='Unwell', line=dict(color='red')))
@@ -714,14 +697,23 @@ def nurse_upload_checkup(request):
 
     file = request.FILES.get("file")
     if not file:
-        request.session["warning_message"] = "File XLS harus diunggah!"
+        request.session["warning_message"] = "File XLS/CSV harus diunggah!"
         return redirect(reverse("nurse:dashboard"))
 
     try:
-        result = checkup_uploader.parse_checkup_xls(file)
-        request.session["success_message"] = f"{result['inserted']} checkup berhasil, {len(result['skipped'])} gagal."
+        from core import upload_store
+
+        # Stored, hashed and logged like manager uploads; an identical file is not parsed again
+        result, duplicate = upload_store.ingest_checkups(file, checkup_uploader.parse_checkup_file)
+        if duplicate:
+            request.session["warning_message"] = upload_store.duplicate_message(duplicate)
+        else:
+            request.session["success_message"] = (
+                f"{result['inserted']} checkup berhasil, {result.get('updated', 0)} diperbarui, {len(result['skipped'])} gagal."
+                + upload_store.chunk_note(result)
+            )
     except Exception as e:
-        request.session["error_message"] = f"Gagal memproses XLS checkup: {e}"
+        request.session["error_message"] = f"Gagal memproses file checkup: {e}"
 
     return redirect(reverse("nurse:dashboard"))
 
@@ -776,7 +768,7 @@ def nurse_karyawan_detail(request, uid):
     if request.method == "POST" and (request.POST.get("save_changes") or request.POST.get("action") == "edit_row"):
         # Per-row Edit + Save (manager-style)
         if request.POST.get("action") == "edit_row":
-            from core.core_models import Checkup
+            from core.queries import update_checkup
             checkup_id = request.POST.get("checkup_id")
             if checkup_id:
                 fields = ["tanggal_checkup","lingkar_perut","gula_darah_puasa","gula_darah_sewaktu","cholesterol","asam_urat","tekanan_darah","derajat_kesehatan"]
@@ -794,10 +786,10 @@ def nurse_karyawan_detail(request, uid):
                 except Exception:
                     pass
                 if update_data:
-                    Checkup.objects.filter(checkup_id=checkup_id).update(**update_data)
+                    update_checkup(checkup_id, **update_data)
             return redirect(reverse("nurse:karyawan_detail", kwargs={"uid": uid}) + "?submenu=history")
         import json
-        from core.core_models import Checkup
+        from core.queries import update_checkup
         edited_data_raw = request.POST.get("edited_table_data")
         try:
             rows = json.loads(edited_data_raw) if edited_data_raw else []
@@ -835,7 +827,7 @@ def nurse_karyawan_detail(request, uid):
                 # Drop None values to avoid overriding with NULL
                 update_data = {k: v for k, v in update_data.items() if v is not None}
                 if update_data:
-                    Checkup.objects.filter(checkup_id=checkup_id).update(**update_data)
+                    update_checkup(checkup_id, **update_data)
                     saved += 1
             except Exception:
                 continue
@@ -857,12 +849,10 @@ def nurse_karyawan_detail(request, uid):
     if active_submenu == "data_karyawan" and active_subtab not in ["profile", "edit_data"]:
         active_subtab = "profile"
 
-    # Load employees list for selector
+    # Selector renders only the current employee; the rest comes from the typeahead endpoint
+    from core import employee_search
     employees_df = get_employees()
-    if employees_df is None or employees_df.empty:
-        employees = []
-    else:
-        employees = employees_df[["uid", "nama"]].to_dict("records")
+    employees = [e for e in [employee_search.get_employee(uid)] if e]
 
     # Get selected employee details (sanitized)
     employee_raw = get_employee_by_uid(uid)
@@ -1112,6 +1102,8 @@ def nurse_karyawan_detail(request, uid):
                         return pd.NA
                 td_systolic = df_ts['tekanan_darah'].apply(_parse_systolic) if 'tekanan_darah' in df_ts.columns else pd.Series([], dtype='float64')
 
+                import plotly.graph_objects as go
+                import plotly.io as pio
                 fig = go.Figure()
                 if not x_vals.empty:
                     if gdp is not None and not gdp.empty:
@@ -1254,6 +1246,7 @@ def nurse_download_checkup_template(request):
 
 # New: PDF export of dashboard-like checkup data for nurse
 @require_http_methods(["GET"]) 
+@replica_reads
 def nurse_export_checkup_data(request):
     # Export all checkup data visible in dashboard (XLS)
     if not request.session.get("authenticated") or request.session.get("user_role") != "Tenaga Kesehatan":
@@ -1276,6 +1269,7 @@ def nurse_export_checkup_data(request):
         return redirect(reverse("nurse:upload_export") + "?submenu=export_data")
 
 @require_http_methods(["GET"]) 
+@replica_reads
 def nurse_export_checkup_data_pdf(request):
     if not request.session.get("authenticated") or request.session.get("user_role") != "Tenaga Kesehatan":
         return redirect("accounts:login")
@@ -1317,6 +1311,7 @@ def nurse_edit_checkup(request, checkup_id):
     if not request.session.get("authenticated") or request.session.get("user_role") != "Tenaga Kesehatan":
         return redirect("accounts:login")
     from core.core_models import Checkup
+    from core.queries import update_checkup
     # Fetch existing record
     obj = Checkup.objects.filter(checkup_id=checkup_id).first()
     if obj is None:
@@ -1358,7 +1353,7 @@ def nurse_edit_checkup(request, checkup_id):
             }
             if pd.notna(tanggal_checkup_date):
                 update_data["tanggal_checkup"] = tanggal_checkup_date.date()
-            Checkup.objects.filter(checkup_id=checkup_id).update(**update_data)
+            update_checkup(checkup_id, **update_data)
             request.session["success_message"] = "Checkup berhasil diperbarui."
             # Redirect back to karyawan detail
             uid = str(obj.uid_id)
@@ -1373,6 +1368,7 @@ def nurse_edit_checkup(request, checkup_id):
 
 
 @require_http_methods(["GET"])
+@replica_reads
 def nurse_export_karyawan_data(request):
     """Export all employee master data to Excel (available to nurse)."""
     if not request.session.get("authenticated") or request.session.get("user_role") != "Tenaga Kesehatan":
@@ -1464,6 +1460,7 @@ def upload_avatar(request):
     return redirect(reverse("nurse:dashboard"))
 
 @require_http_methods(["GET"]) 
+@replica_reads
 def nurse_export_checkup_history_by_uid(request, uid):
     if not request.session.get("authenticated") or request.session.get("user_role") != "Tenaga Kesehatan":
         return redirect("accounts:login")
@@ -1472,16 +1469,10 @@ def nurse_export_checkup_history_by_uid(request, uid):
         if not Karyawan.objects.filter(uid=uid).exists():
             request.session['error_message'] = f"UID {uid} tidak ditemukan."
             return redirect(reverse("nurse:karyawan_detail", kwargs={"uid": uid}) + "?submenu=history")
-        df = get_medical_checkups_by_uid(uid)
-        if df is None or df.empty:
+        from core.core_models import Checkup
+        if not Checkup.objects.filter(uid_id=str(uid)).exists():
             request.session['warning_message'] = "Tidak ada data checkup untuk UID ini."
             return redirect(reverse("nurse:karyawan_detail", kwargs={"uid": uid}) + "?submenu=history")
-        # Normalize
-        if "uid_id" in df.columns and "uid" not in df.columns:
-            df = df.rename(columns={"uid_id": "uid"})
-        if "tanggal_checkup" in df.columns:
-            df["tanggal_checkup"] = pd.to_datetime(df["tanggal_checkup"], errors="coerce")
-        df = df.sort_values("tanggal_checkup", ascending=False)
 
         # Fetch employee baseline for fallbacks
         employee_clean = get_employee_by_uid(uid) or {}
@@ -1515,78 +1506,82 @@ def nurse_export_checkup_history_by_uid(request, uid):
             emp_bmi = None
 
         from core.helpers import compute_bmi_category
-        rows = []
-        for _, row in df.iterrows():
-            tinggi_n = pd.to_numeric(row.get('tinggi', None), errors='coerce')
-            berat_n = pd.to_numeric(row.get('berat', None), errors='coerce')
-            bmi_n = pd.to_numeric(row.get('bmi', None), errors='coerce')
-            # BMI fallback: use employee BMI if row BMI missing/zero
-            try:
-                if ((bmi_n is None) or (isinstance(bmi_n, float) and pd.isna(bmi_n)) or (float(bmi_n) == 0.0)) and pd.notna(emp_bmi):
-                    bmi_n = float(emp_bmi)
-            except Exception:
-                pass
-            lp_n = pd.to_numeric(row.get('lingkar_perut', None), errors='coerce')
-            gdp_n = pd.to_numeric(row.get('gula_darah_puasa', None), errors='coerce')
-            gds_n = pd.to_numeric(row.get('gula_darah_sewaktu', None), errors='coerce')
-            chol_n = pd.to_numeric(row.get('cholesterol', None), errors='coerce')
-            asam_n = pd.to_numeric(row.get('asam_urat', None), errors='coerce')
-            tc_dt = pd.to_datetime(row.get('tanggal_checkup'), errors='coerce')
-            tanggal_str = tc_dt.strftime('%d/%m/%y') if pd.notna(tc_dt) else None
-
-            status_val = compute_status({
-                'gula_darah_puasa': gdp_n if pd.notna(gdp_n) else 0,
-                'gula_darah_sewaktu': gds_n if pd.notna(gds_n) else 0,
-                'cholesterol': chol_n if pd.notna(chol_n) else 0,
-                'asam_urat': asam_n if pd.notna(asam_n) else 0,
-                'bmi': bmi_n if pd.notna(bmi_n) else 0,
-            })
+        columns_order = [
+            'UID','Nama','Jabatan','Lokasi','Tanggal Lahir','Umur','BMI','BMI Category','Tanggal Checkup','Lingkar Perut','Gula Darah Puasa','Gula Darah Sewaktu','Cholesterol','Asam Urat','Tekanan Darah','Derajat Kesehatan','Tanggal MCU','Expired MCU','Status'
+        ]
 
-            dk_val = row.get('derajat_kesehatan', None)
-            try:
-                if dk_val is None or (isinstance(dk_val, float) and pd.isna(dk_val)) or (isinstance(dk_val, str) and not dk_val.strip()):
-                    dk_val = (employee_clean or {}).get('derajat_kesehatan')
-            except Exception:
-                pass
+        # Rows are built and written one chunk at a time (server-side cursor on PostgreSQL)
+        def _export_rows(chunk):
+            rows = []
+            for _, row in chunk.iterrows():
+                tinggi_n = pd.to_numeric(row.get('tinggi', None), errors='coerce')
+                berat_n = pd.to_numeric(row.get('berat', None), errors='coerce')
+                bmi_n = pd.to_numeric(row.get('bmi', None), errors='coerce')
+                # BMI fallback: use employee BMI if row BMI missing/zero
+                try:
+                    if ((bmi_n is None) or (isinstance(bmi_n, float) and pd.isna(bmi_n)) or (float(bmi_n) == 0.0)) and pd.notna(emp_bmi):
+                        bmi_n = float(emp_bmi)
+                except Exception:
+                    pass
+                lp_n = pd.to_numeric(row.get('lingkar_perut', None), errors='coerce')
+                gdp_n = pd.to_numeric(row.get('gula_darah_puasa', None), errors='coerce')
+                gds_n = pd.to_numeric(row.get('gula_darah_sewaktu', None), errors='coerce')
+                chol_n = pd.to_numeric(row.get('cholesterol', None), errors='coerce')
+                asam_n = pd.to_numeric(row.get('asam_urat', None), errors='coerce')
+                tc_dt = pd.to_datetime(row.get('tanggal_checkup'), errors='coerce')
+                tanggal_str = tc_dt.strftime('%d/%m/%y') if pd.notna(tc_dt) else None
 
-            bmi_cat_val = row.get('bmi_category', None)
-            def _is_blank(x):
-                return (x is None) or (isinstance(x, float) and pd.isna(x)) or (isinstance(x, str) and not str(x).strip())
-            if _is_blank(bmi_cat_val):
-                bmi_cat_val = (employee_clean or {}).get('bmi_category', None)
-            if _is_blank(bmi_cat_val):
-                bmi_source = bmi_n if pd.notna(bmi_n) else (emp_bmi if pd.notna(emp_bmi) else None)
-                bmi_cat_val = compute_bmi_category(bmi_source)
+                status_val = compute_status({
+                    'gula_darah_puasa': gdp_n if pd.notna(gdp_n) else 0,
+                    'gula_darah_sewaktu': gds_n if pd.notna(gds_n) else 0,
+                    'cholesterol': chol_n if pd.notna(chol_n) else 0,
+                    'asam_urat': asam_n if pd.notna(asam_n) else 0,
+                    'bmi': bmi_n if pd.notna(bmi_n) else 0,
+                })
 
-            rows.append({
-                'UID': str(row.get('uid', uid)),
-                'Nama': emp_nama,
-                'Jabatan': emp_jabatan,
-                'Lokasi': emp_lokasi,
-                'Tanggal Lahir': emp_tanggal_lahir,
-                'Umur': int(umur_val_emp) if pd.notna(pd.to_numeric(umur_val_emp, errors='coerce')) else None,
-                'BMI': float(bmi_n) if pd.notna(bmi_n) and float(bmi_n) != 0.0 else None,
-                'BMI Category': str(bmi_cat_val) if bmi_cat_val is not None else None,
-                'Tanggal Checkup': tanggal_str,
-                'Lingkar Perut': float(lp_n) if pd.notna(lp_n) else None,
-                'Gula Darah Puasa': float(gdp_n) if pd.notna(gdp_n) else None,
-                'Gula Darah Sewaktu': float(gds_n) if pd.notna(gds_n) else None,
-                'Cholesterol': float(chol_n) if pd.notna(chol_n) else None,
-                'Asam Urat': float(asam_n) if pd.notna(asam_n) else None,
-                'Tekanan Darah': row.get('tekanan_darah', None),
-                'Derajat Kesehatan': str(dk_val) if dk_val is not None else None,
-                'Tanggal MCU': emp_tanggal_mcu,
-                'Expired MCU': emp_expired_mcu,
-                'Status': status_val,
-            })
+                dk_val = row.get('derajat_kesehatan', None)
+                try:
+                    if dk_val is None or (isinstance(dk_val, float) and pd.isna(dk_val)) or (isinstance(dk_val, str) and not dk_val.strip()):
+                        dk_val = (employee_clean or {}).get('derajat_kesehatan')
+                except Exception:
+                    pass
 
-        import pandas as _pd
-        df_export = _pd.DataFrame(rows)
-        columns_order = [
-            'UID','Nama','Jabatan','Lokasi','Tanggal Lahir','Umur','BMI','BMI Category','Tanggal Checkup','Lingkar Perut','Gula Darah Puasa','Gula Darah Sewaktu','Cholesterol','Asam Urat','Tekanan Darah','Derajat Kesehatan','Tanggal MCU','Expired MCU','Status'
-        ]
+                bmi_cat_val = row.get('bmi_category', None)
+                def _is_blank(x):
+                    return (x is None) or (isinstance(x, float) and pd.isna(x)) or (isinstance(x, str) and not str(x).strip())
+                if _is_blank(bmi_cat_val):
+                    bmi_cat_val = (employee_clean or {}).get('bmi_category', None)
+                if _is_blank(bmi_cat_val):
+                    bmi_source = bmi_n if pd.notna(bmi_n) else (emp_bmi if pd.notna(emp_bmi) else None)
+                    bmi_cat_val = compute_bmi_category(bmi_source)
+
+                rows.append({
+                    'UID': str(row.get('uid', uid)),
+                    'Nama': emp_nama,
+                    'Jabatan': emp_jabatan,
+                    'Lokasi': emp_lokasi,
+                    'Tanggal Lahir': emp_tanggal_lahir,
+                    'Umur': int(umur_val_emp) if pd.notna(pd.to_numeric(umur_val_emp, errors='coerce')) else None,
+                    'BMI': float(bmi_n) if pd.notna(bmi_n) and float(bmi_n) != 0.0 else None,
+                    'BMI Category': str(bmi_cat_val) if bmi_cat_val is not None else None,
+                    'Tanggal Checkup': tanggal_str,
+                    'Lingkar Perut': float(lp_n) if pd.notna(lp_n) else None,
+                    'Gula Darah Puasa': float(gdp_n) if pd.notna(gdp_n) else None,
+                    'Gula Darah Sewaktu': float(gds_n) if pd.notna(gds_n) else None,
+                    'Cholesterol': float(chol_n) if pd.notna(chol_n) else None,
+                    'Asam Urat': float(asam_n) if pd.notna(asam_n) else None,
+                    'Tekanan Darah': row.get('tekanan_darah', None),
+                    'Derajat Kesehatan': str(dk_val) if dk_val is not None else None,
+                    'Tanggal MCU': emp_tanggal_mcu,
+                    'Expired MCU': emp_expired_mcu,
+                    'Status': status_val,
+                })
+            return pd.DataFrame(rows, columns=columns_order)
 
-        excel_bytes = build_checkup_excel(df_export, enrich=False, columns=columns_order)
+        excel_bytes = export_checkup_frames_excel(
+            (_export_rows(chunk) for chunk in iter_checkups(uid=uid)),
+            columns=columns_order,
+        )
         filename = f"checkup_history_{uid}.xlsx"
         response = HttpResponse(excel_bytes, content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
         response["Content-Disposition"] = f"attachment; filename={filename}"
@@ -1596,6 +1591,7 @@ def nurse_export_checkup_history_by_uid(request, uid):
         return redirect(reverse("nurse:karyawan_detail", kwargs={"uid": uid}) + "?submenu=history")
 
 @require_http_methods(["GET"]) 
+@replica_reads
 def nurse_export_checkup_history_by_uid_pdf(request, uid):
     if not request.session.get("authenticated") or request.session.get("user_role") != "Tenaga Kesehatan":
         return redirect("accounts:login")
@@ -1604,15 +1600,10 @@ def nurse_export_checkup_history_by_uid_pdf(request, uid):
         if not Karyawan.objects.filter(uid=uid).exists():
             request.session['error_message'] = f"UID {uid} tidak ditemukan."
             return redirect(reverse("nurse:karyawan_detail", kwargs={"uid": uid}) + "?submenu=history")
-        df = get_medical_checkups_by_uid(uid)
-        if df is None or df.empty:
+        from core.core_models import Checkup
+        if not Checkup.objects.filter(uid_id=str(uid)).exists():
             request.session['warning_message'] = "Tidak ada data checkup untuk UID ini."
             return redirect(reverse("nurse:karyawan_detail", kwargs={"uid": uid}) + "?submenu=history")
-        if "uid_id" in df.columns and "uid" not in df.columns:
-            df = df.rename(columns={"uid_id": "uid"})
-        if "tanggal_checkup" in df.columns:
-            df["tanggal_checkup"] = pd.to_datetime(df["tanggal_checkup"], errors="coerce")
-        df = df.sort_values("tanggal_checkup", ascending=False)
 
         # Fetch employee baseline for fallbacks
         employee_clean = get_employee_by_uid(uid) or {}
@@ -1642,57 +1633,59 @@ def nurse_export_checkup_history_by_uid_pdf(request, uid):
         umur_val_emp = (employee_clean or {}).get('umur', None)
 
         from core.helpers import compute_bmi_category
+        # Raw checkups are read in chunks; only the formatted export rows are kept for the PDF
         rows = []
-        for _, row in df.iterrows():
-            tinggi_n = pd.to_numeric(row.get('tinggi', None), errors='coerce')
-            berat_n = pd.to_numeric(row.get('berat', None), errors='coerce')
-            bmi_n = pd.to_numeric(row.get('bmi', None), errors='coerce')
-            lp_n = pd.to_numeric(row.get('lingkar_perut', None), errors='coerce')
-            gdp_n = pd.to_numeric(row.get('gula_darah_puasa', None), errors='coerce')
-            gds_n = pd.to_numeric(row.get('gula_darah_sewaktu', None), errors='coerce')
-            chol_n = pd.to_numeric(row.get('cholesterol', None), errors='coerce')
-            asam_n = pd.to_numeric(row.get('asam_urat', None), errors='coerce')
-            tc_dt = pd.to_datetime(row.get('tanggal_checkup'), errors='coerce')
-            tanggal_str = tc_dt.strftime('%d/%m/%y') if pd.notna(tc_dt) else None
-
-            status_val = compute_status({
-                'gula_darah_puasa': gdp_n if pd.notna(gdp_n) else 0,
-                'gula_darah_sewaktu': gds_n if pd.notna(gds_n) else 0,
-                'cholesterol': chol_n if pd.notna(chol_n) else 0,
-                'asam_urat': asam_n if pd.notna(asam_n) else 0,
-                'bmi': bmi_n if pd.notna(bmi_n) else (float(emp_bmi) if pd.notna(emp_bmi) else 0),
-            })
+        for chunk in iter_checkups(uid=uid):
+            for _, row in chunk.iterrows():
+                tinggi_n = pd.to_numeric(row.get('tinggi', None), errors='coerce')
+                berat_n = pd.to_numeric(row.get('berat', None), errors='coerce')
+                bmi_n = pd.to_numeric(row.get('bmi', None), errors='coerce')
+                lp_n = pd.to_numeric(row.get('lingkar_perut', None), errors='coerce')
+                gdp_n = pd.to_numeric(row.get('gula_darah_puasa', None), errors='coerce')
+                gds_n = pd.to_numeric(row.get('gula_darah_sewaktu', None), errors='coerce')
+                chol_n = pd.to_numeric(row.get('cholesterol', None), errors='coerce')
+                asam_n = pd.to_numeric(row.get('asam_urat', None), errors='coerce')
+                tc_dt = pd.to_datetime(row.get('tanggal_checkup'), errors='coerce')
+                tanggal_str = tc_dt.strftime('%d/%m/%y') if pd.notna(tc_dt) else None
 
-            bmi_cat_val = row.get('bmi_category', None)
-            def _is_blank(x):
-                return (x is None) or (isinstance(x, float) and pd.isna(x)) or (isinstance(x, str) and not str(x).strip())
-            if _is_blank(bmi_cat_val):
-                bmi_cat_val = (employee_clean or {}).get('bmi_category', None)
-            if _is_blank(bmi_cat_val):
-                bmi_source = bmi_n if pd.notna(bmi_n) and float(bmi_n) != 0.0 else (emp_bmi if pd.notna(emp_bmi) else None)
-                bmi_cat_val = compute_bmi_category(bmi_source)
+                status_val = compute_status({
+                    'gula_darah_puasa': gdp_n if pd.notna(gdp_n) else 0,
+                    'gula_darah_sewaktu': gds_n if pd.notna(gds_n) else 0,
+                    'cholesterol': chol_n if pd.notna(chol_n) else 0,
+                    'asam_urat': asam_n if pd.notna(asam_n) else 0,
+                    'bmi': bmi_n if pd.notna(bmi_n) else (float(emp_bmi) if pd.notna(emp_bmi) else 0),
+                })
 
-            rows.append({
-                'UID': str(row.get('uid', uid)),
-                'Nama': emp_nama,
-                'Jabatan': emp_jabatan,
-                'Lokasi': emp_lokasi,
-                'Tanggal Lahir': emp_tanggal_lahir,
-                'Umur': int(umur_val_emp) if pd.notna(pd.to_numeric(umur_val_emp, errors='coerce')) else None,
-                'BMI': float(bmi_n) if pd.notna(bmi_n) and float(bmi_n) != 0.0 else (float(emp_bmi) if pd.notna(emp_bmi) else None),
-                'BMI Category': str(bmi_cat_val) if bmi_cat_val is not None else None,
-                'Tanggal Checkup': tanggal_str,
-                'Lingkar Perut': float(lp_n) if pd.notna(lp_n) else None,
-                'Gula Darah Puasa': float(gdp_n) if pd.notna(gdp_n) else None,
-                'Gula Darah Sewaktu': float(gds_n) if pd.notna(gds_n) else None,
-                'Cholesterol': float(chol_n) if pd.notna(chol_n) else None,
-                'Asam Urat': float(asam_n) if pd.notna(asam_n) else None,
-                'Tekanan Darah': row.get('tekanan_darah', None),
-                'Derajat Kesehatan': row.get('derajat_kesehatan', None) or (employee_clean or {}).get('derajat_kesehatan', None),
-                'Tanggal MCU': emp_tanggal_mcu,
-                'Expired MCU': emp_expired_mcu,
-                'Status': status_val,
-            })
+                bmi_cat_val = row.get('bmi_category', None)
+                def _is_blank(x):
+                    return (x is None) or (isinstance(x, float) and pd.isna(x)) or (isinstance(x, str) and not str(x).strip())
+                if _is_blank(bmi_cat_val):
+                    bmi_cat_val = (employee_clean or {}).get('bmi_category', None)
+                if _is_blank(bmi_cat_val):
+                    bmi_source = bmi_n if pd.notna(bmi_n) and float(bmi_n) != 0.0 else (emp_bmi if pd.notna(emp_bmi) else None)
+                    bmi_cat_val = compute_bmi_category(bmi_source)
+
+                rows.append({
+                    'UID': str(row.get('uid', uid)),
+                    'Nama': emp_nama,
+                    'Jabatan': emp_jabatan,
+                    'Lokasi': emp_lokasi,
+                    'Tanggal Lahir': emp_tanggal_lahir,
+                    'Umur': int(umur_val_emp) if pd.notna(pd.to_numeric(umur_val_emp, errors='coerce')) else None,
+                    'BMI': float(bmi_n) if pd.notna(bmi_n) and float(bmi_n) != 0.0 else (float(emp_bmi) if pd.notna(emp_bmi) else None),
+                    'BMI Category': str(bmi_cat_val) if bmi_cat_val is not None else None,
+                    'Tanggal Checkup': tanggal_str,
+                    'Lingkar Perut': float(lp_n) if pd.notna(lp_n) else None,
+                    'Gula Darah Puasa': float(gdp_n) if pd.notna(gdp_n) else None,
+                    'Gula Darah Sewaktu': float(gds_n) if pd.notna(gds_n) else None,
+                    'Cholesterol': float(chol_n) if pd.notna(chol_n) else None,
+                    'Asam Urat': float(asam_n) if pd.notna(asam_n) else None,
+                    'Tekanan Darah': row.get('tekanan_darah', None),
+                    'Derajat Kesehatan': row.get('derajat_kesehatan', None) or (employee_clean or {}).get('derajat_kesehatan', None),
+                    'Tanggal MCU': emp_tanggal_mcu,
+                    'Expired MCU': emp_expired_mcu,
+                    'Status': status_val,
+                })
 
         import pandas as _pd
         df_export = _pd.DataFrame(rows)
@@ -1718,6 +1711,7 @@ def nurse_export_checkup_history_by_uid_pdf(request, uid):
         return redirect(reverse("nurse:karyawan_detail", kwargs={"uid": uid}) + "?submenu=history")
 
 @require_http_methods(["GET"]) 
+@replica_reads
 def nurse_export_checkup_row(request, uid, checkup_id):
     if not request.session.get("authenticated") or request.session.get("user_role") != "Tenaga Kesehatan":
         return redirect("accounts:login")
@@ -1822,6 +1816,7 @@ def nurse_export_checkup_row(request, uid, checkup_id):
         return redirect(reverse("nurse:karyawan_detail", kwargs={"uid": uid}) + "?submenu=history")
 
 @require_http_methods(["GET"]) 
+@replica_reads
 def nurse_export_checkup_row_pdf(request, uid, checkup_id):
     if not request.session.get("authenticated") or request.session.get("user_role") != "Tenaga Kesehatan":
         return redirect("accounts:login")
@@ -1999,6 +1994,8 @@ def nurse_grafik_kesehatan_logic(request):
                         return pd.NA
                 td_systolic = df_ts['tekanan_darah'].apply(_parse_systolic) if 'tekanan_darah' in df_ts.columns else pd.Series([], dtype='float64')
 
+                import plotly.graph_objects as go
+                import plotly.io as pio
                 fig = go.Figure()
                 if not x_vals.empty:
                     if gdp is not None and not gdp.empty:
@@ -2086,6 +2083,8 @@ def nurse_grafik_kesehatan_logic(request):
                 if not df.empty:
                     grouped = df.groupby(date_col)[numeric_cols].mean().reset_index()
 
+                    import plotly.graph_objects as go
+                    import plotly.io as pio
                     fig = go.Figure()
                     label_map = {
                         'gula_darah_puasa': 'Gula Darah Puasa',
@@ -2118,6 +2117,7 @@ def nurse_grafik_kesehatan_logic(request):
 
 # TODO: Vue fetch target → used in grafik_kesehatan (Phase 2)
 @require_http_methods(["GET"]) 
+@replica_reads
 def well_unwell_summary_json(request):
     """
     Returns identical JSON data structure as manager's version:
@@ -2131,13 +2131,6 @@ def well_unwell_summary_json(request):
         month_to = request.GET.get("month_to")
         lokasi = request.GET.get("lokasi", "").strip()
 
-        # Debug diagnostics for Railway behavior
-        try:
-            print("[DEBUG][Nurse] Month From:", month_from)
-            print("[DEBUG][Nurse] Month To:", month_to)
-            print("[DEBUG][Nurse] Lokasi:", lokasi if lokasi else "(Semua Lokasi)")
-        except Exception:
-            pass
 
         from core.core_models import Checkup
         qs = Checkup.objects.all()
@@ -2179,11 +2172,6 @@ def well_unwell_summary_json(request):
         if end_dt:
             qs = qs.filter(tanggal_checkup__lte=end_dt)
 
-        # Debug: count after filtering
-        try:
-            print("[DEBUG][Nurse] Filtered QS count:", qs.count())
-        except Exception:
-            pass
 
         # Aggregate counts by month using health metric thresholds
         data = (
@@ -2223,12 +2211,6 @@ def well_unwell_summary_json(request):
             for item in data
         ]
 
-        # Debug: unique months in aggregated data
-        try:
-            unique_months = sorted({row["month"].strftime("%Y-%m") for row in data})
-            print("[DEBUG][Nurse] Unique months in aggregated data:", unique_months)
-        except Exception:
-            pass
 
         return JsonResponse(result, safe=False)
 
@@ -2242,18 +2224,8 @@ def nurse_grafik_kesehatan(request):
         return redirect("accounts:login")
 
     # Employee selector (same as dashboard, but we will reuse Edit Data Checkup → Grafik logic when a UID is selected)
-    available_employees = []
-    try:
-        df_emps = get_employees()
-        if hasattr(df_emps, 'empty') and not df_emps.empty and 'uid' in df_emps.columns and 'nama' in df_emps.columns:
-            for _, row in df_emps.iterrows():
-                uid = str(row['uid']) if pd.notna(row['uid']) else ''
-                nama = str(row['nama']) if pd.notna(row['nama']) else f'UID {uid}'
-                if uid:
-                    available_employees.append({'uid': uid, 'nama': nama})
-    except Exception:
-        pass
-    available_employees = sorted(available_employees, key=lambda x: x['nama'].lower())
+    from core import employee_search
+    available_employees = employee_search.picker_options(request.GET.get('uid', ''))
 
     # Month range defaults (last 6 months)
     now2 = pd.Timestamp.now()
@@ -2324,6 +2296,8 @@ def nurse_grafik_kesehatan(request):
                         return pd.NA
                 td_systolic = df_ts['tekanan_darah'].apply(_parse_systolic) if 'tekanan_darah' in df_ts.columns else pd.Series([], dtype='float64')
 
+                import plotly.graph_objects as go
+                import plotly.io as pio
                 fig = go.Figure()
                 if not x_vals.empty:
                     if gdp is not None and not gdp.empty:
@@ -2422,6 +2396,8 @@ def nurse_grafik_kesehatan(request):
                     grouped = df.groupby(date_col)[numeric_cols].mean().reset_index()
 
                     # Build Plotly figure
+                    import plotly.graph_objects as go
+                    import plotly.io as pio
                     fig = go.Figure()
                     label_map = {
                         'gula_darah_puasa': 'Gula Darah Puasa',
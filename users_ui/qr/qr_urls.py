@@ -2,7 +2,6 @@
 import io
 import qrcode
 from PIL import Image
-import plotly.express as px
 import zipfile
 from typing import List, Dict
 
@@ -36,7 +35,7 @@ def generate_qr_pil(qr_data: str) -> Image.Image:
 # -------------------------------
 # Plotly QR Preview
 # -------------------------------
-def plot_qr(qr_bytes: bytes, title="QR Code") -> px.imshow:
+def plot_qr(qr_bytes: bytes, title="QR Code"):
     """
     Return a Plotly figure to preview QR code.
     """
@@ -10,6 +10,7 @@ from django.conf import settings
 
 from users_ui.qr.qr_utils import generate_qr_bytes
 from core.queries import get_employees, load_checkups
+from core.db_router import replica_reads
 
 
 def qr_detail_view(request, uid=None):
@@ -54,6 +55,7 @@ def qr_detail_view(request, uid=None):
     return render(request, "qr_templates/qr_detail.html", context)
 
 
+@replica_reads
 def qr_bulk_download_view(request):
     """
     Generate QR codes for all users and return as ZIP download.
@@ -1,34 +1,93 @@
 # utils/cache_utils.py
+import threading
 import time
+from collections import OrderedDict
 
-# Simple in-memory cache dictionary
-_CACHE = {}
+# Simple in-memory LRU caches. The module functions use one shared store of at most MAX_ENTRIES keys
+# per process; callers keyed by untrusted input (e.g. the public karyawan landing page) get their own
+# BoundedCache so they cannot evict the shared entries (employee search index, menus).
+MAX_ENTRIES = 1024
+EVICT_TO = 896
+
+
+class BoundedCache:
+    """LRU of at most `max_entries` keys. When full, expired entries are swept and then the least
+    recently used ones dropped, down to `evict_to` entries."""
+
+    def __init__(self, max_entries, evict_to=None):
+        self.max_entries = max_entries
+        self.evict_to = evict_to if evict_to is not None else max_entries * 7 // 8
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def set(self, key: str, value, ttl: int = 300):
+        """Set a value with an optional TTL (seconds)."""
+        expire_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = {"value": value, "expire_at": expire_at}
+            self._data.move_to_end(key)
+            if len(self._data) > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        """Caller holds the lock."""
+        now = time.time()
+        for key in [k for k, item in self._data.items() if item["expire_at"] and now > item["expire_at"]]:
+            del self._data[key]
+        while len(self._data) > self.evict_to:
+            self._data.popitem(last=False)
+
+    def get(self, key: str):
+        """Value of `key`, or None if expired or not found."""
+        with self._lock:
+            item = self._data.get(key)
+            if item and item["expire_at"] and time.time() > item["expire_at"]:
+                del self._data[key]
+                item = None
+            elif item:
+                self._data.move_to_end(key)
+        _count_lookup(key, item is not None)
+        return item["value"] if item else None
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_CACHE = BoundedCache(MAX_ENTRIES, EVICT_TO)
 
 def set_cache(key: str, value, ttl: int = 300):
     """
     Set a value in cache with an optional TTL (seconds).
     """
-    expire_at = time.time() + ttl if ttl else None
-    _CACHE[key] = {"value": value, "expire_at": expire_at}
+    _CACHE.set(key, value, ttl)
 
 def get_cache(key: str):
     """
     Retrieve a value from cache. Returns None if expired or not found.
     """
-    item = _CACHE.get(key)
-    if not item:
-        return None
-    if item["expire_at"] and time.time() > item["expire_at"]:
-        del _CACHE[key]
-        return None
-    return item["value"]
+    return _CACHE.get(key)
+
+def _count_lookup(key: str, hit: bool):
+    """Feed hit/miss counters in core.metrics, labelled by key prefix (text before the first ':')."""
+    try:
+        from core import metrics
+        metrics.inc("mini_mcu_cache_requests_total", {"cache": str(key).split(":", 1)[0], "result": "hit" if hit else "miss"})
+    except Exception:
+        pass
 
 def delete_cache(key: str):
     """
     Remove a key from cache.
     """
-    if key in _CACHE:
-        del _CACHE[key]
+    _CACHE.delete(key)
 
 def clear_cache():
     """
@@ -4,16 +4,13 @@ import pandas as pd
 from zipfile import ZipFile
 from core.queries import get_employees
 from io import BytesIO
-from xlsxwriter.utility import xl_col_to_name
-from openpyxl.utils import get_column_letter
-from openpyxl.styles import Font
-from openpyxl.styles.differential import DifferentialStyle
-from openpyxl.formatting.rule import Rule
 from core.helpers import compute_bmi_category
+from core.instrumentation import timed
 
 # -----------------------------
 # Generate Karyawan Template Excel (V2 behavior)
 # -----------------------------
+@timed()
 def generate_karyawan_template_excel(lokasi_filter=None):
     """
     Generate Excel template for Checkup Data:
@@ -23,6 +20,8 @@ def generate_karyawan_template_excel(lokasi_filter=None):
     - Auto-calculates umur, bmi, and bmi_category ONLY for rows that are missing values
     - Normalizes column name to 'bmi_category' (removes duplicate 'BMI_category')
     """
+    from xlsxwriter.utility import xl_col_to_name
+
     # Fetch master data
     df = get_employees().copy()
 
@@ -119,12 +118,18 @@ def generate_karyawan_template_excel(lokasi_filter=None):
 # -----------------------------
 # Export Checkup Data to Excel
 # -----------------------------
+@timed()
 def export_checkup_data_excel(df: pd.DataFrame, enrich: bool = True, columns: list | None = None):
     """
     Returns Excel bytes from the provided DataFrame.
     If enrich=False, exports the DataFrame as-is (optionally restricted to 'columns') with no merging or extra computation.
     If enrich=True (default), enriches with master data (nama, jabatan, lokasi, tanggal_lahir, umur, bmi, bmi_category, derajat_kesehatan, tanggal_MCU, expired_MCU) when missing.
     """
+    from openpyxl.utils import get_column_letter
+    from openpyxl.styles import Font
+    from openpyxl.styles.differential import DifferentialStyle
+    from openpyxl.formatting.rule import Rule
+
     df = df.copy()
 
     # Normalize UID column if needed
@@ -194,9 +199,73 @@ def export_checkup_data_excel(df: pd.DataFrame, enrich: bool = True, columns: li
     return output.getvalue()
 
 
+# -----------------------------
+# Streamed Checkup Export (chunks -> Excel)
+# -----------------------------
+def _excel_cell(value):
+    """Plain Python value for xlsxwriter: NaN/NaT -> None, numpy scalars -> Python, Timestamp -> datetime."""
+    if value is None:
+        return None
+    try:
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        pass
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    if hasattr(value, "item"):
+        return value.item()
+    return value
+
+
+@timed()
+def export_checkup_frames_excel(frames, columns: list | None = None, sheet_name: str = "Checkup Data"):
+    """
+    Excel bytes from an iterable of DataFrame chunks (e.g. core.queries.iter_checkups), written row by
+    row with xlsxwriter's constant_memory mode so only the current chunk is held as a DataFrame.
+    The header comes from `columns` or the first chunk; derajat_kesehatan gets the same P1-P7 colouring
+    as export_checkup_data_excel().
+    """
+    import xlsxwriter
+
+    output = io.BytesIO()
+    wb = xlsxwriter.Workbook(output, {"constant_memory": True, "default_date_format": "yyyy-mm-dd"})
+    ws = wb.add_worksheet(sheet_name)
+    header_fmt = wb.add_format({"bold": True, "border": 1, "align": "center"})
+
+    header = list(columns) if columns else None
+    row_idx = 0
+    for chunk in frames:
+        if header is None:
+            header = list(chunk.columns)
+        if row_idx == 0:
+            ws.write_row(0, 0, header, header_fmt)
+            row_idx = 1
+        for col in header:
+            if col not in chunk.columns:
+                chunk[col] = None
+        for values in chunk[header].itertuples(index=False, name=None):
+            ws.write_row(row_idx, 0, [_excel_cell(v) for v in values])
+            row_idx += 1
+
+    header = header or []
+    if "derajat_kesehatan" in header and row_idx > 1:
+        col = header.index("derajat_kesehatan")
+        colours = {"P1": "#00B050", "P2": "#00B050", "P3": "#00B050", "P4": "#FFC000", "P5": "#ED7D31", "P6": "#FF0000", "P7": "#FF0000"}
+        for text, colour in colours.items():
+            ws.conditional_format(1, col, row_idx - 1, col, {
+                "type": "text", "criteria": "containing", "value": text,
+                "format": wb.add_format({"font_color": colour}),
+            })
+
+    wb.close()
+    return output.getvalue()
+
+
 # -----------------------------
 # Export Checkup Data to PDF
 # -----------------------------
+@timed()
 def export_checkup_data_pdf(
     df: pd.DataFrame,
     enrich: bool = True,
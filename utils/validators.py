@@ -30,6 +30,7 @@ except Exception:
             except Exception:
                 return None
     pd = _PDStub()
+import re
 from datetime import datetime
 
 # -----------------------------
@@ -46,6 +47,24 @@ def validate_lokasi(lokasi: str) -> bool:
     return True
 
 
+# -----------------------------
+# Request parameter validators
+# -----------------------------
+# Karyawan.uid: up to 64 printable characters; no ':' so it cannot run into cache key separators
+_UID_RE = re.compile(r"[^\x00-\x1f\x7f:]{1,64}")
+_MONTH_RE = re.compile(r"\d{4}-(0[1-9]|1[0-2])")
+
+
+def validate_uid(uid) -> bool:
+    """True for a uid that can exist in the karyawan table (see _UID_RE)."""
+    return isinstance(uid, str) and bool(uid.strip()) and bool(_UID_RE.fullmatch(uid))
+
+
+def validate_month(value) -> bool:
+    """True for a 'YYYY-MM' month string."""
+    return isinstance(value, str) and bool(_MONTH_RE.fullmatch(value))
+
+
 # -----------------------------
 # String Normalization
 # -----------------------------